@@ -0,0 +1,210 @@
+"""
+End-to-end pipeline benchmark: replay -> streamer -> Redis -> indicator engine -> coin_status.
+
+Runs the replay source in-process and measures the live stack around it:
+  - ticks/sec sent, and ticks/sec seen on the tick bus (crypto_ticks:*)
+  - tick -> Redis latency (frame sent_at vs. receive time)
+  - tick -> coin_status latency: synthetic prices are unique, so each
+    (symbol, current_price) row update maps back to the tick that produced it
+  - CPU % and RSS per service, sampled from /proc (run it on the docker host
+    or in the same machine as the services)
+
+Setup (synthetic symbols need history before the engine will track them):
+    python benchmarks/pipeline.py seed --symbols 400
+    # restart indicator-engine, start the streamer with BINANCE_WS_URL=ws://<this host>:9001
+    python benchmarks/pipeline.py run --symbols 400 --rate 2 --duration 60 --json out.json
+    python benchmarks/pipeline.py cleanup
+
+--max-p99-ms / --min-ticks-per-sec make `run` exit non-zero, so it can gate
+performance changes in CI.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+from common.database import db
+from common.tick_bus import CHANNEL, unpack_ticks
+from replay import ReplayServer, SynthMarket, add_source_args, source_from_args
+
+SERVICES = {
+    'streamer': 'services/streamer/main.py',
+    'indicator-engine': 'indicator_engine/main.py',
+    'api': 'uvicorn',
+}
+HISTORY_BARS = 300
+
+
+def db_symbol(raw):
+    return f"{raw[:-4]}/USDT"
+
+
+# --- process sampling ---
+
+def _proc_stats():
+    """{service: (cpu_seconds, rss_bytes)} summed over all matching processes."""
+    tick = os.sysconf('SC_CLK_TCK')
+    out = {name: [0.0, 0] for name in SERVICES}
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                cmd = f.read().replace(b'\0', b' ').decode(errors='ignore')
+            name = next((n for n, pat in SERVICES.items() if pat in cmd), None)
+            if name is None: continue
+            with open(f'/proc/{pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            with open(f'/proc/{pid}/status') as f:
+                rss = next((int(l.split()[1]) * 1024 for l in f if l.startswith('VmRSS:')), 0)
+            out[name][0] += (int(fields[11]) + int(fields[12])) / tick
+            out[name][1] += rss
+        except (OSError, IndexError, ValueError):
+            continue
+    return out
+
+
+# --- setup ---
+
+async def seed(args):
+    """Synthetic history (random walk 1m candles) + coin_status rows for the bench symbols."""
+    await db.connect()
+    market = SynthMarket(args.symbols, 1.0)
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    records = []
+    for raw in market.symbols:
+        for i in range(HISTORY_BARS, 0, -1):
+            p = market.price[raw] = market.price[raw] * (1 + market.rng.gauss(0, 0.001))
+            records.append((now - timedelta(minutes=i), db_symbol(raw), p, p * 1.001, p * 0.999, p, 1.0))
+    async with db.pool.acquire() as conn:
+        await conn.copy_records_to_table(
+            'candles', records=records, columns=('time', 'symbol', 'open', 'high', 'low', 'close', 'volume')
+        )
+        await conn.executemany(
+            "INSERT INTO coin_status (symbol) VALUES ($1) ON CONFLICT DO NOTHING",
+            [(db_symbol(s),) for s in market.symbols],
+        )
+    print(f"🌱 Seeded {len(records)} candles for {args.symbols} symbols. Restart the indicator engine.")
+
+
+async def cleanup(args):
+    await db.connect()
+    await db.execute("DELETE FROM candles WHERE symbol LIKE 'BENCH%'")
+    await db.execute("DELETE FROM coin_status WHERE symbol LIKE 'BENCH%'")
+    print("🧹 Bench symbols removed.")
+
+
+# --- run ---
+
+def pct(values, q):
+    if not values: return float('nan')
+    if len(values) == 1: return values[0]
+    return statistics.quantiles(values, n=100)[q - 1]
+
+
+async def run(args):
+    await db.connect()
+    sent = {}  # (symbol, price) -> send time
+    redis_lat, status_lat = [], []
+    bus_ticks = 0
+
+    def on_frame(frame):
+        now = time.time()
+        for t in frame:
+            sent[(db_symbol(t['s']), float(t['c']))] = now
+
+    server = ReplayServer(source_from_args(args), args.host, args.port, on_frame)
+
+    async def watch_bus():
+        nonlocal bus_ticks
+        pubsub = db.redis_bin.pubsub()
+        await pubsub.psubscribe(f"{CHANNEL}:*")
+        async for msg in pubsub.listen():
+            if msg['type'] != 'pmessage': continue
+            sent_at, ticks = unpack_ticks(msg['data'])
+            redis_lat.append(time.time() - sent_at)
+            bus_ticks += len(ticks)
+
+    async def watch_status():
+        since = datetime.now(timezone.utc)
+        while True:
+            await asyncio.sleep(0.1)
+            rows = await db.fetch_all(
+                "SELECT symbol, current_price, updated_at FROM coin_status "
+                "WHERE symbol LIKE 'BENCH%' AND updated_at > $1", since
+            )
+            for r in rows:
+                t0 = sent.get((r['symbol'], r['current_price']))
+                if t0 is not None:
+                    status_lat.append(r['updated_at'].timestamp() - t0)
+                since = max(since, r['updated_at'])
+
+    watchers = [asyncio.create_task(watch_bus()), asyncio.create_task(watch_status())]
+    print("⏳ Waiting for the streamer to connect...", flush=True)
+    server_task = asyncio.create_task(server.run())
+    while server.started is None:
+        await asyncio.sleep(0.1)
+    p0, t0 = _proc_stats(), time.time()
+    await server.done.wait()
+    await asyncio.sleep(args.drain)  # let the last ticks reach coin_status
+    p1, wall = _proc_stats(), time.time() - t0
+    for w in watchers + [server_task]:
+        w.cancel()
+
+    result = {
+        'ticks_sent_per_sec': round(server.rate(), 1),
+        'ticks_bus_per_sec': round(bus_ticks / wall, 1),
+        'redis_p50_ms': round(pct(redis_lat, 50) * 1000, 2),
+        'redis_p99_ms': round(pct(redis_lat, 99) * 1000, 2),
+        'status_p50_ms': round(pct(status_lat, 50) * 1000, 2),
+        'status_p99_ms': round(pct(status_lat, 99) * 1000, 2),
+        'status_samples': len(status_lat),
+        'services': {
+            name: {
+                'cpu_pct': round((p1[name][0] - p0[name][0]) / wall * 100, 1),
+                'rss_mb': round(p1[name][1] / 2**20, 1),
+            }
+            for name in SERVICES
+        },
+    }
+
+    print(f"📊 {server.ticks} ticks in {wall:.1f}s")
+    print(f"   throughput: sent {result['ticks_sent_per_sec']}/s, tick bus {result['ticks_bus_per_sec']}/s")
+    print(f"   tick -> redis:       p50 {result['redis_p50_ms']} ms, p99 {result['redis_p99_ms']} ms")
+    print(f"   tick -> coin_status: p50 {result['status_p50_ms']} ms, p99 {result['status_p99_ms']} ms ({len(status_lat)} samples)")
+    for name, s in result['services'].items():
+        print(f"   {name:17s} cpu {s['cpu_pct']:6.1f} %  rss {s['rss_mb']:7.1f} MB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    failed = []
+    if args.max_p99_ms and not result['status_p99_ms'] <= args.max_p99_ms:
+        failed.append(f"tick -> coin_status p99 {result['status_p99_ms']} ms > {args.max_p99_ms} ms")
+    if args.min_ticks_per_sec and result['ticks_bus_per_sec'] < args.min_ticks_per_sec:
+        failed.append(f"tick bus {result['ticks_bus_per_sec']}/s < {args.min_ticks_per_sec}/s")
+    for f in failed:
+        print(f"❌ {f}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_seed = sub.add_parser("seed")
+    p_seed.add_argument("--symbols", type=int, default=400)
+    sub.add_parser("cleanup")
+    p_run = sub.add_parser("run")
+    add_source_args(p_run)
+    p_run.add_argument("--drain", type=float, default=3.0)
+    p_run.add_argument("--json")
+    p_run.add_argument("--max-p99-ms", type=float)
+    p_run.add_argument("--min-ticks-per-sec", type=float)
+    args = parser.parse_args()
+
+    code = asyncio.run({"seed": seed, "cleanup": cleanup, "run": run}[args.cmd](args)) or 0
+    sys.exit(code)
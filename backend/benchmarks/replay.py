@@ -0,0 +1,186 @@
+"""
+Local stand-in for wss://stream.binance.com !miniTicker@arr.
+
+Serves recorded frames (or synthetic ones) over a local websocket, so the
+real streamer runs its own parsing/publish/write code against it:
+
+    BINANCE_WS_URL=ws://<host>:9001 python services/streamer/main.py
+
+Record a session from Binance (one JSON frame per line, gzip):
+    python benchmarks/replay.py record --out ticks.jsonl.gz --seconds 600
+
+Replay it (event times are re-stamped to "now", order and spacing kept;
+--speed 2 plays twice as fast):
+    python benchmarks/replay.py serve --file ticks.jsonl.gz --speed 2
+
+Or synthesize N symbols, each ticking `--rate` times per second:
+    python benchmarks/replay.py serve --symbols 400 --rate 2 --duration 120
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import time
+
+BINANCE_URL = "wss://stream.binance.com:9443/ws/!miniTicker@arr"
+FRAME_INTERVAL = 1.0  # Binance pushes !miniTicker@arr about once a second
+
+
+def synth_symbols(n):
+    return [f"BENCH{i:04d}USDT" for i in range(n)]
+
+
+class SynthMarket:
+    """Random-walk miniTicker frames. Prices are unique per symbol, so a value seen downstream maps back to its tick."""
+
+    def __init__(self, n_symbols, rate, seed=42):
+        self.rng = random.Random(seed)
+        self.symbols = synth_symbols(n_symbols)
+        self.rate = rate
+        self.price = {s: self.rng.uniform(0.01, 50000) for s in self.symbols}
+        self.volume = {s: self.rng.uniform(1e3, 1e6) for s in self.symbols}
+
+    def frame(self, now_ms, share=1.0):
+        out = []
+        for s in self.symbols:
+            if share < 1.0 and self.rng.random() > share:
+                continue
+            p = self.price[s] * (1 + self.rng.gauss(0, 0.0005))
+            self.price[s] = p
+            self.volume[s] += self.rng.uniform(0, 100)
+            out.append({
+                "e": "24hrMiniTicker", "E": now_ms, "s": s,
+                "c": repr(p), "o": repr(p), "h": repr(p), "l": repr(p),
+                "v": repr(self.volume[s]), "q": "0",
+            })
+        return out
+
+    async def frames(self, duration):
+        """Yields frames so that each symbol ticks `rate` times per second on average."""
+        interval = min(FRAME_INTERVAL, 1.0 / self.rate)
+        share = min(1.0, self.rate * interval)
+        end = time.time() + duration
+        while time.time() < end:
+            yield self.frame(int(time.time() * 1000), share)
+            await asyncio.sleep(interval)
+
+
+async def recorded_frames(path, speed=1.0, loop=False):
+    """Replays a recording with its original spacing; `E` is re-stamped to the send time."""
+    while True:
+        prev = None
+        with gzip.open(path, 'rt') as f:
+            for line in f:
+                frame = json.loads(line)
+                if not frame: continue
+                first = frame[0].get('E', 0)
+                if prev is not None and first > prev:
+                    await asyncio.sleep((first - prev) / 1000 / speed)
+                prev = first
+                now_ms = int(time.time() * 1000)
+                for t in frame:
+                    t['E'] = now_ms
+                yield frame
+        if not loop:
+            break
+
+
+async def record(out, seconds):
+    import websockets
+
+    end = time.time() + seconds
+    frames = ticks = 0
+    async with websockets.connect(BINANCE_URL) as ws:
+        with gzip.open(out, 'wt') as f:
+            while time.time() < end:
+                msg = await ws.recv()
+                f.write(msg.rstrip() + "\n")
+                frames += 1
+                ticks += len(json.loads(msg))
+    print(f"💾 Recorded {frames} frames / {ticks} ticks to {out}")
+
+
+class ReplayServer:
+    """Websocket server that pushes one frame source to every client. Counts what it sent."""
+
+    def __init__(self, source, host="0.0.0.0", port=9001, on_frame=None):
+        self.source = source
+        self.host = host
+        self.port = port
+        self.on_frame = on_frame
+        self.clients = set()
+        self.frames = 0
+        self.ticks = 0
+        self.started = None
+        self.done = asyncio.Event()
+
+    async def _handler(self, ws, *args):
+        self.clients.add(ws)
+        try:
+            await ws.wait_closed()
+        finally:
+            self.clients.discard(ws)
+
+    async def run(self, wait_for_client=True):
+        import websockets
+
+        async with websockets.serve(self._handler, self.host, self.port):
+            print(f"📡 Replay on ws://{self.host}:{self.port}", flush=True)
+            while wait_for_client and not self.clients:
+                await asyncio.sleep(0.1)
+            self.started = time.time()
+            async for frame in self.source:
+                if self.on_frame:
+                    self.on_frame(frame)
+                msg = json.dumps(frame)
+                for ws in list(self.clients):
+                    try:
+                        await ws.send(msg)
+                    except Exception:
+                        self.clients.discard(ws)
+                self.frames += 1
+                self.ticks += len(frame)
+        self.done.set()
+
+    def rate(self):
+        elapsed = time.time() - (self.started or time.time())
+        return self.ticks / elapsed if elapsed > 0 else 0.0
+
+
+def source_from_args(args):
+    if args.file:
+        return recorded_frames(args.file, args.speed, args.loop)
+    return SynthMarket(args.symbols, args.rate).frames(args.duration)
+
+
+def add_source_args(p):
+    p.add_argument("--file", help="recorded .jsonl.gz (default: synthetic)")
+    p.add_argument("--speed", type=float, default=1.0)
+    p.add_argument("--loop", action="store_true")
+    p.add_argument("--symbols", type=int, default=400)
+    p.add_argument("--rate", type=float, default=1.0, help="ticks per symbol per second")
+    p.add_argument("--duration", type=float, default=60)
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=9001)
+
+
+async def serve(args):
+    server = ReplayServer(source_from_args(args), args.host, args.port)
+    await server.run()
+    print(f"✅ Sent {server.frames} frames / {server.ticks} ticks ({server.rate():.0f} ticks/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rec = sub.add_parser("record")
+    rec.add_argument("--out", required=True)
+    rec.add_argument("--seconds", type=float, default=300)
+    add_source_args(sub.add_parser("serve"))
+    args = parser.parse_args()
+
+    if args.cmd == "record":
+        asyncio.run(record(args.out, args.seconds))
+    else:
+        asyncio.run(serve(args))
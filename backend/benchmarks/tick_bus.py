@@ -0,0 +1,255 @@
+"""
+Tick bus benchmark: JSON message per symbol vs. binary frame per shard.
+
+Offline part: serialization cost on the streamer side and per-worker
+deserialization cost (old: every worker parses every symbol).
+
+With --redis (needs a local Redis at REDIS_HOST): replays synthetic frames
+through real PUBLISH/SUBSCRIBE, reports publish->receive latency p50/p99
+and Redis CPU (INFO cpu) for both formats.
+
+With --replay (same Redis): serves miniTicker frames from benchmarks/replay.py
+(synthetic or --file recording) over a local websocket, parses them like
+services/streamer and publishes each frame in the old format (one JSON
+message per symbol on crypto_ticks, every worker parses all of them) or as
+binary shard frames. TICK_SHARDS worker processes subscribe as the indicator
+engine does; reports tick -> worker latency, Redis CPU and CPU per worker:
+
+    python benchmarks/tick_bus.py --replay --symbols 400 --rate 1 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+from common.tick_bus import CHANNEL, TICK_SHARDS, channel, pack_ticks, publish_ticks, shard_of, unpack_ticks
+from replay import ReplayServer, add_source_args, source_from_args
+
+SYMBOLS = 400
+FRAMES = 200
+
+
+def make_ticks(n_symbols, ts):
+    return [(f"C{i:04d}/USDT", random.uniform(0.01, 50000), random.uniform(1, 1e6), ts) for i in range(n_symbols)]
+
+
+def bench_offline():
+    ticks = make_ticks(SYMBOLS, int(time.time() * 1000))
+    worker_symbols = {s for s, *_ in ticks if shard_of(s) == 0}
+
+    t0 = time.perf_counter()
+    for _ in range(FRAMES):
+        msgs = [json.dumps({"s": s, "p": p, "v": v, "t": t}) for s, p, v, t in ticks]
+    t_json_pub = (time.perf_counter() - t0) / FRAMES
+    json_bytes = sum(len(m) for m in msgs)
+
+    t0 = time.perf_counter()
+    for _ in range(FRAMES):
+        for m in msgs:
+            d = json.loads(m)
+            if d['s'] not in worker_symbols: continue
+    t_json_sub = (time.perf_counter() - t0) / FRAMES
+
+    t0 = time.perf_counter()
+    for _ in range(FRAMES):
+        by_shard = {}
+        for tick in ticks:
+            by_shard.setdefault(shard_of(tick[0]), []).append(tick)
+        frames = {sh: pack_ticks(tt) for sh, tt in by_shard.items()}
+    t_bin_pub = (time.perf_counter() - t0) / FRAMES
+    bin_bytes = sum(len(f) for f in frames.values())
+
+    t0 = time.perf_counter()
+    for _ in range(FRAMES):
+        unpack_ticks(frames[0])
+    t_bin_sub = (time.perf_counter() - t0) / FRAMES
+
+    print(f"📦 {SYMBOLS} symbols per exchange frame, {TICK_SHARDS} shards")
+    print(f"   JSON:   {len(msgs):4d} msgs, {json_bytes:7d} B, publish-side {t_json_pub * 1e3:6.2f} ms, per worker {t_json_sub * 1e3:6.2f} ms")
+    print(f"   binary: {len(frames):4d} msgs, {bin_bytes:7d} B, publish-side {t_bin_pub * 1e3:6.2f} ms, per worker {t_bin_sub * 1e3:6.2f} ms")
+
+
+async def bench_redis():
+    import redis.asyncio as redis
+
+    r = redis.Redis(host=os.getenv("REDIS_HOST", "localhost"), port=6379)
+
+    async def cpu():
+        info = await r.info("cpu")
+        return info["used_cpu_sys"] + info["used_cpu_user"]
+
+    async def run(mode):
+        sub = r.pubsub()
+        if mode == "json":
+            await sub.subscribe("bench_ticks")
+        else:
+            await sub.subscribe(channel(0))
+        latencies = []
+
+        async def consume():
+            async for msg in sub.listen():
+                if msg['type'] != 'message': continue
+                if mode == "json":
+                    d = json.loads(msg['data'])
+                    latencies.append(time.time() - d['sent'])
+                else:
+                    sent_at, _ = unpack_ticks(msg['data'])
+                    latencies.append(time.time() - sent_at)
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.1)
+        c0 = await cpu()
+        for _ in range(FRAMES):
+            ticks = make_ticks(SYMBOLS, int(time.time() * 1000))
+            pipe = r.pipeline(transaction=False)
+            if mode == "json":
+                sent = time.time()
+                for s, p, v, t in ticks:
+                    pipe.publish("bench_ticks", json.dumps({"s": s, "p": p, "v": v, "t": t, "sent": sent}))
+            else:
+                publish_ticks(pipe, ticks)
+            await pipe.execute()
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.5)
+        c1 = await cpu()
+        task.cancel()
+        await sub.close()
+
+        q = statistics.quantiles(latencies, n=100)
+        print(f"   {mode:6s}: latency p50 {q[49] * 1e3:6.2f} ms, p99 {q[98] * 1e3:6.2f} ms, redis cpu {(c1 - c0) * 1e3:7.1f} ms")
+
+    print(f"🔴 Redis replay: {FRAMES} frames × {SYMBOLS} symbols")
+    await run("json")
+    await run("binary")
+    await r.close()
+
+
+def _redis():
+    import redis.asyncio as redis
+
+    return redis.Redis(host=os.getenv("REDIS_HOST", "localhost"), port=6379)
+
+
+async def _replay_worker(mode, shard, ready, out):
+    r = _redis()
+    sub = r.pubsub()
+    await sub.subscribe(CHANNEL if mode == "json" else channel(shard), "bench_ticks:end")
+    ready.set()
+    cpu0 = time.process_time()
+    latencies, ticks = [], 0
+    async for msg in sub.listen():
+        if msg['type'] != 'message': continue
+        if msg['channel'] == b"bench_ticks:end": break
+        now = time.time()
+        if mode == "json":
+            d = json.loads(msg['data'])
+            if shard_of(d['s']) != shard: continue
+            latencies.append(now - d['t'] / 1000)
+            ticks += 1
+        else:
+            _, frame = unpack_ticks(msg['data'])
+            latencies.append(now - frame[0][3] / 1000)
+            ticks += len(frame)
+    out.put((shard, time.process_time() - cpu0, ticks, latencies))
+    await sub.aclose()
+    await r.aclose()
+
+
+def _run_replay_worker(mode, shard, ready, out):
+    asyncio.run(_replay_worker(mode, shard, ready, out))
+
+
+async def bench_replay(args):
+    import websockets
+
+    r = _redis()
+
+    async def cpu():
+        info = await r.info("cpu")
+        return info["used_cpu_sys"] + info["used_cpu_user"]
+
+    async def run(mode):
+        out = multiprocessing.Queue()
+        workers = []
+        for shard in range(TICK_SHARDS):
+            ready = multiprocessing.Event()
+            proc = multiprocessing.Process(target=_run_replay_worker, args=(mode, shard, ready, out))
+            proc.start()
+            ready.wait()
+            workers.append(proc)
+
+        server = ReplayServer(source_from_args(args), "127.0.0.1", args.port)
+        serving = asyncio.create_task(server.run())
+        c0, p0 = await cpu(), time.process_time()
+        # websockets.connect does not retry while the server is still binding
+        for _ in range(50):
+            try:
+                ws = await websockets.connect(f"ws://127.0.0.1:{args.port}")
+                break
+            except OSError:
+                await asyncio.sleep(0.1)
+        async with ws:
+            while True:
+                try:
+                    msg = await asyncio.wait_for(ws.recv(), 2.0)
+                except asyncio.TimeoutError:
+                    if server.done.is_set(): break
+                    continue
+                except websockets.ConnectionClosed:
+                    break
+                # Same parsing as services/streamer
+                ticks = []
+                for t in json.loads(msg):
+                    s = t['s']
+                    if not s.endswith('USDT'): continue
+                    ticks.append((f"{s[:-4]}/USDT", float(t['c']), float(t['v']), t['E']))
+                pipe = r.pipeline(transaction=False)
+                if mode == "json":
+                    for symbol, price, vol, ts_ms in ticks:
+                        pipe.publish(CHANNEL, json.dumps({"s": symbol, "p": price, "v": vol, "t": ts_ms}))
+                else:
+                    publish_ticks(pipe, ticks)
+                await pipe.execute()
+        publisher_cpu = time.process_time() - p0
+        await serving
+        await asyncio.sleep(0.5)
+        await r.publish("bench_ticks:end", b"")
+        results = [out.get() for _ in workers]
+        for proc in workers:
+            proc.join()
+        c1 = await cpu()
+
+        latencies = [x for *_, lat in results for x in lat]
+        q = statistics.quantiles(latencies, n=100)
+        worker_cpu = [c for _, c, _, _ in results]
+        received = sum(n for _, _, n, _ in results)
+        print(f"   {mode:6s}: {server.ticks} ticks sent, {received} received, latency p50 {q[49] * 1e3:6.2f} ms, "
+              f"p99 {q[98] * 1e3:6.2f} ms, redis cpu {(c1 - c0) * 1e3:7.1f} ms, "
+              f"streamer+replay cpu {publisher_cpu * 1e3:7.1f} ms, "
+              f"worker cpu avg {statistics.mean(worker_cpu) * 1e3:6.1f} ms / max {max(worker_cpu) * 1e3:6.1f} ms")
+
+    print(f"🔴 Redis replay via benchmarks/replay.py: {args.file or f'{args.symbols} symbols × {args.rate}/s'}, "
+          f"{TICK_SHARDS} worker processes")
+    await run("json")
+    await run("binary")
+    await r.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis", action="store_true", help="synthetic frames through a local Redis")
+    parser.add_argument("--replay", action="store_true", help="replay.py frames through a local Redis")
+    add_source_args(parser)
+    args = parser.parse_args()
+
+    bench_offline()
+    if args.redis:
+        asyncio.run(bench_redis())
+    if args.replay:
+        asyncio.run(bench_replay(args))
@@ -7,6 +7,7 @@ class Database:
     def __init__(self):
         self.pool = None
         self.redis = None
+        self.redis_bin = None  # decode_responses=False, for binary tick frames
         self.logger = logging.getLogger("Database")
 
     async def connect(self):
@@ -29,10 +30,12 @@ class Database:
             redis_host = os.getenv("REDIS_HOST", "redis")
             self.redis = redis.Redis(host=redis_host, port=6379, decode_responses=True)
             await self.redis.ping()
+            self.redis_bin = redis.Redis(host=redis_host, port=6379)
             print("✅ [Common] Connected to Redis")
         except Exception as e:
             print(f"❌ [Common] Redis Connection failed: {e}")
             self.redis = None
+            self.redis_bin = None
 
     async def fetch_all(self, query, *args):
         async with self.pool.acquire() as conn:
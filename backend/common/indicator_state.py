@@ -0,0 +1,210 @@
+"""
+Incremental indicator state.
+
+One IndicatorState per (symbol, timeframe). It is seeded once from closed
+history and then advanced in O(1) per tick instead of re-running pandas-ta
+over the whole frame:
+
+    state = IndicatorState.from_history(highs, lows, closes)  # closed bars
+    values = state.update(high, low, close)   # forming bar, state untouched
+    values = state.commit(high, low, close)   # bar closed, folded into state
+
+Averages are seeded the TA-Lib way (which pandas-ta uses when TA-Lib is
+installed): EMA / Wilder averages start from the SMA of the first `length`
+inputs, Bollinger uses the population std. Values stay None until enough
+bars have been seen.
+"""
+from collections import deque
+
+RSI_LENGTH = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BB_LENGTH, BB_STD = 20, 2.0
+ST_LENGTH, ST_MULTIPLIER = 7, 3.0
+
+
+class _Ema:
+    """EMA (alpha=2/(n+1)) or Wilder RMA (alpha=1/n), seeded with an SMA."""
+    __slots__ = ('length', 'alpha', 'value', '_count', '_sum')
+
+    def __init__(self, length, alpha=None):
+        self.length = length
+        self.alpha = alpha if alpha is not None else 2.0 / (length + 1)
+        self.value = None
+        self._count = 0
+        self._sum = 0.0
+
+    def peek(self, x):
+        if self.value is None:
+            if self._count + 1 < self.length:
+                return None
+            return (self._sum + x) / self.length
+        return self.value + self.alpha * (x - self.value)
+
+    def push(self, x):
+        v = self.peek(x)
+        if self.value is None:
+            self._count += 1
+            self._sum += x
+        self.value = v
+        return v
+
+
+class _RollingStats:
+    """Rolling mean / population std over the last `length` inputs."""
+    __slots__ = ('length', 'window', '_sum', '_sumsq', '_pushes')
+
+    # Re-sum the window every N pushes so float drift can't build up
+    RESYNC_EVERY = 1000
+
+    def __init__(self, length):
+        self.length = length
+        self.window = deque(maxlen=length)
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._pushes = 0
+
+    def _stats(self, s, sq):
+        mean = s / self.length
+        var = max(sq / self.length - mean * mean, 0.0)
+        return mean, var ** 0.5
+
+    def peek(self, x):
+        n = len(self.window)
+        if n + 1 < self.length:
+            return None
+        s, sq = self._sum + x, self._sumsq + x * x
+        if n == self.length:
+            old = self.window[0]
+            s, sq = s - old, sq - old * old
+        return self._stats(s, sq)
+
+    def push(self, x):
+        v = self.peek(x)
+        if len(self.window) == self.length:
+            old = self.window[0]
+            self._sum -= old
+            self._sumsq -= old * old
+        self.window.append(x)
+        self._sum += x
+        self._sumsq += x * x
+
+        self._pushes += 1
+        if self._pushes % self.RESYNC_EVERY == 0:
+            self._sum = sum(self.window)
+            self._sumsq = sum(w * w for w in self.window)
+        return v
+
+
+class IndicatorState:
+    """RSI, MACD, EMA 50/200, Bollinger and Supertrend for one symbol/timeframe."""
+
+    def __init__(self):
+        self.prev_close = None
+        self.rsi_gain = _Ema(RSI_LENGTH, 1.0 / RSI_LENGTH)
+        self.rsi_loss = _Ema(RSI_LENGTH, 1.0 / RSI_LENGTH)
+        self.ema_fast = _Ema(MACD_FAST)
+        self.ema_slow = _Ema(MACD_SLOW)
+        self.macd_signal = _Ema(MACD_SIGNAL)
+        self.ema_50 = _Ema(50)
+        self.ema_200 = _Ema(200)
+        self.bb = _RollingStats(BB_LENGTH)
+        self.atr = _Ema(ST_LENGTH, 1.0 / ST_LENGTH)
+        # Supertrend: final bands and direction of the last closed bar
+        self.st_upper = None
+        self.st_lower = None
+        self.st_dir = 1
+        self.bars = 0
+
+    @classmethod
+    def from_history(cls, highs, lows, closes):
+        state = cls()
+        state.seed(highs, lows, closes)
+        return state
+
+    def seed(self, highs, lows, closes):
+        """Folds closed bars (oldest first) into the state."""
+        for h, l, c in zip(highs, lows, closes):
+            self.commit(float(h), float(l), float(c))
+
+    def update(self, high, low, close):
+        """Values for the forming bar. Does not change the state."""
+        return self._step(high, low, close, False)
+
+    def commit(self, high, low, close):
+        """Closes the bar: folds it into the state and returns its values."""
+        return self._step(high, low, close, True)
+
+    def _step(self, high, low, close, commit):
+        def apply(acc, x):
+            return acc.push(x) if commit else acc.peek(x)
+
+        # RSI (Wilder)
+        rsi = None
+        if self.prev_close is not None:
+            delta = close - self.prev_close
+            gain = apply(self.rsi_gain, max(delta, 0.0))
+            loss = apply(self.rsi_loss, max(-delta, 0.0))
+            if gain is not None and loss is not None and gain + loss > 0:
+                rsi = 100.0 * gain / (gain + loss)
+
+        # MACD
+        fast = apply(self.ema_fast, close)
+        slow = apply(self.ema_slow, close)
+        macd = signal = hist = None
+        if fast is not None and slow is not None:
+            macd = fast - slow
+            signal = apply(self.macd_signal, macd)
+            if signal is not None:
+                hist = macd - signal
+
+        ema_50 = apply(self.ema_50, close)
+        ema_200 = apply(self.ema_200, close)
+
+        # Bollinger
+        bb_upper = bb_lower = None
+        bb = apply(self.bb, close)
+        if bb is not None:
+            mean, std = bb
+            bb_upper = mean + BB_STD * std
+            bb_lower = mean - BB_STD * std
+
+        # Supertrend (ATR on true range)
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        atr = apply(self.atr, tr)
+        trend = None
+        upper, lower, direction = self.st_upper, self.st_lower, self.st_dir
+        if atr is not None:
+            hl2 = (high + low) / 2
+            upper = hl2 + ST_MULTIPLIER * atr
+            lower = hl2 - ST_MULTIPLIER * atr
+            if self.st_upper is not None:
+                if close > self.st_upper:
+                    direction = 1
+                elif close < self.st_lower:
+                    direction = -1
+                else:
+                    if direction > 0 and lower < self.st_lower:
+                        lower = self.st_lower
+                    if direction < 0 and upper > self.st_upper:
+                        upper = self.st_upper
+            trend = lower if direction > 0 else upper
+
+        if commit:
+            self.prev_close = close
+            self.st_upper, self.st_lower, self.st_dir = upper, lower, direction
+            self.bars += 1
+
+        return {
+            'rsi': rsi,
+            'macd': macd,
+            'macd_signal': signal,
+            'macd_hist': hist,
+            'ema_50': ema_50,
+            'ema_200': ema_200,
+            'bb_upper': bb_upper,
+            'bb_lower': bb_lower,
+            'trend': trend,
+        }
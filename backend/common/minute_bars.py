@@ -0,0 +1,66 @@
+"""
+Minute bars built from the ticker stream.
+
+!miniTicker@arr (and ccxt watch_tickers) carries rolling 24h open/high/low
+and volume, so writing those fields directly stores one 24h snapshot per
+event instead of a candle. The builder floors event time to the minute,
+tracks OHLC from the last price and derives per-minute volume from deltas
+of the cumulative 24h volume.
+
+The 24h window also drops old trades, so a delta can be negative; it is
+clamped to 0, which makes minute volume a close lower bound, not exact.
+
+A bar is emitted once, when its minute is over: on the first tick of the
+next minute, from close_stale() for symbols that went quiet, or from
+flush() on shutdown.
+"""
+from datetime import datetime, timezone
+
+MINUTE_MS = 60_000
+
+
+class MinuteBarBuilder:
+    def __init__(self):
+        self.bars = {}      # symbol -> [minute_ms, open, high, low, close, volume]
+        self.last_cum = {}  # symbol -> last cumulative 24h volume
+        self.closed = {}    # symbol -> last emitted minute_ms
+
+    def update(self, symbol, ts_ms, price, cum_volume):
+        """Applies one tick. Returns the record of a bar that just closed, or None."""
+        minute = ts_ms - ts_ms % MINUTE_MS
+        prev_cum = self.last_cum.get(symbol)
+        self.last_cum[symbol] = cum_volume
+        delta = max(cum_volume - prev_cum, 0.0) if prev_cum is not None else 0.0
+
+        if minute <= self.closed.get(symbol, -1):
+            return None  # late event for a minute that was already written
+
+        bar = self.bars.get(symbol)
+        if bar is None or minute > bar[0]:
+            self.bars[symbol] = [minute, price, price, price, price, delta]
+            return self._record(symbol, bar) if bar is not None else None
+        if minute < bar[0]:
+            return None
+
+        bar[2] = max(bar[2], price)
+        bar[3] = min(bar[3], price)
+        bar[4] = price
+        bar[5] += delta
+        return None
+
+    def close_stale(self, now_ms):
+        """Closes bars of symbols that had no tick since their minute ended."""
+        current = now_ms - now_ms % MINUTE_MS
+        stale = [s for s, bar in self.bars.items() if bar[0] < current]
+        return [self._record(s, self.bars.pop(s)) for s in stale]
+
+    def flush(self):
+        """Emits every forming bar (shutdown)."""
+        records = [self._record(s, bar) for s, bar in self.bars.items()]
+        self.bars.clear()
+        return records
+
+    def _record(self, symbol, bar):
+        self.closed[symbol] = bar[0]
+        dt = datetime.fromtimestamp(bar[0] / 1000, tz=timezone.utc)
+        return (dt, symbol, bar[1], bar[2], bar[3], bar[4], bar[5])
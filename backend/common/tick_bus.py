@@ -0,0 +1,180 @@
+"""
+Binary tick bus between the streamer and its consumers.
+
+One exchange frame becomes one packed message per shard instead of one JSON
+message per symbol. Symbols are assigned to shards with a stable hash, and
+each shard has its own channel, so an indicator worker only receives (and
+unpacks) the symbols it owns.
+
+Frame layout (little endian):
+    header: version u8, count u32, sent_at f64 (unix seconds)
+    ticks:  symbol 24s (utf-8, NUL padded), price f64, volume f64, ts i64 (ms)
+
+Transport is pub/sub by default. With TICK_TRANSPORT=streams the same frames
+go to one capped Redis Stream per shard, read through a consumer group: Redis
+memory stays bounded by MAXLEN, and a lagging worker coalesces the backlog
+(latest tick per symbol and minute) instead of replaying it tick by tick.
+The frames are still published to the shard channels as well: live fan-out
+(API websockets, benchmarks) keeps reading pub/sub whatever the transport.
+"""
+import logging
+import os
+import struct
+import time
+import zlib
+
+import redis.asyncio as redis
+
+CHANNEL = "crypto_ticks"
+TICK_SHARDS = int(os.getenv("TICK_SHARDS", "8"))
+TICK_TRANSPORT = os.getenv("TICK_TRANSPORT", "pubsub")  # pubsub | streams
+STREAM_MAXLEN = int(os.getenv("TICK_STREAM_MAXLEN", "1000"))
+VERSION = 1
+
+logger = logging.getLogger("TickBus")
+
+_HEADER = struct.Struct('<BId')
+_TICK = struct.Struct('<24sddq')
+
+
+def shard_of(symbol, shards=TICK_SHARDS):
+    # crc32, not hash(): it must agree across processes
+    return zlib.crc32(symbol.encode()) % shards
+
+
+def channel(shard):
+    return f"{CHANNEL}:{shard}"
+
+
+def stream_key(shard):
+    return f"{CHANNEL}:stream:{shard}"
+
+
+def pack_ticks(ticks, sent_at=None):
+    """ticks: list of (symbol, price, volume, ts_ms)."""
+    buf = bytearray(_HEADER.size + _TICK.size * len(ticks))
+    _HEADER.pack_into(buf, 0, VERSION, len(ticks), sent_at or time.time())
+    offset = _HEADER.size
+    for symbol, price, volume, ts in ticks:
+        _TICK.pack_into(buf, offset, symbol.encode(), price, volume, ts)
+        offset += _TICK.size
+    return bytes(buf)
+
+
+def unpack_ticks(frame):
+    """Returns (sent_at, [(symbol, price, volume, ts_ms), ...])."""
+    version, count, sent_at = _HEADER.unpack_from(frame, 0)
+    if version != VERSION:
+        raise ValueError(f"Unsupported tick frame version {version}")
+    body = memoryview(frame)[_HEADER.size:_HEADER.size + count * _TICK.size]
+    ticks = [
+        (s.rstrip(b'\0').decode(), price, volume, ts)
+        for s, price, volume, ts in _TICK.iter_unpack(body)
+    ]
+    return sent_at, ticks
+
+
+def publish_ticks(pipeline, ticks, shards=TICK_SHARDS, transport=TICK_TRANSPORT):
+    """Groups ticks by shard and queues one packed frame per shard on a Redis pipeline."""
+    by_shard = {}
+    for tick in ticks:
+        by_shard.setdefault(shard_of(tick[0], shards), []).append(tick)
+    sent_at = time.time()
+    for shard, shard_ticks in by_shard.items():
+        frame = pack_ticks(shard_ticks, sent_at)
+        if transport == "streams":
+            pipeline.xadd(stream_key(shard), {"f": frame}, maxlen=STREAM_MAXLEN, approximate=True)
+        # pub/sub in both modes: fire-and-forget subscribers (crypto_ticks:*) only want live ticks
+        pipeline.publish(channel(shard), frame)
+    return len(by_shard)
+
+
+class StreamConsumer:
+    """
+    Reads one shard's stream through a consumer group.
+    Each read drains up to `count` frames, acks them and yields a single
+    coalesced batch. Counters: ticks received vs. passed on, and the group's
+    lag / pending entries (refreshed every `lag_every` seconds).
+    """
+
+    def __init__(self, r, shard, group="indicator-engine", consumer=None, count=100, block_ms=1000, lag_every=10):
+        self.r = r
+        self.key = stream_key(shard)
+        self.group = group
+        self.consumer = consumer or f"worker-{shard}"
+        self.count = count
+        self.block_ms = block_ms
+        self.lag_every = lag_every
+        self.received = 0
+        self.delivered = 0
+        self.lag = 0
+        self.pending = 0
+        self._last_lag = 0.0
+
+    async def ensure_group(self):
+        try:
+            await self.r.xgroup_create(self.key, self.group, id="$", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def refresh_lag(self):
+        for g in await self.r.xinfo_groups(self.key):
+            name = g["name"].decode() if isinstance(g["name"], bytes) else g["name"]
+            if name == self.group:
+                self.lag = g.get("lag") or 0
+                self.pending = g.get("pending") or 0
+
+    async def read(self):
+        """Returns (oldest sent_at, coalesced ticks) or None on timeout."""
+        try:
+            resp = await self.r.xreadgroup(
+                self.group, self.consumer, {self.key: ">"}, count=self.count, block=self.block_ms
+            )
+        except redis.ResponseError as e:
+            # Stream or group is gone (Redis restart, FLUSHALL, key deleted): recreate it
+            if "NOGROUP" not in str(e):
+                raise
+            logger.warning(f"{e}, recreating group {self.group}")
+            await self.ensure_group()
+            return None
+        if time.time() - self._last_lag > self.lag_every:
+            self._last_lag = time.time()
+            try:
+                await self.refresh_lag()
+            except Exception as e:
+                logger.warning(f"XINFO failed: {e}")
+        if not resp:
+            return None
+
+        ids, latest, oldest = [], {}, None
+        for _, entries in resp:
+            for entry_id, fields in entries:
+                ids.append(entry_id)
+                sent_at, ticks = unpack_ticks(fields[b"f"])
+                oldest = sent_at if oldest is None else min(oldest, sent_at)
+                self.received += len(ticks)
+                for tick in ticks:
+                    # latest value wins, but keep each minute's last tick so bars still close right
+                    latest[(tick[0], tick[3] // 60000)] = tick
+        await self.r.xack(self.key, self.group, *ids)
+
+        self.delivered += len(latest)
+        return oldest, list(latest.values())
+
+
+async def iter_frames(r, shard, transport=TICK_TRANSPORT, consumer=None):
+    """Yields (sent_at, ticks) for one shard from pub/sub or the shard stream."""
+    if transport == "streams":
+        consumer = consumer or StreamConsumer(r, shard)
+        await consumer.ensure_group()
+        while True:
+            batch = await consumer.read()
+            if batch:
+                yield batch
+    else:
+        pubsub = r.pubsub()
+        await pubsub.subscribe(channel(shard))
+        async for message in pubsub.listen():
+            if message['type'] == 'message':
+                yield unpack_ticks(message['data'])
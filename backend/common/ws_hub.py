@@ -0,0 +1,309 @@
+"""
+Subscription-filtered WebSocket fan-out.
+
+The API process keeps one Redis subscription and pushes every update through
+a SubscriptionHub. Each client holds a set of (topic, symbol) subscriptions,
+and an update only goes to clients subscribed to its topic for that symbol
+(or for "*", all symbols).
+
+Topics and their per-symbol payloads:
+    ticks         price tick (format of the API's tick source)
+    indicators    {tf: values} of the recomputed timeframes
+    klines:<tf>   forming candle [t, o, h, l, c, v]
+
+Updates are not sent one frame each. Every client gets at most one batch frame
+per frame_ms (WS_FRAME_MS, 250 by default), holding only the symbols that
+changed since its previous frame, latest value each:
+    {"type": "batch", "ticks": {symbol: payload}, "klines:1h": {symbol: payload}, ...}
+
+Client protocol (JSON text frames):
+    {"op": "subscribe",   "topics": ["ticks", "klines:1h"], "symbols": ["BTC/USDT"]}
+    {"op": "unsubscribe", "topics": ["ticks"], "symbols": ["*"]}
+    {"op": "options",     "frame_ms": 100}
+    {"op": "list"}
+Omitted "symbols" means "*". Every command is answered with
+{"op": "subscriptions", "subs": {topic: [symbols]}, "frame_ms"} or {"op": "error", "detail"}.
+A new client starts with DEFAULT_SUBS (all ticks).
+
+Delivery never waits on a client: publish() only enqueues. Every connection
+has an outbound queue drained by its own sender task. Pending updates are
+conflated per (topic, symbol), so a client that keeps up never holds more than
+one entry per subscribed key, however wide its subscriptions. Only while the
+previous frame is still unsent a full frame interval later are new keys past
+WS_QUEUE_MAX dropped. A client is disconnected when that lasts WS_EVICT_SEC,
+or a single frame takes longer than WS_EVICT_SEC to send.
+
+Frames compress well with permessage-deflate, which uvicorn negotiates by
+default (--ws-per-message-deflate).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+INDICATOR_CHANNEL = "indicator_updates"
+ALL = "*"
+DEFAULT_SUBS = (("ticks", ALL),)
+QUEUE_MAX = int(os.getenv("WS_QUEUE_MAX", "1000"))
+EVICT_SEC = float(os.getenv("WS_EVICT_SEC", "10"))
+FRAME_MS = int(os.getenv("WS_FRAME_MS", "250"))
+FRAME_MS_RANGE = (50, 5000)
+CLOSE_TRY_AGAIN = 1013
+
+logger = logging.getLogger("WsHub")
+
+
+class ClientQueue:
+    """Bounded, conflating outbound queue of one connection, sent as throttled batch frames."""
+
+    def __init__(self, ws, counters, maxsize=QUEUE_MAX, frame_ms=FRAME_MS, send_timeout=EVICT_SEC):
+        self.ws = ws
+        self.counters = counters  # the hub's totals
+        self.maxsize = maxsize
+        self.frame_ms = frame_ms
+        self.send_timeout = send_timeout
+        self.pending = OrderedDict()  # (topic, symbol) -> '"symbol":payload', oldest first
+        self.last = {}                # (topic, symbol) -> fragment in the previous frames
+        self.replies = []
+        self.ready = asyncio.Event()
+        self.full_since = None
+        self.sending_since = None  # a batch frame is being sent since
+        self.timed_out = False
+        self.task = None
+
+    def put(self, key, fragment):
+        """Returns False if the update was dropped because the client is behind and the queue is full."""
+        if key in self.pending:
+            self.pending[key] = fragment  # keeps its place in line
+            self.counters["conflated"] += 1
+            return True
+        if self.last.get(key) == fragment:
+            return True  # nothing changed since the client last saw it
+        if len(self.pending) >= self.maxsize and self.behind():
+            self.counters["dropped"] += 1
+            if self.full_since is None:
+                self.full_since = time.monotonic()
+            return False
+        self.pending[key] = fragment
+        self.ready.set()
+        return True
+
+    def reply(self, text):
+        self.replies.append(text)
+        self.ready.set()
+
+    def behind(self):
+        # The previous frame is still on the wire when the next one is due
+        return self.sending_since is not None and time.monotonic() - self.sending_since > self.frame_ms / 1000
+
+    def stalled(self, evict_after):
+        return self.full_since is not None and time.monotonic() - self.full_since > evict_after
+
+    def take_frame(self):
+        """Drains the pending updates into one batch frame."""
+        topics = {}
+        for key, fragment in self.pending.items():
+            topics.setdefault(key[0], []).append(fragment)
+            self.last[key] = fragment
+        self.pending.clear()
+        self.full_since = None
+        body = ",".join(f'"{topic}":{{{",".join(parts)}}}' for topic, parts in topics.items())
+        return '{"type":"batch",' + body + '}'
+
+    async def _send(self, text):
+        try:
+            await asyncio.wait_for(self.ws.send_text(text), self.send_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out = True
+            raise
+        self.counters["frames"] += 1
+
+    async def run(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            while self.replies:
+                await self._send(self.replies.pop(0))
+            if self.pending:
+                self.counters["updates"] += len(self.pending)
+                self.sending_since = time.monotonic()
+                try:
+                    await self._send(self.take_frame())
+                finally:
+                    self.sending_since = None
+            # Throttle: whatever arrives meanwhile goes into the next frame
+            await asyncio.sleep(self.frame_ms / 1000)
+
+
+class SubscriptionHub:
+    def __init__(self, timeframes, normalize=None, default_subs=DEFAULT_SUBS,
+                 queue_max=QUEUE_MAX, evict_after=EVICT_SEC, frame_ms=FRAME_MS):
+        self.topics = {"ticks", "indicators"} | {f"klines:{tf}" for tf in timeframes}
+        self.normalize = normalize or (lambda s: s)
+        self.default_subs = default_subs
+        self.queue_max = queue_max
+        self.evict_after = evict_after
+        self.frame_ms = frame_ms
+        self.clients = {}  # ws -> {(topic, symbol), ...}
+        self.index = {}    # topic -> {symbol: {ws, ...}}
+        self.queues = {}   # ws -> ClientQueue
+        self.counters = {"frames": 0, "updates": 0, "conflated": 0, "dropped": 0, "evicted": 0}
+
+    def __len__(self):
+        return len(self.clients)
+
+    # --- connections ---
+
+    def add(self, ws):
+        """Registers a connection and starts its sender task (call from the event loop)."""
+        self.clients[ws] = set()
+        for topic, symbol in self.default_subs:
+            self._sub(ws, topic, symbol)
+        queue = self.queues[ws] = ClientQueue(ws, self.counters, self.queue_max, self.frame_ms, self.evict_after)
+        queue.task = asyncio.get_running_loop().create_task(queue.run())
+        queue.task.add_done_callback(lambda _: self._finished(ws, queue))
+
+    def _finished(self, ws, queue):
+        # A failed send ends the task; a timed out one means the client is too slow
+        if not queue.task.cancelled():
+            queue.task.exception()  # retrieved: a dead socket is expected, not an error
+        if queue.timed_out and self.queues.get(ws) is queue:
+            self.evict(ws)
+        else:
+            self.remove(ws)
+
+    def remove(self, ws):
+        for topic, symbol in self.clients.pop(ws, ()):
+            self._unindex(ws, topic, symbol)
+        queue = self.queues.pop(ws, None)
+        if queue is not None and not queue.task.done():
+            queue.task.cancel()
+
+    def evict(self, ws):
+        logger.warning(f"Evicting slow WebSocket client ({len(self.queues[ws].pending)} pending)")
+        self.counters["evicted"] += 1
+        self.remove(ws)
+        asyncio.get_running_loop().create_task(self._close(ws))
+
+    @staticmethod
+    async def _close(ws):
+        try:
+            await asyncio.wait_for(ws.close(code=CLOSE_TRY_AGAIN), 5)
+        except Exception:
+            pass
+
+    def reply(self, ws, message):
+        """Sends a command reply ahead of the next batch frame."""
+        queue = self.queues.get(ws)
+        if queue is not None:
+            queue.reply(json.dumps(message))
+
+    # --- subscriptions ---
+
+    def _sub(self, ws, topic, symbol):
+        self.clients[ws].add((topic, symbol))
+        self.index.setdefault(topic, {}).setdefault(symbol, set()).add(ws)
+
+    def _unindex(self, ws, topic, symbol):
+        by_symbol = self.index.get(topic, {})
+        clients = by_symbol.get(symbol)
+        if clients is None:
+            return
+        clients.discard(ws)
+        if not clients:
+            del by_symbol[symbol]
+            if not by_symbol:
+                del self.index[topic]
+
+    def subscriptions(self, ws):
+        subs = {}
+        for topic, symbol in sorted(self.clients.get(ws, ())):
+            subs.setdefault(topic, []).append(symbol)
+        return {"op": "subscriptions", "subs": subs, "frame_ms": self.queues[ws].frame_ms}
+
+    def command(self, ws, text):
+        """Applies one client command; returns the reply dict."""
+        try:
+            cmd = json.loads(text)
+            op = cmd.get("op")
+            if op == "list":
+                return self.subscriptions(ws)
+            if op == "options":
+                low, high = FRAME_MS_RANGE
+                self.queues[ws].frame_ms = min(max(int(cmd.get("frame_ms", self.frame_ms)), low), high)
+                return self.subscriptions(ws)
+            if op not in ("subscribe", "unsubscribe"):
+                raise ValueError(f"unknown op {op!r}")
+            topics = cmd.get("topics") or []
+            unknown = [t for t in topics if t not in self.topics]
+            if unknown:
+                raise ValueError(f"unknown topics {unknown}")
+            symbols = [s if s == ALL else self.normalize(s) for s in (cmd.get("symbols") or [ALL])]
+        except (ValueError, AttributeError, TypeError) as e:
+            return {"op": "error", "detail": str(e)}
+
+        subs = self.clients[ws]
+        if op == "subscribe":
+            # A (re)subscribed topic gets current values even if they did not change
+            queue = self.queues[ws]
+            queue.last = {k: v for k, v in queue.last.items() if k[0] not in topics}
+        for topic in topics:
+            for symbol in symbols:
+                if op == "subscribe":
+                    self._sub(ws, topic, symbol)
+                elif (topic, symbol) in subs:
+                    subs.discard((topic, symbol))
+                    self._unindex(ws, topic, symbol)
+        return self.subscriptions(ws)
+
+    # --- fan-out ---
+
+    def recipients(self, topic, symbol):
+        by_symbol = self.index.get(topic)
+        if not by_symbol:
+            return ()
+        exact, wildcard = by_symbol.get(symbol), by_symbol.get(ALL)
+        if exact and wildcard:
+            return exact | wildcard
+        return exact or wildcard or ()
+
+    def publish(self, topic, symbol, build):
+        """
+        Queues the payload build() (a JSON string) for the subscribers of (topic, symbol).
+        It is only serialized if someone is subscribed, and only once for all of them.
+        Never blocks: slow clients conflate, drop once a frame is overdue, then get evicted.
+        """
+        clients = self.recipients(topic, symbol)
+        if not clients:
+            return 0
+        fragment = f"{json.dumps(symbol)}:{build()}"
+        key = (topic, symbol)
+        for ws in list(clients):
+            queue = self.queues.get(ws)
+            if queue is not None and not queue.put(key, fragment) and queue.stalled(self.evict_after):
+                self.evict(ws)
+        return len(clients)
+
+    def dispatch_indicators(self, data):
+        """
+        One indicator_updates message: {"s", "i": {tf: values}, "k": {tf: bar}}
+        -> an "indicators" update and one "klines:<tf>" update per candle.
+        """
+        symbol = data["s"]
+        inds = data.get("i")
+        if inds:
+            self.publish("indicators", symbol, lambda: json.dumps(inds))
+        for tf, bar in (data.get("k") or {}).items():
+            self.publish(f"klines:{tf}", symbol, lambda: json.dumps(bar))
+
+    def stats(self):
+        depths = [len(q.pending) for q in self.queues.values()]
+        return {
+            "clients": len(self.clients),
+            "queued": sum(depths),
+            "max_depth": max(depths, default=0),
+            "stalled": sum(1 for q in self.queues.values() if q.full_since is not None),
+            **self.counters,
+        }
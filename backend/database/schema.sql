@@ -14,6 +14,8 @@ CREATE TABLE IF NOT EXISTS candles (
 -- Convert to hypertable
 SELECT create_hypertable('candles', 'time', chunk_time_interval => INTERVAL '1 week', if_not_exists => TRUE);
 
+-- The bulk candle writer stages in a per-connection temp table (common/candle_writer.py)
+
 -- Status Table (Stateful Engine Output)
 CREATE TABLE IF NOT EXISTS coin_status (
     symbol TEXT PRIMARY KEY,
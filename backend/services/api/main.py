@@ -1,4 +1,4 @@
-from fastapi import FastAPI, WebSocket
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
 import json
@@ -7,6 +7,8 @@ import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from common.database import db
+from common.tick_bus import CHANNEL, unpack_ticks
+from common.ws_hub import INDICATOR_CHANNEL, SubscriptionHub
 
 app = FastAPI()
 
@@ -17,9 +19,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def normalize_symbol(symbol):
+    symbol = symbol.upper()
+    return symbol if '/' in symbol else symbol.replace('USDT', '/USDT')
+
+# Per-client (topic, symbol) subscriptions; protocol in common/ws_hub.py
+hub = SubscriptionHub(['1m'], normalize=normalize_symbol)
+
+async def redis_listener():
+    """One subscription per API process: tick bus shards + indicator updates -> hub."""
+    pubsub = db.redis_bin.pubsub()
+    await pubsub.psubscribe(f"{CHANNEL}:*")
+    await pubsub.subscribe(INDICATOR_CHANNEL)
+    async for msg in pubsub.listen():
+        try:
+            if msg['type'] == 'pmessage':
+                _, ticks = unpack_ticks(msg['data'])
+                for s, p, v, t in ticks:
+                    hub.publish("ticks", s, lambda: json.dumps({"p": p, "v": v, "t": t}))
+            elif msg['type'] == 'message':
+                hub.dispatch_indicators(json.loads(msg['data']))
+        except Exception as e:
+            print(f"❌ WS fan-out error: {e}", flush=True)
+
 @app.on_event("startup")
 async def startup():
     await db.connect()
+    app.state.listener = asyncio.create_task(redis_listener())
 
 @app.get("/api/coins")
 async def get_coins():
@@ -36,15 +62,26 @@ async def get_coins():
         res.append(d)
     return res
 
+@app.get("/api/metrics/streamer")
+async def get_streamer_metrics():
+    # Candle writer queue depth, merges/drops, flush latency, rows/sec (refreshed every 10s)
+    return await db.redis.hgetall("metrics:streamer")
+
+@app.get("/api/metrics/ws")
+async def get_ws_metrics():
+    # Clients, outbound queue depth, sent / conflated / dropped / evicted
+    return hub.stats()
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    pubsub = db.redis.pubsub()
-    await pubsub.subscribe("crypto_ticks")
-    
+    hub.add(websocket)
     try:
-        async for msg in pubsub.listen():
-            if msg['type'] == 'message':
-                await websocket.send_text(msg['data'])
-    except:
+        while True:
+            # subscribe / unsubscribe / list commands
+            text = await websocket.receive_text()
+            hub.reply(websocket, hub.command(websocket, text))
+    except WebSocketDisconnect:
         pass
+    finally:
+        hub.remove(websocket)
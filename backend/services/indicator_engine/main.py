@@ -6,6 +6,7 @@ import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from common.database import db
+from common.tick_bus import TICK_SHARDS, shard_of
 from worker import start_worker
 
 async def main():
@@ -29,11 +30,10 @@ async def main():
     
     print(f"✅ Loaded {len(symbols)} symbols.")
     
-    # Launch Workers
-    cpu = multiprocessing.cpu_count()
-    num_workers = min(cpu, 8)
-    chunk_size = len(symbols) // num_workers + 1
-    chunks = [symbols[i:i + chunk_size] for i in range(0, len(symbols), chunk_size)]
+    # Launch Workers: one per tick bus shard, so each only receives its own symbols
+    chunks = [[] for _ in range(TICK_SHARDS)]
+    for s in symbols:
+        chunks[shard_of(s)].append(s)
     
     processes = []
     for i, chunk in enumerate(chunks):
@@ -1,7 +1,6 @@
 import asyncio
 import json
 import pandas as pd
-import pandas_ta as ta
 import numpy as np
 import warnings
 import sys
@@ -10,6 +9,11 @@ import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from common.database import db
+from common.candle_store import CandleStore, FIELDS
+from common.indicator_state import IndicatorState
+from common.tick_bus import TICK_TRANSPORT, StreamConsumer, iter_frames
+from common.conflation import Conflator, load_cadence
+from common.ws_hub import INDICATOR_CHANNEL
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
@@ -17,7 +21,8 @@ async def worker_task(worker_id, symbols):
     print(f"🔧 Worker {worker_id}: Init ({len(symbols)} coins)", flush=True)
     
     await db.connect()
-    cache = {}
+    store = CandleStore(symbols, capacity=500)
+    states = {s: IndicatorState() for s in symbols}
     
     # WARMUP
     if symbols:
@@ -34,79 +39,125 @@ async def worker_task(worker_id, symbols):
         
         df_master = pd.DataFrame(rows, columns=['symbol', 'time', 'open', 'high', 'low', 'close', 'volume'])
         if not df_master.empty:
-            df_master['time'] = pd.to_datetime(df_master['time'])
-            df_master.set_index('time', inplace=True)
-            for s in symbols:
-                df = df_master[df_master['symbol'] == s]
-                if not df.empty:
-                    # Keep necessary columns
-                    cache[s] = df[['open', 'high', 'low', 'close', 'volume']].astype(float)
+            df_master['time'] = pd.to_datetime(df_master['time'], utc=True).astype('int64') // 10**6
+            for s, df in df_master.groupby('symbol'):
+                if s not in store: continue
+                store.load(s, df['time'].values, *(df[f].astype(float).values for f in FIELDS))
+        
+        # Seed incremental state from closed bars; the last bar is the forming one
+        for s in symbols:
+            n = store.count[store.index[s]]
+            if n > 1:
+                states[s].seed(store.view(s, 'high')[:-1], store.view(s, 'low')[:-1], store.view(s, 'close')[:-1])
     
-    print(f"✅ Worker {worker_id}: Ready.", flush=True)
+    print(f"✅ Worker {worker_id}: Ready. Candle store {store.nbytes / 2**20:.1f} MB", flush=True)
     
-    pubsub = db.redis.pubsub()
-    await pubsub.subscribe("crypto_ticks")
+    # Only this worker's shard: binary frames via pub/sub or a consumer group stream
+    consumer = StreamConsumer(db.redis_bin, worker_id) if TICK_TRANSPORT == "streams" else None
+    # Ticks only touch the store; indicators are recomputed for dirty symbols on a cadence
+    conflator = Conflator(load_cadence(['1m']))
     
     # Buffer for DB writes
     updates = {}
-    last_write = time.time()
+    
+    # Tick delivery latency (streamer publish to worker receive)
+    lat = {'sum': 0.0, 'max': 0.0, 'frames': 0}
+    # Frames that failed to apply; the first one per report interval is logged with its error
+    errors = {'frames': 0, 'logged': False}
 
-    async for message in pubsub.listen():
-        if message['type'] == 'message':
+    async def consume_frames():
+        async for sent_at, ticks in iter_frames(db.redis_bin, worker_id, consumer=consumer):
             try:
-                data = json.loads(message['data'])
-                symbol = data['s']
-                if symbol not in symbols: continue
-                
-                price = float(data['p'])
-                ts = pd.to_datetime(data['t'], unit='ms').floor('1min')
+                for symbol, price, vol, t in ticks:
+                    if symbol not in store: continue
+                    ts = t // 60000 * 60000
+                    
+                    # Update Cache (O(1), no frame copies)
+                    if store.update(symbol, ts, price):
+                        # Minute closed: fold the finished bar into the state
+                        prev = store.bar(symbol, 1)
+                        if prev:
+                            states[symbol].commit(prev[2], prev[3], prev[4])
+                    conflator.mark(symbol)
                 
-                # Update Cache
-                if symbol not in cache:
-                    cache[symbol] = pd.DataFrame(
-                        {'open': [price], 'high': [price], 'low': [price], 'close': [price], 'volume': [0.0]}, 
-                        index=[ts]
+                delay = time.time() - sent_at
+                lat['sum'] += delay
+                lat['max'] = max(lat['max'], delay)
+                lat['frames'] += 1
+            except Exception as e:
+                errors['frames'] += 1
+                if not errors['logged']:
+                    errors['logged'] = True
+                    print(f"❌ Worker {worker_id}: failed to apply tick frame: {e!r}", flush=True)
+
+    async def consume():
+        # A dropped subscription (Redis restart, NOGROUP) resubscribes instead of ending the worker
+        while True:
+            try:
+                await consume_frames()
+                print(f"⚠️ Worker {worker_id}: tick bus subscription ended, resubscribing", flush=True)
+            except Exception as e:
+                print(f"❌ Worker {worker_id}: tick bus error: {e!r}, resubscribing", flush=True)
+            await asyncio.sleep(1)
+
+    consume_task = asyncio.create_task(consume())
+    last_write = time.time()
+    last_report = time.time()
+
+    while not consume_task.done():
+        await asyncio.sleep(conflator.interval)
+        try:
+            now = time.time()
+            for tf, dirty in conflator.due(now).items():
+                for symbol in dirty:
+                    # CALCULATION (1m): provisional update of the forming candle, O(1)
+                    _, _, high, low, close, _ = store.bar(symbol)
+                    values = states[symbol].update(high, low, close)
+                    if values['rsi'] is None: continue
+                    
+                    # Buffer update
+                    updates[symbol] = (close, json.dumps(values), store.bar(symbol))
+            
+            if now - last_report > 60:
+                if lat['frames']:
+                    print(f"📈 Worker {worker_id}: {lat['frames']} frames, latency avg {lat['sum'] / lat['frames'] * 1000:.1f} ms, max {lat['max'] * 1000:.1f} ms", flush=True)
+                print(f"📈 Worker {worker_id}: {conflator.stats()}", flush=True)
+                if errors['frames']:
+                    print(f"❌ Worker {worker_id}: {errors['frames']} tick frames failed", flush=True)
+                errors.update(frames=0, logged=False)
+                if consumer:
+                    print(
+                        f"📈 Worker {worker_id}: stream lag {consumer.lag}, pending {consumer.pending}, "
+                        f"ticks {consumer.received} -> {consumer.delivered} after coalescing", flush=True
                     )
-                else:
-                    df = cache[symbol]
-                    if ts in df.index:
-                        df.at[ts, 'close'] = price
-                        df.at[ts, 'high'] = max(df.at[ts, 'high'], price)
-                        df.at[ts, 'low'] = min(df.at[ts, 'low'], price)
-                    else:
-                        new_row = pd.DataFrame(
-                            {'open': [price], 'high': [price], 'low': [price], 'close': [price], 'volume': [0.0]}, 
-                            index=[ts]
-                        )
-                        df = pd.concat([df, new_row])
-                        if len(df) > 500: df = df.iloc[-500:]
-                        cache[symbol] = df
+                lat.update(sum=0.0, max=0.0, frames=0)
+                conflator.reset_stats()
+                last_report = now
+            
+            # Flush every 0.5s or 100 items
+            if updates and (len(updates) > 100 or (now - last_write > 0.5)):
+                # Convert to list for executemany
+                batch = [(p, i, s) for s, (p, i, _) in updates.items()]
+                q = "UPDATE coin_status SET current_price=$1, indicators_1m=$2, updated_at=NOW() WHERE symbol=$3"
                 
-                # CALCULATION (1m)
-                df = cache[symbol]
-                if len(df) < 20: continue
+                async with db.pool.acquire() as conn:
+                    await conn.executemany(q, batch)
                 
-                # Example: RSI 14
-                rsi = ta.rsi(df['close'], length=14)
-                rsi_val = rsi.iloc[-1] if rsi is not None and not pd.isna(rsi.iloc[-1]) else None
+                # Same values to the API's WebSocket subscribers (indicators, klines:1m)
+                async with db.redis_bin.pipeline(transaction=False) as pipe:
+                    for s, (_, i, bar) in updates.items():
+                        k = [int(bar[0]) // 1000, *map(float, bar[1:])]
+                        pipe.publish(INDICATOR_CHANNEL, f'{{"s":{json.dumps(s)},"i":{{"1m":{i}}},"k":{{"1m":{json.dumps(k)}}}}}')
+                    await pipe.execute()
                 
-                # Buffer update
-                updates[symbol] = (price, json.dumps({'rsi': rsi_val}))
+                updates.clear()
+                last_write = time.time()
                 
-                # Flush every 0.5s or 100 items
-                if len(updates) > 100 or (time.time() - last_write > 0.5):
-                    # Convert to list for executemany
-                    batch = [(p, i, s) for s, (p, i) in updates.items()]
-                    q = "UPDATE coin_status SET current_price=$1, indicators_1m=$2, updated_at=NOW() WHERE symbol=$3"
-                    
-                    async with db.pool.acquire() as conn:
-                        await conn.executemany(q, batch)
-                    
-                    updates.clear()
-                    last_write = time.time()
-                    
-            except Exception as e:
-                pass
+        except Exception as e:
+            print(f"❌ Worker {worker_id}: compute/write error: {e!r}", flush=True)
+
+    # consume() only ends by raising (e.g. cancelled): surface it instead of exiting silently
+    consume_task.result()
 
 def start_worker(worker_id, symbols):
     import uvloop
@@ -3,101 +3,82 @@ import json
 import logging
 import sys
 import os
-from datetime import datetime, timezone
+import time
 
 # Add parent dir to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
 from common.database import db
+from common.tick_bus import publish_ticks
+from common.candle_writer import CandleQueue, CandleWriter
+from common.minute_bars import MinuteBarBuilder
 import websockets
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
 logger = logging.getLogger("Streamer")
 
-async def db_writer(queue):
-    """Batched DB writer"""
-    batch = []
-    while True:
-        try:
-            # Wait for first item
-            item = await queue.get()
-            batch.append(item)
-            
-            # Drain
-            try:
-                while not queue.empty() and len(batch) < 2000:
-                    batch.append(queue.get_nowait())
-            except: pass
-            
-            if batch:
-                try:
-                    query = """
-                        INSERT INTO candles (time, symbol, open, high, low, close, volume)
-                        VALUES ($1, $2, $3, $4, $5, $6, $7)
-                        ON CONFLICT (time, symbol) DO UPDATE SET
-                            high = GREATEST(candles.high, EXCLUDED.high),
-                            low = LEAST(candles.low, EXCLUDED.low),
-                            close = EXCLUDED.close,
-                            volume = EXCLUDED.volume
-                    """
-                    async with db.pool.acquire() as conn:
-                        await conn.executemany(query, batch)
-                except Exception as e:
-                    logger.error(f"DB Write Error: {e}")
-                
-                batch = []
-            
-            await asyncio.sleep(1)
-            
-        except Exception as e:
-            logger.error(f"Writer Loop Error: {e}")
-            await asyncio.sleep(1)
-
 async def run():
     await db.connect()
-    queue = asyncio.Queue()
-    asyncio.create_task(db_writer(queue))
+    # Bounded: while the DB stalls, rows for the same (minute, symbol) merge, the oldest drop last
+    queue = CandleQueue(maxsize=int(os.getenv("CANDLE_QUEUE_MAX", "50000")))
+    # Batched DB writer: dedup per (time, symbol), COPY to staging, one merge per flush
+    writer = CandleWriter(db.pool)
+    asyncio.create_task(writer.run(queue))
+    # depth / merges / drops / flush latency / rows/sec -> Redis hash metrics:streamer
+    asyncio.create_task(writer.report(queue, db.redis))
+    # True 1m bars from last price / 24h volume deltas, one record per symbol per minute
+    bars = MinuteBarBuilder()
     
-    url = "wss://stream.binance.com:9443/ws/!miniTicker@arr"
+    # Overridable so the replay harness (benchmarks/replay.py) can stand in for Binance
+    url = os.getenv("BINANCE_WS_URL", "wss://stream.binance.com:9443/ws/!miniTicker@arr")
     
-    while True:
-        try:
-            async with websockets.connect(url) as ws:
-                logger.info("🚀 Connected to Binance")
-                while True:
-                    msg = await ws.recv()
-                    data = json.loads(msg)
-                    
-                    pipeline = db.redis.pipeline()
-                    
-                    for t in data:
-                        s = t['s']
-                        if not s.endswith('USDT'): continue
+    try:
+        while True:
+            try:
+                async with websockets.connect(url) as ws:
+                    logger.info("🚀 Connected to Binance")
+                    while True:
+                        msg = await ws.recv()
+                        data = json.loads(msg)
+                        
+                        ticks = []
                         
-                        symbol = f"{s[:-4]}/USDT"
-                        price = float(t['c'])
-                        vol = float(t['v'])
-                        ts_ms = t['E']
+                        for t in data:
+                            s = t['s']
+                            if not s.endswith('USDT'): continue
+                            
+                            symbol = f"{s[:-4]}/USDT"
+                            price = float(t['c'])
+                            vol = float(t['v'])
+                            ts_ms = t['E']
+                            
+                            # PubSub for Engines/UI (packed per shard below)
+                            ticks.append((symbol, price, vol, ts_ms))
+                            
+                            # DB Record: only when the symbol's minute closes
+                            closed = bars.update(symbol, ts_ms, price, vol)
+                            if closed:
+                                queue.put_nowait(closed)
                         
-                        # PubSub for Engines/UI
-                        payload = {
-                            "s": symbol,
-                            "p": price,
-                            "v": vol,
-                            "t": ts_ms
-                        }
-                        pipeline.publish("crypto_ticks", json.dumps(payload))
+                        # Symbols that went quiet: close their minute anyway
+                        for record in bars.close_stale(int(time.time() * 1000)):
+                            queue.put_nowait(record)
                         
-                        # DB Record
-                        dt = datetime.fromtimestamp(ts_ms/1000, tz=timezone.utc)
-                        record = (dt, symbol, float(t['o']), float(t['h']), float(t['l']), price, vol)
-                        queue.put_nowait(record)
+                        # One binary frame per shard instead of one JSON message per symbol
+                        pipeline = db.redis.pipeline(transaction=False)
+                        publish_ticks(pipeline, ticks)
+                        await pipeline.execute()
                         
-                    await pipeline.execute()
-                    
-        except Exception as e:
-            logger.error(f"Connection error: {e}")
-            await asyncio.sleep(5)
+            except Exception as e:
+                logger.error(f"Connection error: {e}")
+                await asyncio.sleep(5)
+    finally:
+        # Final flush of the forming minutes (and anything still queued)
+        for record in bars.flush():
+            writer.add(record)
+        while not queue.empty():
+            writer.add(queue.get_nowait())
+        await writer.flush()
 
 if __name__ == "__main__":
     asyncio.run(run())
@@ -0,0 +1,125 @@
+"""
+LRU/TTL кэш ответов /api/klines.
+
+Ключ — (symbol, interval, limit, start, end, before). Закрытые свечи не меняются,
+поэтому страница истории (upper в прошлом) живет до TTL истории. У «живой»
+страницы (без end/before) последняя свеча формируется: ее high/low/close
+патчатся тиками из crypto_updates, а на границе бакета запись считается
+устаревшей и перечитывается из БД (закрытая свеча берется уже из базы).
+
+Объем формирующейся свечи тиками не патчится (в тике объем за 24h) — он
+обновляется при перечитывании, не реже LIVE_TTL.
+
+Строки хранятся как кортежи (time_sec, open, high, low, close, volume),
+от новых к старым — как их возвращает SQL.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.getenv("KLINES_CACHE_SIZE", "512"))
+LIVE_TTL = float(os.getenv("KLINES_CACHE_LIVE_TTL", "60"))
+HISTORY_TTL = float(os.getenv("KLINES_CACHE_HISTORY_TTL", "3600"))
+
+
+class _Entry:
+    __slots__ = ("rows", "forming_start", "bucket_sec", "expires")
+
+    def __init__(self, rows, forming_start, bucket_sec, ttl):
+        self.rows = rows
+        self.forming_start = forming_start  # unix sec начала формирующегося бакета; None — страница истории
+        self.bucket_sec = bucket_sec
+        self.expires = time.monotonic() + ttl
+
+
+class KlinesCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.live = {}  # symbol -> {key, ...} живых страниц для патча тиками
+        self.inflight = {}  # key -> Task: одновременные промахи по одному ключу ждут один запрос
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.patches = 0
+
+    def get(self, key, forming_start):
+        """Строки или None. forming_start — текущий формирующийся бакет (для живых страниц)."""
+        entry = self.entries.get(key)
+        if entry is None or time.monotonic() > entry.expires or (
+            entry.forming_start is not None and entry.forming_start != forming_start
+        ):
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry.rows
+
+    async def load(self, key, loader):
+        """Выполняет loader() один раз на ключ, даже если промахнулись сразу несколько запросов."""
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # shield: отключившийся клиент не отменяет запрос остальным
+        return await asyncio.shield(task)
+
+    def put(self, key, rows, forming_start, bucket_sec, ttl=None):
+        """rows — список кортежей от новых к старым; forming_start=None для закрытой истории."""
+        if key in self.entries:
+            self._drop(key)
+        if ttl is None:
+            ttl = LIVE_TTL if forming_start is not None else HISTORY_TTL
+        self.entries[key] = _Entry(rows, forming_start, bucket_sec, ttl)
+        if forming_start is not None:
+            self.live.setdefault(key[0], set()).add(key)
+        while len(self.entries) > self.max_entries:
+            self._drop(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _drop(self, key):
+        self.entries.pop(key, None)
+        keys = self.live.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.live[key[0]]
+
+    def apply_tick(self, symbol, k):
+        """k из crypto_updates: [ts_ms, o, h, l, c, v]. Патчит формирующуюся свечу живых страниц."""
+        keys = self.live.get(symbol)
+        if not keys or k[4] is None:
+            return
+        ts = k[0] // 1000
+        price = float(k[4])
+        for key in list(keys):
+            entry = self.entries.get(key)
+            if entry is None or not (entry.forming_start <= ts < entry.forming_start + entry.bucket_sec):
+                continue
+            rows = entry.rows
+            if rows and rows[0][0] == entry.forming_start:
+                t, o, h, l, _, v = rows[0]
+                rows[0] = (t, o, max(h, price), min(l, price), price, v)
+            else:
+                # В БД еще нет ни одной закрытой минуты бакета — открываем свечу по тику
+                rows.insert(0, (entry.forming_start, price, price, price, price, 0.0))
+                del rows[key[2]:]  # не больше limit
+            self.patches += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+            "patches": self.patches,
+        }
+
+
+klines_cache = KlinesCache()
@@ -8,6 +8,9 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from common.database import db
 from api_v2.routers import klines, screener, ws
+from api_v2.snapshot import snapshot
+from api_v2.klines_cache import klines_cache
+from api_v2.ticks import listen_ticks
 
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
@@ -16,10 +19,17 @@ from fastapi.middleware.gzip import GZipMiddleware
 async def lifespan(app: FastAPI):
     print("🚀 API v2: Starting lifespan", flush=True)
     await db.connect()
-    # Запускаем мост Redis -> WebSocket
-    redis_task = asyncio.create_task(ws.start_redis_listener())
+    # Снимок скринера: сверка с БД + тики, /api/coins отдается из памяти
+    snapshot_task = asyncio.create_task(snapshot.run())
+    # Одна подписка Redis: тики -> снимок скринера, кэш klines и WebSocket-клиенты;
+    # индикаторы и свечи ТФ -> WebSocket-клиенты по их подпискам
+    ticks_task = asyncio.create_task(listen_ticks(
+        [snapshot.apply_tick, klines_cache.apply_tick, ws.on_tick],
+        [snapshot.apply_indicators, ws.on_indicators],
+    ))
     yield
-    redis_task.cancel()
+    ticks_task.cancel()
+    snapshot_task.cancel()
     await db.close()
     print("🛑 API v2: Lifespan closed", flush=True)
 
@@ -1,80 +1,239 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Response
 from common.database import db
-from datetime import datetime, timedelta
+from api_v2.klines_cache import klines_cache, LIVE_TTL
+from datetime import datetime, timedelta, timezone
+from array import array
+import json
 
 router = APIRouter()
 
+# Интервал -> (размер бакета, источник). Источник — самый крупный continuous aggregate,
+# на который интервал делится без остатка (см. common/schema.py); None — сырые 1m свечи.
+INTERVALS = {
+    "1m": (timedelta(minutes=1), None),
+    "3m": (timedelta(minutes=3), None),
+    "5m": (timedelta(minutes=5), "candles_5m"),
+    "15m": (timedelta(minutes=15), "candles_15m"),
+    "30m": (timedelta(minutes=30), "candles_15m"),
+    "1h": (timedelta(hours=1), "candles_1h"),
+    "4h": (timedelta(hours=4), "candles_4h"),
+    "1d": (timedelta(days=1), "candles_1d"),
+    "1w": (timedelta(weeks=1), "candles_1d"),
+}
+
+# Насколько материализация агрегата может отставать от NOW() (end_offset + schedule + родитель, с запасом).
+# Все, что новее, считается из candles.
+REFRESH_LAG = {
+    "candles_5m": timedelta(minutes=15),
+    "candles_15m": timedelta(hours=1),
+    "candles_1h": timedelta(hours=3),
+    "candles_4h": timedelta(hours=12),
+    "candles_1d": timedelta(days=2),
+}
+
+# Начало отсчета бакетов time_bucket в TimescaleDB (понедельник) — для 1w это важно
+BUCKET_ORIGIN = datetime(2000, 1, 3, tzinfo=timezone.utc)
+
+COLUMNS = ("time", "open", "high", "low", "close", "volume")
+
+# Границы времени приходят параметрами ($4 lower, $5 upper, $6 cutoff), а не из подзапроса,
+# чтобы TimescaleDB отсекал лишние чанки гипертаблицы.
+RAW_QUERY = """
+    SELECT
+        time_bucket($3::interval, time) AS bucket_time,
+        FIRST(open, time) as open,
+        MAX(high) as high,
+        MIN(low) as low,
+        LAST(close, time) as close,
+        SUM(volume) as volume
+    FROM candles
+    WHERE symbol = $1
+      AND time >= $4 AND time < $5
+    GROUP BY bucket_time
+    ORDER BY bucket_time DESC
+    LIMIT $2::int
+"""
+
+AGG_QUERY = """
+    SELECT
+        time_bucket($3::interval, bucket) AS bucket_time,
+        FIRST(open, bucket) as open,
+        MAX(high) as high,
+        MIN(low) as low,
+        LAST(close, bucket) as close,
+        SUM(volume) as volume
+    FROM {source}
+    WHERE symbol = $1
+      AND bucket >= $4 AND bucket < $6
+    GROUP BY bucket_time
+    UNION ALL
+    SELECT
+        time_bucket($3::interval, time) AS bucket_time,
+        FIRST(open, time) as open,
+        MAX(high) as high,
+        MIN(low) as low,
+        LAST(close, time) as close,
+        SUM(volume) as volume
+    FROM candles
+    WHERE symbol = $1
+      AND time >= $6 AND time < $5
+    GROUP BY bucket_time
+    ORDER BY bucket_time DESC
+    LIMIT $2::int
+"""
+
+
+# Пустая страница: есть ли свечи старше окна (дыра длиннее страницы) или история кончилась
+OLDER_QUERY = """
+    SELECT max(time) AS time FROM candles WHERE symbol = $1 AND time < $2
+"""
+
+
+def build_klines_query(source):
+    if source is None:
+        return RAW_QUERY
+    return AGG_QUERY.format(source=source)
+
+
+def bucket_floor(ts, bucket):
+    """time_bucket() на стороне Python."""
+    return ts - (ts - BUCKET_ORIGIN) % bucket
+
+
+def _ts(seconds):
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+def klines_args(symbol, interval, limit, start=None, end=None, before=None, now=None):
+    """
+    Параметры запроса: символ, limit, бакет и границы [lower, upper), выровненные по бакету.
+    upper — min(end, before) или конец формирующегося бакета; lower — не раньше start
+    и не дальше limit бакетов от upper. Для агрегатов — еще cutoff между агрегатом и хвостом.
+    """
+    bucket, source = INTERVALS[interval]
+    now = now or datetime.now(timezone.utc)
+
+    bounds = [_ts(t) for t in (end, before) if t is not None]
+    upper = bucket_floor(min(bounds), bucket) if bounds else bucket_floor(now, bucket) + bucket
+    lower = upper - bucket * limit
+    if start is not None:
+        lower = max(lower, bucket_floor(_ts(start), bucket))
+
+    if source is None:
+        return symbol, limit, bucket, lower, upper
+    cutoff = min(max(bucket_floor(now - REFRESH_LAG[source], bucket), lower), upper)
+    return symbol, limit, bucket, lower, upper, cutoff
+
+
+def to_tuples(rows):
+    """Записи asyncpg -> кортежи (time_sec, open, high, low, close, volume), порядок сохраняется."""
+    return [
+        (int(r["bucket_time"].timestamp()), r["open"], r["high"], r["low"], r["close"], r["volume"])
+        for r in rows
+    ]
+
+
+def pack_columns(rows):
+    """Колонки в хронологическом порядке, без dict на свечу."""
+    rows = rows[::-1]
+    return {name: [r[i] for r in rows] for i, name in enumerate(COLUMNS)}
+
+
 @router.get("/klines/{symbol}")
 async def get_klines(
     symbol: str,
-    interval: str = Query("1m", description="Timeframe (1m, 5m, 15m, 1h, 4h, 1d)"),
-    limit: int = Query(1000, le=5000, description="Max candles to return")
+    interval: str = Query("1m", description="Timeframe (1m, 3m, 5m, 15m, 30m, 1h, 4h, 1d, 1w)"),
+    limit: int = Query(1000, ge=1, le=5000, description="Max candles to return"),
+    start: int = Query(None, description="Unix seconds, inclusive lower bound"),
+    end: int = Query(None, description="Unix seconds, exclusive upper bound"),
+    before: int = Query(None, description="Paging cursor: candles strictly older than this time"),
+    format: str = Query("json", description="json | columnar | binary"),
 ):
     """
     Получает исторические свечи из TimescaleDB.
-    Автоматически агрегирует 1m свечи в более крупные таймфреймы (bucket).
+    Старшие ТФ берутся из самого крупного подходящего continuous aggregate,
+    формирующийся хвост — из сырых 1m свечей.
+
+    Пагинация: следующая (более старая) страница — before=<next_before>; курсор
+    приходит в заголовке X-Next-Before (и в поле next_before для columnar),
+    пусто — история закончилась (или достигнут start). Страница может быть
+    короче limit, если в данных дыра.
+
+    Форматы:
+      json     — [{time, open, high, low, close, volume}, ...] (по умолчанию)
+      columnar — {"time": [...], "open": [...], ..., "next_before": ...}
+      binary   — application/octet-stream: 6 колонок float64 little-endian подряд
+                 (time, open, high, low, close, volume), по X-Candle-Count значений в каждой
     """
-    
+
     # Приводим символ к формату базы (BTCUSDT -> BTC/USDT)
     # Если фронтенд шлет 'BTCUSDT', добавляем слэш
     if '/' not in symbol:
         symbol = symbol.replace('USDT', '/USDT')
 
-    # Валидация интервалов для time_bucket
-    valid_intervals = {
-        "1m": "1 minute",
-        "3m": "3 minutes",
-        "5m": "5 minutes",
-        "15m": "15 minutes",
-        "30m": "30 minutes",
-        "1h": "1 hour",
-        "4h": "4 hours",
-        "1d": "1 day",
-        "1w": "1 week",
-    }
-    
-    if interval not in valid_intervals:
+    if interval not in INTERVALS:
         raise HTTPException(status_code=400, detail="Invalid interval")
-    
-    bucket = valid_intervals[interval]
-
-    # SQL запрос с агрегацией (Time Bucket)
-    # TimescaleDB умеет сам собирать 1m свечи в 5m, 1h и т.д.
-    query = f"""
-        SELECT 
-            time_bucket('{bucket}', time) AS bucket_time,
-            FIRST(open, time) as open,
-            MAX(high) as high,
-            MIN(low) as low,
-            LAST(close, time) as close,
-            SUM(volume) as volume
-        FROM candles
-        WHERE symbol = $1
-        GROUP BY bucket_time
-        ORDER BY bucket_time DESC
-        LIMIT $2
-    """
+    if format not in ("json", "columnar", "binary"):
+        raise HTTPException(status_code=400, detail="Invalid format")
+
+    now = datetime.now(timezone.utc)
+    bucket = INTERVALS[interval][0]
+    args = klines_args(symbol, interval, limit, start, end, before, now)
+    upper = args[4]
+    forming = bucket_floor(now, bucket)
+    # Живая страница содержит формирующийся бакет; ее кэш сбрасывается на границе бакета
+    forming_start = int(forming.timestamp()) if upper > forming else None
+
+    key = (symbol, interval, limit, start, end, before)
+    rows = klines_cache.get(key, forming_start)
+    if rows is None:
+        async def load():
+            rows = to_tuples(await db.fetch_all(build_klines_query(INTERVALS[interval][1]), *args))
+            # Только что закрытые бакеты могут быть еще не дописаны стримером — держим их недолго
+            recent = forming_start is None and upper > now - 2 * max(bucket, timedelta(minutes=1))
+            klines_cache.put(key, rows, forming_start, int(bucket.total_seconds()),
+                             ttl=LIVE_TTL if recent else None)
+            return rows
+
+        try:
+            rows = await klines_cache.load(key, load)
+        except Exception as e:
+            print(f"Error fetching klines: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    # Запрос ограничен окном [lower, upper), а не числом строк: короткая страница
+    # (дыра в данных) не значит, что история кончилась. Курсор — lower, пока не
+    # уперлись в start; на пустой странице перескакиваем дыру к ближайшей старой свече.
+    lower = args[3]
+    if start is not None and lower <= bucket_floor(_ts(start), bucket):
+        next_before = None
+    elif rows:
+        next_before = int(lower.timestamp())
+    else:
+        older = await db.fetch_all(OLDER_QUERY, symbol, lower)
+        older = older[0]["time"] if older else None
+        next_before = int((bucket_floor(older, bucket) + bucket).timestamp()) if older else None
+    headers = {"X-Next-Before": str(next_before) if next_before is not None else ""}
+
+    if format == "json":
+        body = [dict(zip(COLUMNS, row)) for row in reversed(rows)]
+        return Response(json.dumps(body), media_type="application/json", headers=headers)
+
+    cols = pack_columns(rows)
+    if format == "columnar":
+        cols["next_before"] = next_before
+        return Response(json.dumps(cols, separators=(',', ':')), media_type="application/json", headers=headers)
+
+    nan = float("nan")
+    packed = array("d")
+    for name in COLUMNS:
+        packed.extend(nan if v is None else v for v in cols[name])
+    headers["X-Candle-Count"] = str(len(rows))
+    headers["X-Columns"] = ",".join(COLUMNS)
+    return Response(packed.tobytes(), media_type="application/octet-stream", headers=headers)
+
 
-    try:
-        rows = await db.fetch_all(query, symbol, limit)
-        
-        if not rows:
-            return []
-
-        result = [
-            {
-                "time": int(row["bucket_time"].timestamp()),
-                "open": row["open"],
-                "high": row["high"],
-                "low": row["low"],
-                "close": row["close"],
-                "volume": row["volume"]
-            }
-            for row in reversed(rows)
-        ]
-        
-        return result
-
-    except Exception as e:
-        print(f"Error fetching klines: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+@router.get("/klines-cache/stats")
+async def get_klines_cache_stats():
+    """Попадания / промахи / вытеснения / патчи тиками кэша свечей."""
+    return klines_cache.stats()
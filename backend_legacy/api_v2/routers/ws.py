@@ -1,74 +1,54 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import List
 import logging
-import asyncio
-from common.database import db
+import json
+from common.ws_hub import SubscriptionHub
+from common.candle_rollup import TIMEFRAMES
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"Client connected. Total: {len(self.active_connections)}")
+def normalize_symbol(symbol):
+    # Фронтенд может прислать 'BTCUSDT' — приводим к формату базы 'BTC/USDT'
+    symbol = symbol.upper()
+    return symbol if '/' in symbol else symbol.replace('USDT', '/USDT')
 
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            logger.info(f"Client disconnected. Total: {len(self.active_connections)}")
 
-    async def broadcast(self, message: str):
-        # Отправляем сообщение всем подключенным клиентам
-        # Используем копию списка, так как он может измениться во время итерации
-        for connection in self.active_connections[:]:
-            try:
-                await connection.send_text(message)
-            except Exception:
-                # Если отправка не удалась (клиент отвалился), удаляем его
-                # Обычно WebSocketDisconnect ловится в эндпоинте, но это страховка
-                self.disconnect(connection)
+# Подписки клиентов (topic, symbol): каждому уходят только его пары и ТФ.
+# Протокол подписки и формат batch-кадров — см. common/ws_hub.py; без команд клиент получает все тики.
+hub = SubscriptionHub(TIMEFRAMES, normalize=normalize_symbol)
 
-manager = ConnectionManager()
 
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    await websocket.accept()
+    hub.add(websocket)
+    logger.info(f"Client connected. Total: {len(hub)}")
     try:
         while True:
-            # Просто поддерживаем соединение.
-            # В будущем здесь можно обрабатывать команды от клиента (например, подписка на конкретные пары)
-            await websocket.receive_text()
+            # Команды subscribe / unsubscribe / list
+            text = await websocket.receive_text()
+            hub.reply(websocket, hub.command(websocket, text))
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
     except Exception as e:
         logger.error(f"WS Error: {e}")
-        manager.disconnect(websocket)
-
-async def start_redis_listener():
-    """
-    Фоновая задача: слушает Redis и пересылает сообщения в WebSockets
-    """
-    print("Attempting to start Redis listener...", flush=True)
-    if not db.redis:
-        print("❌ Redis not initialized in db object, WS listener cannot start", flush=True)
-        return
-        
-    try:
-        pubsub = db.redis.pubsub()
-        await pubsub.subscribe("crypto_updates")
-        print("🎧 Redis -> WebSocket bridge started and subscribed to 'crypto_updates'", flush=True)
-        
-        async for message in pubsub.listen():
-            if message["type"] == "message":
-                # print(f"Bridge received: {message['data'][:50]}...", flush=True)
-                await manager.broadcast(message["data"])
-    except Exception as e:
-        print(f"❌ Redis listener crashed: {e}", flush=True)
     finally:
-        print("🛑 Redis listener stopped", flush=True)
+        hub.remove(websocket)
+        logger.info(f"Client disconnected. Total: {len(hub)}")
+
+
+def on_tick(symbol, k):
+    """Тик из crypto_updates -> очереди подписчиков topic 'ticks'; в batch-кадре ticks: {symbol: k}."""
+    hub.publish("ticks", symbol, lambda: json.dumps(k))
+
+
+def on_indicators(data):
+    """indicator_updates -> очереди подписчиков 'indicators' и 'klines:<tf>'."""
+    hub.dispatch_indicators(data)
 
 
+@router.get("/api/ws/stats")
+async def get_ws_stats():
+    """Клиенты, глубина очередей, отправлено / склеено / отброшено / отключено медленных."""
+    return hub.stats()
@@ -0,0 +1,193 @@
+"""
+Снимок скринера в памяти процесса API.
+
+Раньше каждый GET /api/coins гонял агрегат LAST/FIRST/SUM за 24 часа по всей
+гипертаблице candles + JOIN с coin_status. Теперь:
+  - reconcile() раз в SNAPSHOT_RECONCILE_SEC секунд делает этот запрос (по candles_5m),
+    читает индикаторы из Redis и пересобирает снимок целиком (индикаторы, market cap,
+    спарклайн, open 24h);
+  - между сверками цена, изменение за 24h и объем обновляются тиками из
+    crypto_updates, а индикаторы 1h — лентой изменений indicator_updates;
+  - тело ответа (JSON и gzip) сериализуется не чаще раза в SNAPSHOT_BUILD_MS
+    и только если что-то изменилось; ETag позволяет отвечать 304.
+
+Нагрузка на БД от опроса дашборда не зависит от числа браузеров.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+
+from common.database import db
+from common.indicator_writer import read_indicators
+
+RECONCILE_SEC = float(os.getenv("SNAPSHOT_RECONCILE_SEC", "30"))
+BUILD_MS = float(os.getenv("SNAPSHOT_BUILD_MS", "1000"))
+
+# ТФ индикаторов скринера; значения берутся из Redis (write-behind воркеров), пока он пуст — из coin_indicators
+INDICATOR_TF = '1h'
+
+# 24h статистика: закрытые 5m бакеты из continuous aggregate + сырые 1m свечи за последние ~15 минут
+QUERY = """
+    WITH bounds AS (
+        SELECT time_bucket('5 minutes', NOW() - INTERVAL '15 minutes') AS cutoff
+    ),
+    window_24h AS (
+        SELECT symbol, bucket AS time, close, volume
+        FROM candles_5m, bounds
+        WHERE bucket > NOW() - INTERVAL '24 hours' AND bucket < cutoff
+        UNION ALL
+        SELECT symbol, time, close, volume
+        FROM candles, bounds
+        WHERE time >= cutoff
+    ),
+    latest_data AS (
+        SELECT
+            symbol,
+            LAST(close, time) as current_price,
+            FIRST(close, time) as open_24h,
+            SUM(volume) as volume_24h
+        FROM window_24h
+        GROUP BY symbol
+    )
+    SELECT
+        ld.*,
+        cs.market_cap,
+        cs.cmc_id,
+        cs.sparkline_in_7d
+    FROM latest_data ld
+    LEFT JOIN coin_status cs ON ld.symbol = cs.symbol
+    ORDER BY cs.market_cap DESC NULLS LAST
+"""
+
+# Фильтры стратегий — по уже собранным монетам, без SQL
+STRATEGIES = {
+    'rsi-oversold': lambda c: c['_rsi'] is not None and c['_rsi'] < 30,
+    'strong-trend': lambda c: c['ema50'] is not None and c['current_price'] > c['ema50'],
+    'pump-radar': lambda c: c['total_volume'] > 50000000,
+}
+
+
+def _json_field(val):
+    if isinstance(val, str):
+        try:
+            return json.loads(val)
+        except ValueError:
+            return None
+    return val
+
+
+def _indicator_fields(inds):
+    """{rsi, macd, ...} (Redis / indicator_updates) -> поля монеты."""
+    rsi, macd, macd_s = inds.get('rsi'), inds.get('macd'), inds.get('macd_signal')
+    ema50, bb_u, bb_l = inds.get('ema_50'), inds.get('bb_upper'), inds.get('bb_lower')
+    return {
+        "rsi": round(rsi, 2) if rsi is not None else 50.0,
+        "macd": round(macd, 2) if macd is not None else 0,
+        "macd_signal": round(macd_s, 2) if macd_s is not None else 0,
+        "ema50": ema50,
+        "bb_upper": bb_u,
+        "bb_lower": bb_l,
+        "_rsi": rsi,
+    }
+
+
+def coin_from_row(row, inds=None):
+    """Строка агрегата + индикаторы из Redis -> монета в формате фронтенда (+ служебные поля с '_')."""
+    price = row['current_price']
+    open_24h = row['open_24h']
+    change_pct = ((price - open_24h) / open_24h * 100) if open_24h else 0
+
+    sparkline = _json_field(row['sparkline_in_7d'])
+    if not (isinstance(sparkline, dict) and "price" in sparkline):
+        sparkline = {"price": []}
+
+    return {
+        "id": row['symbol'].replace('/', '').lower(),
+        "symbol": row['symbol'].split('/')[0],
+        "name": row['symbol'].split('/')[0],
+        "image": f"https://s2.coinmarketcap.com/static/img/coins/64x64/{row['cmc_id'] or 1}.png",
+        "current_price": price,
+        "price_change_percentage_24h": round(change_pct, 2),
+        "market_cap": row['market_cap'] or 0,
+        "total_volume": row['volume_24h'] or 0,
+        **_indicator_fields(inds or {}),
+        "sparkline_in_7d": sparkline,
+        "_open_24h": open_24h,
+    }
+
+
+class ScreenerSnapshot:
+    def __init__(self):
+        self.coins = {}      # symbol -> монета (порядок = market cap, как в SQL)
+        self.version = 0     # растет при каждом изменении данных
+        self.reconciled_at = 0.0
+        self._bodies = {}    # strategy -> (version, etag, json bytes, gzip bytes)
+        self._built_at = {}  # strategy -> time.monotonic() последней сборки
+
+    @property
+    def ready(self):
+        return self.reconciled_at > 0
+
+    async def reconcile(self):
+        rows = await db.fetch_all(QUERY)
+        inds = await read_indicators(db.redis, INDICATOR_TF, pool=db.pool) if db.redis else {}
+        self.coins = {row['symbol']: coin_from_row(row, inds.get(row['symbol'])) for row in rows}
+        self.version += 1
+        self.reconciled_at = time.time()
+
+    def apply_tick(self, symbol, k):
+        """k из crypto_updates: [ts, o, h, l, c, v]; v — объем за 24h."""
+        coin = self.coins.get(symbol)
+        if coin is None or k[4] is None:
+            return
+        price = float(k[4])
+        coin['current_price'] = price
+        if coin['_open_24h']:
+            coin['price_change_percentage_24h'] = round((price - coin['_open_24h']) / coin['_open_24h'] * 100, 2)
+        if k[5] is not None:
+            coin['total_volume'] = float(k[5])
+        self.version += 1
+
+    def apply_indicators(self, data):
+        """Лента indicator_updates: {"s", "i": {tf: values}}; берем только INDICATOR_TF."""
+        coin = self.coins.get(data['s'])
+        inds = (data.get('i') or {}).get(INDICATOR_TF)
+        if coin is None or not inds:
+            return
+        coin.update(_indicator_fields(inds))
+        self.version += 1
+
+    def body(self, strategy=None):
+        """(etag, json bytes, gzip bytes) для стратегии; пересобирается не чаще BUILD_MS."""
+        key = strategy if strategy in STRATEGIES else None
+        cached = self._bodies.get(key)
+        now = time.monotonic()
+        if cached and (cached[0] == self.version or (now - self._built_at[key]) * 1000 < BUILD_MS):
+            return cached[1:]
+
+        match = STRATEGIES.get(key)
+        coins = [
+            {k: v for k, v in c.items() if not k.startswith('_')}
+            for c in self.coins.values() if match is None or match(c)
+        ]
+        raw = json.dumps(coins, separators=(',', ':')).encode()
+        etag = '"' + hashlib.md5(raw).hexdigest() + '"'
+        cached = (self.version, etag, raw, gzip.compress(raw, 5))
+        self._bodies[key] = cached
+        self._built_at[key] = now
+        return cached[1:]
+
+    async def run(self):
+        """Фоновая задача: периодическая сверка с БД (тики приходят через api_v2/ticks.py)."""
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                print(f"❌ Snapshot reconcile failed: {e}", flush=True)
+            await asyncio.sleep(RECONCILE_SEC)
+
+
+snapshot = ScreenerSnapshot()
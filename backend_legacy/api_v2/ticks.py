@@ -0,0 +1,56 @@
+"""
+Одна подписка API на Redis для всех потребителей в процессе:
+crypto_updates (снимок скринера, кэш свечей, WebSocket) и indicator_updates
+(WebSocket). JSON разбирается один раз на сообщение.
+"""
+import inspect
+import json
+
+from common.database import db
+from common.ws_hub import INDICATOR_CHANNEL
+
+
+async def _call(handler, *args):
+    res = handler(*args)
+    if inspect.isawaitable(res):
+        await res
+
+
+async def listen_ticks(handlers, indicator_handlers=()):
+    """
+    handlers: функции (symbol, k), k = [ts_ms, o, h, l, c, v];
+    indicator_handlers: функции (data), data = {"s", "i": {tf: values}, "k": {tf: bar}}.
+    Обработчики могут быть корутинами.
+    """
+    if not db.redis:
+        print("❌ Redis not initialized, tick listener cannot start", flush=True)
+        return
+    pubsub = db.redis.pubsub()
+    await pubsub.subscribe("crypto_updates", INDICATOR_CHANNEL)
+    print("🎧 Redis listener subscribed to 'crypto_updates', 'indicator_updates'", flush=True)
+    async for message in pubsub.listen():
+        if message["type"] != "message":
+            continue
+        try:
+            data = json.loads(message["data"])
+        except Exception:
+            continue
+
+        if message["channel"] == INDICATOR_CHANNEL:
+            if not data.get('s'):
+                continue
+            for handler in indicator_handlers:
+                try:
+                    await _call(handler, data)
+                except Exception:
+                    pass
+            continue
+
+        symbol, k = data.get('s'), data.get('k')
+        if not symbol or not k:
+            continue
+        for handler in handlers:
+            try:
+                await _call(handler, symbol, k)
+            except Exception:
+                pass
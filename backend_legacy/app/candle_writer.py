@@ -0,0 +1,204 @@
+"""
+Bulk candle writer: in-memory dedup -> COPY into a session temp staging table
+-> one set-based merge into `candles`.
+
+Replaces executemany of a per-row INSERT ... ON CONFLICT. Updates for the
+same (time, symbol) are folded in memory first (first open, max high,
+min low, last close, last volume), so the merge never touches a row twice
+and the number of rows sent is bounded by distinct candles, not ticks.
+
+Staging is a temp table of the writer's own connection (ON COMMIT DELETE
+ROWS), not one shared table: concurrent writers (streamer, data-engine,
+backfill) never lock each other, and the table is created once per pooled
+connection instead of TRUNCATEd (new relfilenode, catalog churn) per flush.
+
+There is no fixed sleep: the writer flushes as soon as records arrive and
+whatever queues up while a flush is in flight becomes the next batch.
+
+CandleQueue bounds what can pile up while the database stalls: a record
+for a (minute, symbol) that is already queued is merged into it, and only
+when `maxsize` distinct candles are waiting is the oldest one dropped.
+"""
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("CandleWriter")
+
+COLUMNS = ('time', 'symbol', 'open', 'high', 'low', 'close', 'volume')
+
+STAGING_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+"""
+
+MERGE_SQL = """
+    INSERT INTO {table} (time, symbol, open, high, low, close, volume)
+    SELECT time, symbol, open, high, low, close, volume FROM {staging}
+    ON CONFLICT (time, symbol) DO UPDATE SET
+        high = GREATEST({table}.high, EXCLUDED.high),
+        low = LEAST({table}.low, EXCLUDED.low),
+        close = EXCLUDED.close,
+        volume = EXCLUDED.volume
+"""
+
+
+def merge_into(row, record):
+    """Folds a later record for the same (time, symbol) into `row` (a list)."""
+    row[3] = max(row[3], record[3])
+    row[4] = min(row[4], record[4])
+    row[5] = record[5]
+    row[6] = record[6]
+
+
+class CandleQueue:
+    """Bounded queue of candle records keyed by (time, symbol), oldest first."""
+
+    def __init__(self, maxsize=50000):
+        self.maxsize = maxsize
+        self.rows = {}  # dicts keep insertion order
+        self.merged = 0
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def qsize(self):
+        return len(self.rows)
+
+    def empty(self):
+        return not self.rows
+
+    def put_nowait(self, record):
+        key = (record[0], record[1])
+        row = self.rows.get(key)
+        if row is not None:
+            merge_into(row, record)
+            self.merged += 1
+            return
+        if len(self.rows) >= self.maxsize:
+            del self.rows[next(iter(self.rows))]
+            self.dropped += 1
+        self.rows[key] = list(record)
+        self._ready.set()
+
+    def get_nowait(self):
+        key = next(iter(self.rows))
+        return self.rows.pop(key)
+
+    async def get_batch(self, limit):
+        """Waits for at least one record and takes up to `limit`, oldest first."""
+        while not self.rows:
+            self._ready.clear()
+            await self._ready.wait()
+        batch = []
+        while self.rows and len(batch) < limit:
+            batch.append(self.get_nowait())
+        return batch
+
+
+class CandleWriter:
+    def __init__(self, pool, table="candles", staging="candles_staging", max_rows=20000):
+        self.pool = pool
+        self.table = table
+        self.staging = staging
+        self.max_rows = max_rows
+        self.pending = {}  # (time, symbol) -> [time, symbol, o, h, l, c, v]
+        self.merged = 0    # records folded into an existing pending row
+        # Metrics window (see metrics())
+        self.rows_written = 0
+        self.flushes = 0
+        self.flush_time = 0.0
+        self.flush_max = 0.0
+        self._window_start = time.time()
+
+    def add(self, record):
+        """record: (time, symbol, open, high, low, close, volume)."""
+        key = (record[0], record[1])
+        row = self.pending.get(key)
+        if row is None:
+            self.pending[key] = list(record)
+            return
+        merge_into(row, record)
+        self.merged += 1
+
+    async def flush(self):
+        """Writes pending rows; returns how many were sent. Rows are kept on failure."""
+        if not self.pending:
+            return 0
+
+        rows = [tuple(r) for r in self.pending.values()]
+        started = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                # No-op once this connection has it; emptied again at commit
+                await conn.execute(STAGING_SQL.format(table=self.table, staging=self.staging))
+                await conn.copy_records_to_table(self.staging, records=rows, columns=COLUMNS)
+                await conn.execute(MERGE_SQL.format(table=self.table, staging=self.staging))
+        self.pending.clear()
+
+        elapsed = time.perf_counter() - started
+        self.rows_written += len(rows)
+        self.flushes += 1
+        self.flush_time += elapsed
+        self.flush_max = max(self.flush_max, elapsed)
+        return len(rows)
+
+    def metrics(self, queue=None):
+        """Snapshot since the last call: rows/sec, flush latency, queue depth and merges."""
+        now = time.time()
+        window = max(now - self._window_start, 1e-9)
+        m = {
+            'rows_per_sec': round(self.rows_written / window, 1),
+            'flushes': self.flushes,
+            'flush_avg_ms': round(self.flush_time / self.flushes * 1000, 1) if self.flushes else 0.0,
+            'flush_max_ms': round(self.flush_max * 1000, 1),
+            'pending': len(self.pending),
+            'merged': self.merged,
+        }
+        if isinstance(queue, CandleQueue):
+            m.update(depth=queue.qsize(), maxsize=queue.maxsize,
+                     merged=self.merged + queue.merged, dropped=queue.dropped)
+        elif queue is not None:
+            m['depth'] = queue.qsize()
+        self.rows_written, self.flushes, self.flush_time, self.flush_max = 0, 0, 0.0, 0.0
+        self._window_start = now
+        return m
+
+    async def run(self, queue, to_record=None):
+        """
+        Drains `queue` (a CandleQueue or asyncio.Queue) forever. Items are
+        records, or anything `to_record` turns into one.
+        """
+        while True:
+            if len(self.pending) >= self.max_rows:
+                # Retry the unsent backlog first; meanwhile the queue bounds new records
+                items = []
+            elif isinstance(queue, CandleQueue):
+                items = await queue.get_batch(self.max_rows - len(self.pending))
+            else:
+                items = [await queue.get()]
+                while not queue.empty() and len(items) < self.max_rows:
+                    items.append(queue.get_nowait())
+            try:
+                for item in items:
+                    self.add(to_record(item) if to_record else item)
+                await self.flush()
+            except Exception as e:
+                logger.error(f"DB Write Error: {e}")
+                await asyncio.sleep(1)
+
+    async def report(self, queue, redis=None, key="metrics:streamer", every=10, log_every=60):
+        """Publishes metrics() to a Redis hash every `every` seconds and logs them."""
+        last_log = 0.0
+        while True:
+            await asyncio.sleep(every)
+            m = self.metrics(queue)
+            if redis is not None:
+                try:
+                    pipe = redis.pipeline(transaction=False)
+                    pipe.hset(key, mapping={**m, 'updated_at': time.time()})
+                    pipe.expire(key, int(every * 6))
+                    await pipe.execute()
+                except Exception as e:
+                    logger.warning(f"Metrics publish failed: {e}")
+            if time.time() - last_log > log_every:
+                last_log = time.time()
+                logger.info(f"📊 Writer: {m}")
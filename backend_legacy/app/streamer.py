@@ -5,11 +5,18 @@ import os
 import json
 from datetime import datetime, timezone
 from database import db
+from candle_writer import CandleQueue, CandleWriter
+from minute_bars import MinuteBarBuilder
 
 # Настройка логов
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Транспорт для воркеров индикаторов (см. common/tick_stream.py)
+TICK_TRANSPORT = os.getenv("TICK_TRANSPORT", "pubsub")
+TICK_STREAM = "crypto_updates:stream"
+TICK_STREAM_MAXLEN = int(os.getenv("TICK_STREAM_MAXLEN", "20000"))
+
 async def run_streamer():
     logger.info("🚀 Starting Binance Unified Streamer (!miniTicker@arr)...")
     
@@ -22,87 +29,79 @@ async def run_streamer():
         'options': {'defaultType': 'spot'}
     })
     
-    queue = asyncio.Queue()
+    # Ограниченная очередь: при зависании БД записи одной (минуты, монеты) сливаются, лишние старые отбрасываются
+    queue = CandleQueue(maxsize=int(os.getenv("CANDLE_QUEUE_MAX", "50000")))
+
+    # Дедупликация в памяти + COPY в staging + один merge вместо executemany построчно
+    writer = CandleWriter(db.pool)
+    asyncio.create_task(writer.run(queue))
+    # Метрики записи (глубина очереди, слияния, задержка flush, строк/с) -> Redis hash metrics:streamer
+    asyncio.create_task(writer.report(queue, db.redis))
+    # Настоящие 1m свечи: OHLC по last, объем по приросту 24h объема (open/high/low тикера — за 24 часа)
+    # Минуту старта не пишем: начало ее тиков пропущено, дыра лучше неполного бара с нулевым объемом
+    bars = MinuteBarBuilder(start_ms=int(datetime.now().timestamp() * 1000))
 
-    async def db_writer():
-        batch_size = 500
-        buffer = []
+    try:
         while True:
-            item = await queue.get()
-            buffer.append(item)
-            
-            # Собираем пачку
             try:
-                while len(buffer) < batch_size:
-                    buffer.append(queue.get_nowait())
-            except asyncio.QueueEmpty:
-                pass
-            
-            if buffer:
-                records = []
-                for symbol, c in buffer:
-                    # c = [timestamp, open, high, low, close, volume]
-                    dt = datetime.fromtimestamp(c[0] / 1000, tz=timezone.utc)
-                    records.append((dt, symbol, c[1], c[2], c[3], c[4], c[5]))
-                
-                try:
-                    query = """
-                        INSERT INTO candles (time, symbol, open, high, low, close, volume)
-                        VALUES ($1, $2, $3, $4, $5, $6, $7)
-                        ON CONFLICT (time, symbol) DO UPDATE SET
-                            high = GREATEST(candles.high, EXCLUDED.high),
-                            low = LEAST(candles.low, EXCLUDED.low),
-                            close = EXCLUDED.close,
-                            volume = EXCLUDED.volume;
-                    """
-                    async with db.pool.acquire() as conn:
-                        await conn.executemany(query, records)
-                except Exception as e:
-                    logger.error(f"DB Write Error: {e}")
-                
-                buffer.clear()
-            await asyncio.sleep(1)
-
-    asyncio.create_task(db_writer())
-
-    while True:
-        try:
-            # watch_tickers без аргументов в Binance Pro слушает поток !ticker@arr или !miniTicker@arr
-            # Это дает данные ПО ВСЕМ парам сразу в одном соединении.
-            tickers = await exchange.watch_tickers()
+                # watch_tickers без аргументов в Binance Pro слушает поток !ticker@arr или !miniTicker@arr
+                # Это дает данные ПО ВСЕМ парам сразу в одном соединении.
+                tickers = await exchange.watch_tickers()
             
-            if tickers:
-                for symbol, ticker in tickers.items():
-                    if not symbol.endswith('/USDT'):
-                        continue
+                if tickers:
+                    payloads = []
+                    for symbol, ticker in tickers.items():
+                        if not symbol.endswith('/USDT'):
+                            continue
                         
-                    # Формируем данные для Redis и БД
-                    # ticker в CCXT содержит 'last', 'open', 'high', 'low', 'baseVolume', 'timestamp'
-                    timestamp = ticker['timestamp'] or int(datetime.now().timestamp() * 1000)
+                        # Формируем данные для Redis и БД
+                        # ticker в CCXT содержит 'last', 'open', 'high', 'low', 'baseVolume', 'timestamp'
+                        timestamp = ticker['timestamp'] or int(datetime.now().timestamp() * 1000)
                     
-                    candle = [
-                        timestamp,
-                        ticker['open'],
-                        ticker['high'],
-                        ticker['low'],
-                        ticker['last'],
-                        ticker['baseVolume']
-                    ]
+                        candle = [
+                            timestamp,
+                            ticker['open'],
+                            ticker['high'],
+                            ticker['low'],
+                            ticker['last'],
+                            ticker['baseVolume']
+                        ]
+
+                        # 1. Для фронтенда и воркеров — отправляется одной пачкой ниже
+                        payloads.append({"s": symbol, "k": candle})
+
+                        # 2. В очередь для БД — одна запись на монету в минуту, когда минута закрылась
+                        closed = bars.update(symbol, timestamp, ticker['last'], ticker['baseVolume'] or 0.0)
+                        if closed:
+                            queue.put_nowait(closed)
 
-                    # 1. Публикуем в Redis для фронтенда
-                    if db.redis:
-                        payload = {"s": symbol, "k": candle}
-                        await db.redis.publish("crypto_updates", json.dumps(payload))
+                    # Монеты без тиков: закрываем их минуту по часам
+                    for record in bars.close_stale(int(datetime.now().timestamp() * 1000)):
+                        queue.put_nowait(record)
 
-                    # 2. В очередь для БД
-                    await queue.put((symbol, candle))
+                    # Один round-trip на пачку watch_tickers вместо PUBLISH/XADD на каждую монету
+                    if db.redis and payloads:
+                        pipe = db.redis.pipeline(transaction=False)
+                        for payload in payloads:
+                            data = json.dumps(payload)
+                            pipe.publish("crypto_updates", data)
+                            if TICK_TRANSPORT == "streams":
+                                pipe.xadd(TICK_STREAM, {"d": data}, maxlen=TICK_STREAM_MAXLEN, approximate=True)
+                        await pipe.execute()
                     
-        except Exception as e:
-            logger.error(f"Streamer Error: {e}")
-            await asyncio.sleep(5)
-            # Пересоздаем exchange при ошибке
-            await exchange.close()
-            exchange = ccxt.binance({'enableRateLimit': True, 'options': {'defaultType': 'spot'}})
+            except Exception as e:
+                logger.error(f"Streamer Error: {e}")
+                await asyncio.sleep(5)
+                # Пересоздаем exchange при ошибке
+                await exchange.close()
+                exchange = ccxt.binance({'enableRateLimit': True, 'options': {'defaultType': 'spot'}})
+    finally:
+        # Финальный сброс формирующихся минут (и всего, что осталось в очереди)
+        for record in bars.flush():
+            writer.add(record)
+        while not queue.empty():
+            writer.add(queue.get_nowait())
+        await writer.flush()
 
 if __name__ == "__main__":
     asyncio.run(run_streamer())
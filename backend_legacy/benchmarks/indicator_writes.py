@@ -0,0 +1,131 @@
+import sys
+import os
+import asyncio
+import json
+import random
+import time
+
+# Импорты из common
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.database import db
+from common.indicator_writer import COLUMNS, IndicatorFlusher, IndicatorWriter
+
+# Настройки
+SYMBOLS = 400
+ROUNDS = 30
+TIMEFRAMES = ['1m', '5m', '15m', '1h', '4h', '1d']
+# Насколько сильно двигаются индикаторы ТФ за один пересчет (старшие ТФ — почти стоят)
+DRIFT = {'1m': 1e-3, '5m': 3e-4, '15m': 1e-4, '1h': 3e-5, '4h': 1e-5, '1d': 3e-6}
+
+# Пересчетов на один сброс flusher-а (INDICATOR_FLUSH_SEC / интервал пересчета)
+FLUSH_EVERY = 5
+
+OLD_TABLE = "bench_coin_status"
+NEW_TABLE = "bench_coin_indicators"
+STAGING = "bench_coin_indicators_staging"  # временная таблица соединения флашера
+PREFIX = "bench_indicators"
+
+# Старая схема: шесть JSONB на монету, UPDATE одной строки на каждый пересчет
+OLD_SQL = f"""
+    UPDATE {OLD_TABLE} SET
+        updated_at = NOW(),
+        current_price = $1,
+        indicators_1m = $2, indicators_5m = $3, indicators_15m = $4,
+        indicators_1h = $5, indicators_4h = $6, indicators_1d = $7
+    WHERE symbol = $8
+"""
+
+SETUP = [
+    f"DROP TABLE IF EXISTS {OLD_TABLE}, {NEW_TABLE}",
+    f"""CREATE TABLE {OLD_TABLE} (
+        symbol TEXT PRIMARY KEY, current_price DOUBLE PRECISION,
+        indicators_1m JSONB DEFAULT '{{}}', indicators_5m JSONB DEFAULT '{{}}', indicators_15m JSONB DEFAULT '{{}}',
+        indicators_1h JSONB DEFAULT '{{}}', indicators_4h JSONB DEFAULT '{{}}', indicators_1d JSONB DEFAULT '{{}}',
+        updated_at TIMESTAMPTZ DEFAULT NOW())""",
+    f"CREATE TABLE {NEW_TABLE} (LIKE coin_indicators INCLUDING ALL) WITH (fillfactor = 70)",
+]
+
+
+def rounds():
+    """Синтетические пересчеты: ROUNDS × {symbol: (price, {tf: indicators})} со случайным блужданием."""
+    rng = random.Random(1)
+    values = {
+        (f"BENCH{i}/USDT", tf): {c: rng.uniform(10, 90) for c in COLUMNS}
+        for i in range(SYMBOLS) for tf in TIMEFRAMES
+    }
+    for _ in range(ROUNDS):
+        batch = {}
+        for (symbol, tf), v in values.items():
+            for c in COLUMNS:
+                v[c] *= 1 + rng.gauss(0, DRIFT[tf])
+            batch.setdefault(symbol, (v['ema_50'], {}))[1][tf] = dict(v)
+        yield batch
+
+
+async def wal_lsn():
+    return (await db.fetch_all("SELECT pg_current_wal_insert_lsn()"))[0][0]
+
+
+async def wal_since(lsn):
+    rows = await db.fetch_all("SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), $1::pg_lsn)", str(lsn))
+    return float(rows[0][0])
+
+
+async def bench_old():
+    await db.execute(f"INSERT INTO {OLD_TABLE} (symbol) SELECT 'BENCH' || i || '/USDT' FROM generate_series(0, {SYMBOLS - 1}) i")
+    lsn, t0, updates = await wal_lsn(), time.perf_counter(), 0
+    for batch in rounds():
+        for symbol, (price, by_tf) in batch.items():
+            await db.execute(OLD_SQL, price, *(json.dumps(by_tf[tf]) for tf in TIMEFRAMES), symbol)
+            updates += 1
+    return time.perf_counter() - t0, await wal_since(lsn), updates * len(TIMEFRAMES)
+
+
+async def bench_new():
+    """Воркер -> Redis на каждом пересчете, flusher -> Postgres раз в FLUSH_EVERY пересчетов."""
+    writer = IndicatorWriter(db.redis, prefix=PREFIX)
+    flusher = IndicatorFlusher(db.pool, db.redis, table=NEW_TABLE, staging=STAGING, prefix=PREFIX)
+    lsn, t0, rows, hot = await wal_lsn(), time.perf_counter(), 0, 0.0
+    for i, batch in enumerate(rounds(), 1):
+        t1 = time.perf_counter()
+        for symbol, (price, by_tf) in batch.items():
+            for tf in TIMEFRAMES:
+                rows += 1
+                writer.add(symbol, tf, price, by_tf[tf])
+        await writer.flush()
+        hot += time.perf_counter() - t1
+        if i % FLUSH_EVERY == 0:
+            await flusher.flush()
+    await flusher.flush()
+    return time.perf_counter() - t0, await wal_since(lsn), rows, hot, writer.stats()
+
+
+async def plan(query):
+    await db.execute(f"ANALYZE {OLD_TABLE}")
+    await db.execute(f"ANALYZE {NEW_TABLE}")
+    rows = await db.fetch_all(f"EXPLAIN {query}")
+    return rows[0][0]
+
+
+async def main():
+    await db.connect()
+    for q in SETUP:
+        await db.execute(q)
+    try:
+        print(f"📊 indicators: {SYMBOLS} symbols × {len(TIMEFRAMES)} TF × {ROUNDS} rounds")
+        t, wal, rows = await bench_old()
+        print(f"   JSONB UPDATE:   {t:7.2f} s, {rows / t:9.0f} rows/s, WAL {wal / 2**20:8.1f} MB")
+        t2, wal2, rows2, hot, stats = await bench_new()
+        print(f"   write-behind:   {t2:7.2f} s, {rows2 / t2:9.0f} rows/s, WAL {wal2 / 2**20:8.1f} MB ({stats})")
+        print(f"   worker hot path (Redis only): {hot:7.2f} s, {rows2 / hot:9.0f} rows/s")
+        print(f"   speedup {t / t2:.1f}x, WAL {wal / max(wal2, 1):.1f}x less")
+        print(f"   RSI < 30 on 1h, JSONB: {await plan(f'''SELECT symbol FROM {OLD_TABLE} WHERE (indicators_1h->>'rsi')::float < 30''')}")
+        print(f"   RSI < 30 on 1h, typed: {await plan(f'''SELECT symbol FROM {NEW_TABLE} WHERE tf = '1h' AND rsi < 30''')}")
+    finally:
+        await db.execute(f"DROP TABLE IF EXISTS {OLD_TABLE}, {NEW_TABLE}")
+        await db.redis.delete(*[f"{PREFIX}:{tf}" for tf in TIMEFRAMES], f"{PREFIX}:dirty")
+        await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
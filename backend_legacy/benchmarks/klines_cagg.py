@@ -0,0 +1,61 @@
+import sys
+import os
+import asyncio
+import statistics
+import time
+
+# Импорты из common / api_v2
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.database import db
+from api_v2.routers.klines import build_klines_query, klines_args, INTERVALS
+
+# Настройки
+SYMBOLS = ['BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+LIMIT = 1000
+REPEAT = 20
+
+# Старый запрос: time_bucket по сырым 1m свечам без ограничения по времени
+OLD_QUERY = """
+    SELECT
+        time_bucket($3::interval, time) AS bucket_time,
+        FIRST(open, time) as open,
+        MAX(high) as high,
+        MIN(low) as low,
+        LAST(close, time) as close,
+        SUM(volume) as volume
+    FROM candles
+    WHERE symbol = $1
+    GROUP BY bucket_time
+    ORDER BY bucket_time DESC
+    LIMIT $2
+"""
+
+
+async def bench(query, args_fn, interval):
+    times, rows = [], 0
+    for symbol in SYMBOLS:
+        await db.fetch_all(query, *args_fn(symbol, interval, LIMIT))  # прогрев кэша
+        for _ in range(REPEAT):
+            t0 = time.perf_counter()
+            res = await db.fetch_all(query, *args_fn(symbol, interval, LIMIT))
+            times.append(time.perf_counter() - t0)
+            rows = len(res)
+    q = statistics.quantiles(times, n=100)
+    return q[49] * 1000, q[98] * 1000, rows
+
+
+async def main():
+    await db.connect()
+    intervals = sys.argv[1:] or ['1d']
+    print(f"📊 klines: {LIMIT} candles × {len(SYMBOLS)} symbols × {REPEAT} runs")
+    for interval in intervals:
+        old = await bench(OLD_QUERY, lambda s, i, l: (s, l, INTERVALS[i][0]), interval)
+        new = await bench(build_klines_query(INTERVALS[interval][1]), klines_args, interval)
+        print(f"   {interval:3s} raw 1m:    p50 {old[0]:8.1f} ms, p99 {old[1]:8.1f} ms ({old[2]} rows)")
+        print(f"   {interval:3s} aggregate: p50 {new[0]:8.1f} ms, p99 {new[1]:8.1f} ms ({new[2]} rows)")
+        print(f"   speedup:       {old[0] / new[0]:8.1f}x")
+    await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
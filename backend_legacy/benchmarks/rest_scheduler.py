@@ -0,0 +1,111 @@
+import sys
+import os
+import asyncio
+import time
+
+# Импорты из common
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.fake_exchange import FakeExchange
+from common.rest_scheduler import BURST_SEC, HISTORY, KLINES_WEIGHT, LIVE, WEIGHT_PER_MIN, RestScheduler
+
+# Настройки (офлайн, биржа — common/fake_exchange.py)
+SYMBOLS = 300
+PAGES = 3           # страниц истории на символ: 900 запросов — больше корзины (BURST_SEC секунд веса)
+LIVE_REQUESTS = 20  # свежих запросов посреди загрузки истории
+LATENCY = 0.05      # ± 50%
+CONCURRENCY = 16
+# Биржа с лимитом ниже, чем думает планировщик: 429 / 418 и бэкофф
+LIMITED_REQUESTS = 300
+LIMITED_WEIGHT = 100   # веса на окно биржи
+LIMITED_WINDOW = 5     # сек (у Binance — минута)
+LIMITED_BAN_AFTER = 1  # 429 подряд до 418: планировщик встает после первого, так что бан — сразу
+
+
+def history(symbols=SYMBOLS, pages=PAGES):
+    since = int(time.time() * 1000) - pages * 1000 * 60000
+    return [(f"FAKE{i}/USDT", since + p * 1000 * 60000) for i in range(symbols) for p in range(pages)]
+
+
+def sustained(done):
+    """req/s по второй половине ответов: корзина к тому времени уже выбрана."""
+    done = sorted(done)
+    skip = len(done) // 2
+    if len(done) - skip < 2:
+        return 0.0
+    return (len(done) - skip - 1) / (done[-1] - done[skip])
+
+
+async def bench_batches():
+    """Как раньше: пачки по 5 через asyncio.gather и sleep(0.1) между ними."""
+    exchange = FakeExchange(latency=LATENCY)
+    calls = history()
+    t0 = time.perf_counter()
+    for i in range(0, len(calls), 5):
+        await asyncio.gather(*(exchange.fetch_ohlcv(s, '1m', since=t, limit=1000) for s, t in calls[i:i + 5]))
+        await asyncio.sleep(0.1)
+    return time.perf_counter() - t0, len(calls), exchange
+
+
+async def run_scheduler(exchange, calls, live_requests=0):
+    scheduler = RestScheduler(exchange, concurrency=CONCURRENCY)
+    waits = {LIVE: [], HISTORY: []}
+    done = []
+
+    async def fetch(symbol, since, priority):
+        t = time.perf_counter()
+        await scheduler.fetch_ohlcv(symbol, '1m', since=since, limit=1000, priority=priority)
+        done.append(time.perf_counter())
+        waits[priority].append(done[-1] - t)
+
+    async def live():
+        # Свежие дыры появляются, когда очередь уже забита историей
+        await asyncio.sleep(0.2)
+        await asyncio.gather(*(fetch(f"FAKE{i}/USDT", None, LIVE) for i in range(live_requests)))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(live(), *(fetch(s, t, HISTORY) for s, t in calls))
+    elapsed = time.perf_counter() - t0
+    await scheduler.close()
+    return elapsed, len(done), scheduler.stats(), waits, done
+
+
+def avg_ms(values):
+    return sum(values) / len(values) * 1000 if values else 0.0
+
+
+async def main():
+    burst = int(WEIGHT_PER_MIN / 60 * BURST_SEC / KLINES_WEIGHT)
+    limit_rate = WEIGHT_PER_MIN / 60 / KLINES_WEIGHT
+    print(f"📊 REST: {SYMBOLS} symbols × {PAGES} pages, latency {LATENCY * 1000:.0f} ms ± 50%, "
+          f"budget {WEIGHT_PER_MIN}/min = {limit_rate:.0f} req/s, burst {burst} req")
+
+    t, n, ex = await bench_batches()
+    print(f"   batches of 5:  {t:6.2f} s, {n / t:7.1f} req/s, max in flight {ex.max_in_flight}, 429 {ex.counters['429']}")
+
+    # 1. Дольше корзины: во второй половине скорость должна упереться в бюджет
+    ex2 = FakeExchange(latency=LATENCY)
+    t2, n2, stats, waits, done = await run_scheduler(ex2, history(), LIVE_REQUESTS)
+    print(f"   scheduler:     {t2:6.2f} s, {n2 / t2:7.1f} req/s overall, "
+          f"{sustained(done):5.1f} req/s after burst (budget {limit_rate:.0f}), "
+          f"max in flight {ex2.max_in_flight}, 429 {ex2.counters['429']}")
+    print(f"   wait LIVE avg {avg_ms(waits[LIVE]):6.0f} ms, HISTORY avg {avg_ms(waits[HISTORY]):6.0f} ms ({stats})")
+    print(f"   speedup {t / t2:.1f}x")
+
+    # 2. Биржа режет раньше бюджета: 429 -> пауза на Retry-After, 418 -> бан, запросы не теряются
+    ex3 = FakeExchange(latency=LATENCY, weight_limit=LIMITED_WEIGHT, window_sec=LIMITED_WINDOW,
+                       ban_after=LIMITED_BAN_AFTER, ban_sec=LIMITED_WINDOW)
+    started = time.time()
+    t3, n3, stats3, _, _ = await run_scheduler(ex3, history(LIMITED_REQUESTS, 1))
+    # Окна биржи, которые задел прогон (первое и последнее — частично)
+    windows = int(time.time() // LIMITED_WINDOW) - int(started // LIMITED_WINDOW) + 1
+    allowed = LIMITED_WEIGHT / LIMITED_WINDOW / KLINES_WEIGHT
+    print(f"📊 Exchange limit {LIMITED_WEIGHT} weight / {LIMITED_WINDOW} s = {allowed:.0f} req/s "
+          f"(scheduler budget {limit_rate:.0f} req/s), {LIMITED_REQUESTS} requests")
+    print(f"   scheduler:     {t3:6.2f} s, {n3}/{LIMITED_REQUESTS} done, {n3 / t3:5.1f} req/s "
+          f"in {windows} exchange windows of {LIMITED_WEIGHT // KLINES_WEIGHT} req "
+          f"({n3 / (windows * LIMITED_WEIGHT // KLINES_WEIGHT):.0%} used), 429 {ex3.counters['429']}, "
+          f"418 {ex3.counters['418']}, throttled {stats3['throttled']}, errors {stats3['errors']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
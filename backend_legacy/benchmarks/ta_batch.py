@@ -0,0 +1,87 @@
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Импорты из common
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.ta_lib import calculate_all_indicators, calculate_all_indicators_batch, BATCH_COLUMNS
+
+# Настройки
+SYMBOLS = 400
+BARS = 500
+PARITY_SYMBOLS = 50
+# Короткие истории: прогрев индикаторов (None / NaN, неполные окна BB и MACD)
+SHORT_BARS = range(2, 61)
+SHORT_SYMBOLS = 5
+
+
+def make_market(n_symbols, n_bars, seed=42):
+    """Синтетические OHLCV матрицы (symbols × bars), случайное блуждание."""
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(0.01, 50000, size=(n_symbols, 1))
+    close = base * np.exp(np.cumsum(rng.normal(0, 0.002, size=(n_symbols, n_bars)), axis=1))
+    spread = np.abs(rng.normal(0, 0.001, size=(n_symbols, n_bars))) * close
+    high = close + spread
+    low = close - spread
+    volume = rng.uniform(10, 10000, size=(n_symbols, n_bars))
+    return high, low, close, volume
+
+
+def check_parity(high, low, close, volume):
+    """Сравнивает батч с поштучным calculate_all_indicators."""
+    batch = calculate_all_indicators_batch(high, low, close, volume)
+    worst = 0.0
+    for i in range(min(PARITY_SYMBOLS, len(close))):
+        df = pd.DataFrame({'high': high[i], 'low': low[i], 'close': close[i], 'volume': volume[i]})
+        expected = calculate_all_indicators(df)
+        for j, name in enumerate(BATCH_COLUMNS):
+            exp, got = expected[name], batch[i, j]
+            if exp is None:
+                assert np.isnan(got), f"{name}[{i}]: expected None, got {got}"
+                continue
+            err = abs(got - exp) / max(abs(exp), 1.0)
+            worst = max(worst, err)
+            assert err < 1e-6, f"{name}[{i}]: expected {exp}, got {got}"
+    return worst
+
+
+def bench(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    print(f"🧪 Parity: batch vs per-symbol ({PARITY_SYMBOLS} symbols × {BARS} bars)...")
+    high, low, close, volume = make_market(PARITY_SYMBOLS, BARS)
+    worst = check_parity(high, low, close, volume)
+    print(f"✅ Parity OK (max rel. error {worst:.2e})")
+
+    print(f"🧪 Parity on short histories ({SHORT_SYMBOLS} symbols × {SHORT_BARS.start}..{SHORT_BARS.stop - 1} bars)...")
+    worst = max(check_parity(*make_market(SHORT_SYMBOLS, n, seed=n)) for n in SHORT_BARS)
+    print(f"✅ Parity OK (max rel. error {worst:.2e})")
+
+    high, low, close, volume = make_market(SYMBOLS, BARS)
+    frames = [
+        pd.DataFrame({'high': high[i], 'low': low[i], 'close': close[i], 'volume': volume[i]})
+        for i in range(SYMBOLS)
+    ]
+
+    t_single = bench(lambda: [calculate_all_indicators(df) for df in frames], repeat=1)
+    t_batch = bench(lambda: calculate_all_indicators_batch(high, low, close, volume))
+
+    per_1k_single = t_single / SYMBOLS * 1000
+    per_1k_batch = t_batch / SYMBOLS * 1000
+    print(f"📊 {SYMBOLS} symbols × {BARS} bars")
+    print(f"   per-symbol: {t_single * 1000:8.1f} ms  ({per_1k_single * 1000:8.1f} ms / 1k symbols)")
+    print(f"   batch:      {t_batch * 1000:8.1f} ms  ({per_1k_batch * 1000:8.1f} ms / 1k symbols)")
+    print(f"   speedup:    {t_single / t_batch:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
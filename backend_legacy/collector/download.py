@@ -1,87 +1,234 @@
-import ccxt.pro as ccxt  # Используем pro для async, но можно и обычный
+"""
+Загрузка истории 1m свечей всех USDT-пар в Parquet ({SYMBOL}.parquet в DATA_DIR).
+
+- Пары качаются параллельно (PAIRS одновременно), все запросы — через общий
+  RestScheduler: вес, число запросов в полете и 429 держит он.
+- Память ограничена: страницы копятся максимум до ROW_GROUP строк и
+  сразу уходят в Parquet отдельной row group.
+- Символ пишется сегментами по SEGMENT_ROWS строк ({SYMBOL}.NNNN.parquet).
+  Закрытый сегмент + {SYMBOL}.ckpt.json (последняя свеча) — контрольная
+  точка: прерванный запуск продолжает символ с нее, теряя максимум
+  недописанный сегмент.
+- Когда символ догружен до конца, сегменты склеиваются (по row group, без
+  чтения целиком) в {SYMBOL}.parquet, а сегменты и чекпоинт удаляются.
+  Готовые файлы при повторном запуске пропускаются.
+
+FAKE_EXCHANGE=1 — офлайн-прогон на common/fake_exchange.py.
+"""
 import ccxt.async_support as ccxt_async
-import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import asyncio
+import glob
+import json
 import os
 import logging
+import time
 from datetime import datetime, timedelta
+from common.rest_scheduler import HISTORY, RestScheduler
 
 # Настройки
 TIMEFRAME = '1m'
-DAYS = 90
-DATA_DIR = '/data/raw_parquet' # Путь внутри Docker
+DAYS = int(os.getenv("DOWNLOAD_DAYS", "90"))
+DATA_DIR = os.getenv("DATA_DIR", '/data/raw_parquet') # Путь внутри Docker
+PAIRS = int(os.getenv("DOWNLOAD_PAIRS", "32"))
+PAGE = 1000           # Binance отдает максимум 1000 свечей
+ROW_GROUP = 10_000
+SEGMENT_ROWS = 50_000
+MINUTE_MS = 60_000
+
+SCHEMA = pa.schema([
+    ('time', pa.timestamp('ms')),
+    ('open', pa.float64()), ('high', pa.float64()), ('low', pa.float64()),
+    ('close', pa.float64()), ('volume', pa.float64()),
+])
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-async def download_pair(exchange, symbol):
-    filename = f"{DATA_DIR}/{symbol.replace('/', '')}.parquet"
-    if os.path.exists(filename):
+stats = {"rows": 0, "pairs": 0}
+
+
+def to_table(candles):
+    cols = list(zip(*candles))
+    return pa.table([pa.array(col, type=f.type) for col, f in zip(cols, SCHEMA)], schema=SCHEMA)
+
+
+class SymbolWriter:
+    """Сегменты и чекпоинт одного символа."""
+
+    def __init__(self, symbol):
+        self.base = os.path.join(DATA_DIR, symbol.replace('/', ''))
+        self.final = f"{self.base}.parquet"
+        self.ckpt_path = f"{self.base}.ckpt.json"
+        self.segments = sorted(glob.glob(f"{self.base}.[0-9][0-9][0-9][0-9].parquet"))
+        self.writer = None
+        self.seg_rows = 0
+        self.buffer = []
+        self.last = None  # время последней свечи в буфере/сегменте
+
+    def checkpoint(self):
+        """(since, end) прерванной загрузки или None."""
+        if not os.path.exists(self.ckpt_path):
+            return None
+        with open(self.ckpt_path) as f:
+            ckpt = json.load(f)
+        return ckpt['since'], ckpt['end']
+
+    def _save_checkpoint(self, since, end):
+        tmp = f"{self.ckpt_path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'since': since, 'end': end}, f)
+        os.replace(tmp, self.ckpt_path)
+
+    def add(self, candles, end):
+        self.buffer.extend(candles)
+        self.last = candles[-1][0]
+        if len(self.buffer) >= ROW_GROUP:
+            self._write_group(end)
+
+    def _write_group(self, end):
+        if not self.buffer:
+            return
+        if self.writer is None:
+            self.seg_path = f"{self.base}.{len(self.segments):04d}.parquet"
+            self.writer = pq.ParquetWriter(f"{self.seg_path}.tmp", SCHEMA, compression='snappy')
+        self.writer.write_table(to_table(self.buffer), row_group_size=ROW_GROUP)
+        self.seg_rows += len(self.buffer)
+        self.buffer = []
+        if self.seg_rows >= SEGMENT_ROWS:
+            self._close_segment(end)
+
+    def _close_segment(self, end):
+        if self.writer is None:
+            return
+        self.writer.close()
+        os.replace(f"{self.seg_path}.tmp", self.seg_path)
+        self.segments.append(self.seg_path)
+        self.writer, self.seg_rows = None, 0
+        self._save_checkpoint(self.last + MINUTE_MS, end)
+
+    def finish(self, end):
+        self._write_group(end)
+        self._close_segment(end)
+
+    def stitch(self):
+        """Сегменты -> один {SYMBOL}.parquet, по одной row group в памяти."""
+        if not self.segments:
+            return 0
+        rows = 0
+        tmp = f"{self.final}.tmp"
+        with pq.ParquetWriter(tmp, SCHEMA, compression='snappy') as out:
+            for path in self.segments:
+                seg = pq.ParquetFile(path)
+                for i in range(seg.num_row_groups):
+                    group = seg.read_row_group(i)
+                    out.write_table(group)
+                    rows += group.num_rows
+        os.replace(tmp, self.final)
+        for path in self.segments:
+            os.remove(path)
+        if os.path.exists(self.ckpt_path):
+            os.remove(self.ckpt_path)
+        return rows
+
+    def discard_partial(self):
+        # Недописанный сегмент прерванного запуска: без футера его не прочитать
+        for path in glob.glob(f"{self.base}.*.parquet.tmp"):
+            os.remove(path)
+
+
+async def download_pair(scheduler, symbol):
+    out = SymbolWriter(symbol)
+    if os.path.exists(out.final):
         logger.info(f"Skipping {symbol}, already exists.")
         return
+    out.discard_partial()
+
+    ckpt = out.checkpoint()
+    if ckpt:
+        current_time, end_time = ckpt
+        logger.info(f"Resuming {symbol} from {datetime.fromtimestamp(current_time / 1000)}")
+    else:
+        # Период: DAYS дней назад -> Сейчас
+        end_time = int(datetime.now().timestamp() * 1000)
+        current_time = int((datetime.now() - timedelta(days=DAYS)).timestamp() * 1000)
 
-    logger.info(f"Downloading {symbol}...")
-    
-    # Период: 90 дней назад -> Сейчас
-    end_time = int(datetime.now().timestamp() * 1000)
-    start_time = int((datetime.now() - timedelta(days=DAYS)).timestamp() * 1000)
-    
-    all_candles = []
-    current_time = start_time
-    
-    # Binance отдает максимум 1000 свечей
     while current_time < end_time:
         try:
-            candles = await exchange.fetch_ohlcv(symbol, timeframe=TIMEFRAME, limit=1000, since=current_time)
-            if not candles:
-                break
-            
-            all_candles.extend(candles)
-            current_time = candles[-1][0] + 60000 # +1 минута
-            
-            # Небольшой sleep, чтобы не дудосить
-            await asyncio.sleep(0.05)
-            
+            candles = await scheduler.fetch_ohlcv(symbol, timeframe=TIMEFRAME, limit=PAGE,
+                                                  since=current_time, priority=HISTORY)
         except Exception as e:
             logger.error(f"Error {symbol}: {e}")
             await asyncio.sleep(5)
             continue
+        candles = [c for c in candles or () if c[0] < end_time]
+        if not candles:
+            break
+        out.add(candles, end_time)
+        stats["rows"] += len(candles)
+        current_time = candles[-1][0] + MINUTE_MS # +1 минута
 
-    if not all_candles:
-        return
+    out.finish(end_time)
+    rows = await asyncio.to_thread(out.stitch)
+    stats["pairs"] += 1
+    if rows:
+        logger.info(f"✅ Saved {symbol}: {rows} rows")
+
+
+async def worker(scheduler, queue):
+    while not queue.empty():
+        await download_pair(scheduler, queue.get_nowait())
+
+
+async def report(total, started):
+    while True:
+        await asyncio.sleep(10)
+        elapsed = time.perf_counter() - started
+        logger.info(f"📈 {stats['pairs']}/{total} pairs, {stats['rows']} rows, "
+                    f"{stats['rows'] / elapsed:.0f} rows/s")
+
+
+def make_exchange():
+    if os.getenv("FAKE_EXCHANGE"):
+        from common.fake_exchange import FakeExchange
+        return FakeExchange()
+    return ccxt_async.binance({'enableRateLimit': False})  # лимитами управляет RestScheduler
 
-    # Сохраняем
-    df = pd.DataFrame(all_candles, columns=['time', 'open', 'high', 'low', 'close', 'volume'])
-    df['time'] = pd.to_datetime(df['time'], unit='ms')
-    
-    # Используем PyArrow для быстрого Parquet
-    df.to_parquet(filename, engine='pyarrow', compression='snappy')
-    logger.info(f"✅ Saved {symbol}: {len(df)} rows")
 
 async def main():
     os.makedirs(DATA_DIR, exist_ok=True)
-    
-    exchange = ccxt_async.binance({'enableRateLimit': True})
-    
+
+    exchange = make_exchange()
+    scheduler = RestScheduler(exchange)
+
     try:
         # 1. Получаем список всех тикеров
         logger.info("Fetching all USDT pairs from Binance...")
         markets = await exchange.load_markets()
-        
+
         # 2. Фильтруем USDT Spot
         symbols = [
-            s for s in markets.keys() 
+            s for s in markets.keys()
             if s.endswith('/USDT') and ':USDT' not in s
         ]
-        
-        logger.info(f"Found {len(symbols)} USDT pairs. Starting massive download...")
-        
+
+        logger.info(f"Found {len(symbols)} USDT pairs. Downloading {PAIRS} at a time...")
+
         # 3. Качаем
-        for i, symbol in enumerate(symbols):
-            logger.info(f"[{i+1}/{len(symbols)}] Processing {symbol}")
-            await download_pair(exchange, symbol)
-            
+        queue = asyncio.Queue()
+        for symbol in symbols:
+            queue.put_nowait(symbol)
+        started = time.perf_counter()
+        reporter = asyncio.create_task(report(len(symbols), started))
+        await asyncio.gather(*(worker(scheduler, queue) for _ in range(PAIRS)))
+        reporter.cancel()
+        elapsed = time.perf_counter() - started
+        logger.info(f"🏁 {stats['pairs']} pairs, {stats['rows']} rows in {elapsed:.0f}s "
+                    f"({stats['rows'] / max(elapsed, 1e-9):.0f} rows/s), scheduler {scheduler.stats()}")
+
     finally:
+        await scheduler.close()
         await exchange.close()
 
 if __name__ == "__main__":
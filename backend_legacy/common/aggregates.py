@@ -0,0 +1,35 @@
+"""
+Ручное обновление continuous aggregates свечей (common/schema.py).
+
+Политики пересчитывают только последние start_offset (1 день у candles_5m,
+7 у candles_1h, 30 у candles_4h). Все, что пишется глубже — ремонт дыр
+(common/gap_repair.py), загрузка истории из Parquet (collector/ingest_parquet.py), —
+в агрегаты само не попадет: после такой записи нужен refresh() по ее диапазону.
+"""
+from datetime import datetime, timezone
+
+# По порядку иерархии: каждый строится из предыдущего (4h и 1d — из 1h)
+AGGREGATES = (
+    ("candles_5m", 300),
+    ("candles_15m", 900),
+    ("candles_1h", 3600),
+    ("candles_4h", 4 * 3600),
+    ("candles_1d", 86400),
+)
+
+
+def _literal(seconds):
+    return f"'{datetime.fromtimestamp(seconds, tz=timezone.utc).isoformat()}'"
+
+
+async def refresh(pool, start, stop, aggregates=AGGREGATES):
+    """
+    Пересчитывает агрегаты на [start, stop) (секунды эпохи), по порядку иерархии.
+    Окно расширяется до границ бакетов каждого вида: refresh_continuous_aggregate
+    материализует только бакеты, целиком попавшие в окно. CALL нельзя внутри
+    транзакции, поэтому запрос без параметров (simple protocol) и без transaction().
+    """
+    async with pool.acquire() as conn:
+        for view, bucket in aggregates:
+            lo, hi = start - start % bucket, -(-stop // bucket) * bucket
+            await conn.execute(f"CALL refresh_continuous_aggregate('{view}', {_literal(lo)}, {_literal(hi)})")
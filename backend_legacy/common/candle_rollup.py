@@ -0,0 +1,72 @@
+"""
+Инкрементальная свертка 1m свечей в старшие таймфреймы.
+
+Вместо resample всей истории на каждом тике держим по одной формирующейся
+свече на каждый ТФ и обновляем ее из текущей 1m свечи (first/max/min/last/sum).
+update() возвращает закрытые свечи ТФ только на границах бакетов.
+
+Бакеты выровнены по эпохе UTC — так же, как time_bucket в TimescaleDB
+для интервалов от минуты до суток.
+"""
+
+# ТФ -> длина бакета в ms
+TIMEFRAMES = {
+    '1m': 60_000,
+    '5m': 300_000,
+    '15m': 900_000,
+    '1h': 3_600_000,
+    '4h': 14_400_000,
+    '1d': 86_400_000,
+}
+
+
+class CandleRollup:
+    def __init__(self, timeframes=TIMEFRAMES):
+        self.timeframes = timeframes
+        # { symbol: { tf: [start, open, high, low, close, volume_closed_minutes] } }
+        self.bars = {}
+        # { symbol: [ts, volume] } — текущая 1m свеча
+        self.minutes = {}
+
+    def update(self, symbol, ts, o, h, l, c, v):
+        """
+        Применяет текущее состояние 1m свечи (ts — начало минуты, ms).
+        Возвращает список закрытых свечей [(tf, (start, o, h, l, c, v)), ...].
+        """
+        bars = self.bars.setdefault(symbol, {})
+        minute = self.minutes.get(symbol)
+        new_minute = minute is None or ts > minute[0]
+        if minute is not None and ts < minute[0]:
+            return []  # запоздавшее обновление уже закрытой минуты
+
+        closed = []
+        for tf, tf_ms in self.timeframes.items():
+            bucket = ts - ts % tf_ms
+            bar = bars.get(tf)
+
+            if bar is None or bucket > bar[0]:
+                if bar is not None:
+                    closed.append((tf, (bar[0], bar[1], bar[2], bar[3], bar[4], bar[5] + minute[1])))
+                bars[tf] = [bucket, o, h, l, c, 0.0]
+                continue
+
+            if new_minute:
+                # Предыдущая минута закрылась внутри бакета — переносим ее объем
+                bar[5] += minute[1]
+            bar[2] = max(bar[2], h)
+            bar[3] = min(bar[3], l)
+            bar[4] = c
+
+        self.minutes[symbol] = [ts, v]
+        return closed
+
+    def discard(self, symbol, tf):
+        """Забывает формирующуюся свечу ТФ: следующий update() откроет новую, не закрывая эту."""
+        self.bars.get(symbol, {}).pop(tf, None)
+
+    def bar(self, symbol, tf):
+        """Формирующаяся свеча ТФ (start, o, h, l, c, v) или None."""
+        bar = self.bars.get(symbol, {}).get(tf)
+        if bar is None:
+            return None
+        return (bar[0], bar[1], bar[2], bar[3], bar[4], bar[5] + self.minutes[symbol][1])
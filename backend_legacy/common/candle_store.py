@@ -0,0 +1,122 @@
+"""
+Columnar ring buffer of 1m candles for all symbols of a worker shard.
+
+Every field is one float64 matrix (symbols x 2*capacity) plus an int64
+matrix of bar start times in ms, so the whole store is a handful of
+contiguous blocks that can also live in shared memory (pass `buffer=`).
+
+Each bar is written twice, at `pos` and `pos + capacity`. That keeps the
+last `capacity` bars contiguous in chronological order, so `view()` is a
+zero-copy NumPy slice while append/update of the current bar stay O(1).
+"""
+import numpy as np
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class CandleStore:
+    def __init__(self, symbols, capacity=500, buffer=None):
+        self.symbols = list(symbols)
+        self.capacity = capacity
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        n = len(self.symbols)
+        shape = (n, 2 * capacity)
+        block = n * 2 * capacity * 8
+
+        if buffer is None:
+            buffer = bytearray(self.footprint(n, capacity))
+        self.buffer = buffer
+
+        # One block per field, laid out back to back in the same buffer
+        self.fields = {
+            f: np.ndarray(shape, dtype=np.float64, buffer=buffer, offset=k * block)
+            for k, f in enumerate(FIELDS)
+        }
+        self.times = np.ndarray(shape, dtype=np.int64, buffer=buffer, offset=len(FIELDS) * block)
+        self.pos = np.full(n, -1, dtype=np.int64)    # slot of the newest bar
+        self.count = np.zeros(n, dtype=np.int64)     # number of valid bars
+
+    @staticmethod
+    def footprint(n_symbols, capacity):
+        """Bytes needed for n_symbols x capacity bars (OHLCV + time, double-written)."""
+        return (len(FIELDS) + 1) * n_symbols * 2 * capacity * 8
+
+    @property
+    def nbytes(self):
+        return self.footprint(len(self.symbols), self.capacity)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def _write(self, i, slot, ts, o, h, l, c, v):
+        for s in (slot, slot + self.capacity):
+            self.times[i, s] = ts
+            self.fields['open'][i, s] = o
+            self.fields['high'][i, s] = h
+            self.fields['low'][i, s] = l
+            self.fields['close'][i, s] = c
+            self.fields['volume'][i, s] = v
+
+    def append(self, symbol, ts, o, h, l, c, v=0.0):
+        """Opens a new bar (ts = bar start, ms)."""
+        i = self.index[symbol]
+        slot = (self.pos[i] + 1) % self.capacity
+        self._write(i, slot, ts, o, h, l, c, v)
+        self.pos[i] = slot
+        if self.count[i] < self.capacity:
+            self.count[i] += 1
+
+    def update(self, symbol, ts, price, volume=0.0):
+        """
+        Applies a tick to the bar starting at `ts`.
+        Returns True if the tick opened a new bar. Ticks for an already
+        closed bar are ignored.
+        """
+        i = self.index[symbol]
+        if self.count[i] == 0 or ts > self.times[i, self.pos[i]]:
+            self.append(symbol, ts, price, price, price, price, volume)
+            return True
+
+        slot = self.pos[i]
+        if ts < self.times[i, slot]:
+            return False
+
+        high = self.fields['high'][i, slot]
+        low = self.fields['low'][i, slot]
+        vol = self.fields['volume'][i, slot] + volume
+        self._write(i, slot, ts, self.fields['open'][i, slot],
+                    max(high, price), min(low, price), price, vol)
+        return False
+
+    def load(self, symbol, times, opens, highs, lows, closes, volumes):
+        """Bulk-loads history (oldest first); only the last `capacity` bars are kept."""
+        i = self.index[symbol]
+        k = min(len(times), self.capacity)
+        if k == 0:
+            return
+        cols = (opens, highs, lows, closes, volumes)
+        for s in (0, self.capacity):
+            self.times[i, s:s + k] = np.asarray(times[-k:], dtype=np.int64)
+            for f, col in zip(FIELDS, cols):
+                self.fields[f][i, s:s + k] = np.asarray(col[-k:], dtype=np.float64)
+        self.pos[i] = k - 1
+        self.count[i] = k
+
+    def view(self, symbol, field, n=None):
+        """Zero-copy chronological view of the last n bars (all valid bars by default)."""
+        i = self.index[symbol]
+        k = self.count[i] if n is None else min(n, self.count[i])
+        end = self.pos[i] + self.capacity + 1
+        arr = self.times if field == 'time' else self.fields[field]
+        return arr[i, end - k:end]
+
+    def bar(self, symbol, ago=0):
+        """(time, open, high, low, close, volume) of the bar `ago` bars back, or None."""
+        i = self.index[symbol]
+        if ago >= self.count[i]:
+            return None
+        s = self.pos[i] + self.capacity - ago
+        return (int(self.times[i, s]),) + tuple(float(self.fields[f][i, s]) for f in FIELDS)
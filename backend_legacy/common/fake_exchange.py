@@ -0,0 +1,91 @@
+"""
+Локальная биржа для офлайн-проверки загрузчиков и RestScheduler.
+
+fetch_ohlcv отдает детерминированные минутные свечи с задержкой latency
+(± jitter) и ведет вес по минутным окнам, как Binance: при превышении
+weight_limit — RateLimitExceeded (429) с Retry-After до конца окна, после
+ban_after таких ответов подряд — DDoSProtection (418) на ban_sec.
+window_sec короче минуты — чтобы прогнать 429/418 в бенчмарке за секунды.
+Заголовки последнего ответа — в last_response_headers, как у ccxt.
+"""
+import asyncio
+import random
+import time
+import zlib
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class DDoSProtection(Exception):
+    pass
+
+
+class FakeExchange:
+    def __init__(self, latency=0.05, jitter=0.5, weight_limit=6000, weight=2,
+                 ban_after=10, ban_sec=30, listed=None, seed=1, window_sec=60):
+        self.latency = latency
+        self.jitter = jitter
+        self.weight_limit = weight_limit
+        self.weight = weight
+        self.ban_after = ban_after
+        self.ban_sec = ban_sec
+        self.window_sec = window_sec
+        self.listed = listed or {}  # symbol -> ms первой свечи
+        self.rng = random.Random(seed)
+        self.last_response_headers = {}
+        self.window = 0
+        self.used = 0
+        self.rejected = 0  # 429 подряд
+        self.banned_until = 0.0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.counters = {"429": 0, "418": 0}
+
+    def _charge(self):
+        now = time.time()
+        if now < self.banned_until:
+            self.counters["418"] += 1
+            self.last_response_headers = {'Retry-After': str(int(self.banned_until - now) + 1)}
+            raise DDoSProtection("418 I'm a teapot")
+        window = int(now // self.window_sec)
+        if window != self.window:
+            self.window, self.used = window, 0
+        if self.used + self.weight > self.weight_limit:
+            self.counters["429"] += 1
+            self.rejected += 1
+            if self.rejected >= self.ban_after:
+                self.banned_until = now + self.ban_sec
+            self.last_response_headers = {'Retry-After': str(self.window_sec - int(now % self.window_sec))}
+            raise RateLimitExceeded("429 Too Many Requests")
+        self.rejected = 0
+        self.used += self.weight
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params=None):
+        limit = limit or 500
+        self._charge()
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency * (1 + self.jitter * (2 * self.rng.random() - 1)))
+        finally:
+            self.in_flight -= 1
+        self.last_response_headers = {'x-mbx-used-weight-1m': str(self.used)}
+
+        now = int(time.time()) // 60 * 60000
+        start = now - (limit - 1) * 60000 if since is None else (since + 59999) // 60000 * 60000
+        start = max(start, self.listed.get(symbol, 0))
+        candles = []
+        for t in range(start, min(start + limit * 60000, now + 60000), 60000):
+            base = 100 + zlib.crc32(f"{symbol}{t}".encode()) % 1000 / 100
+            candles.append([t, base, base * 1.01, base * 0.99, base * 1.005, 10.0])
+        return candles
+
+    async def load_markets(self):
+        return {f"FAKE{i}/USDT": {} for i in range(400)}
+
+    async def close(self):
+        pass
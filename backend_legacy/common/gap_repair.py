@@ -0,0 +1,241 @@
+"""
+Поиск и закрытие дыр в минутных свечах — один движок вместо разовых скриптов
+(gap_filler_v2, fill_gaps, blitz_sync, total_repair, force_*, fix_24h_gap).
+
+1. find_gaps(): один SQL-проход по candles сразу для всех символов окна —
+   lead() по времени внутри символа. В выборку добавлены граничные точки окна,
+   поэтому видны и дыры на краях, и символы без единой свечи. Результат —
+   компактный список полуинтервалов (symbol, start, stop) в секундах эпохи.
+2. plan(): соседние дыры символа склеиваются в запросы к бирже не длиннее
+   LIMIT (1000) минут: fetch_ohlcv(since=start, limit=(stop - start) / 60).
+3. GapRepair.run(): все запросы сразу отдаются в общий RestScheduler
+   (common/rest_scheduler.py) — он держит вес, параллелизм и бэкофф;
+   дыры моложе LIVE_SEC идут с приоритетом LIVE. В базу уходят только
+   свечи, попавшие в дыры: COPY + merge через CandleWriter.
+
+Повторный запуск сам продолжает с места остановки: закрытые дыры больше не
+находятся. Дыры, на которые биржа ничего не вернула (монета еще не торговалась,
+техработы), запоминаются в Redis (ZSET gap_repair:empty, score — время отметки;
+старше DONE_TTL удаляются ZREMRANGEBYSCORE) и не запрашиваются снова. Ключ
+дыры — ее граница со стороны данных: край окна сдвигается каждый запуск, а
+первая/последняя свеча символа — нет.
+
+Дописанный диапазон в конце пересчитывается в continuous aggregates
+(common/aggregates.py): политики смотрят назад всего на 1-30 дней.
+"""
+import asyncio
+import logging
+import os
+import time
+from bisect import bisect_right
+from collections import Counter
+from datetime import datetime, timezone
+
+from common import aggregates
+from common.candle_writer import CandleWriter
+from common.rest_scheduler import HISTORY, LIVE
+
+LIMIT = 1000  # свечей в одном ответе fetch_ohlcv у Binance
+RETRIES = 3
+# Дыры, закончившиеся не раньше этого, чинятся вперед глубокой истории
+LIVE_SEC = 3600
+# Последние минуты может еще дописывать стример — их не трогаем
+SETTLE_MIN = int(os.getenv("REPAIR_SETTLE_MIN", "2"))
+DONE_KEY = "gap_repair:empty"
+DONE_TTL = 7 * 86400
+REPORT_SEC = 10
+
+logger = logging.getLogger("GapRepair")
+
+GAPS_SQL = """
+    WITH ts AS (
+        SELECT symbol, time FROM {table}
+        WHERE symbol = ANY($1::text[]) AND time >= $2::timestamptz AND time < $3::timestamptz
+        UNION ALL
+        -- Минута до начала окна и его конец: дыры на краях и пустые символы тоже видны
+        SELECT s, b FROM unnest($1::text[]) s,
+               unnest(ARRAY[$2::timestamptz - interval '1 minute', $3::timestamptz]) b
+    )
+    SELECT symbol,
+           extract(epoch FROM time)::bigint + 60 AS start,
+           extract(epoch FROM next)::bigint AS stop
+    FROM (
+        SELECT symbol, time, lead(time) OVER (PARTITION BY symbol ORDER BY time) AS next
+        FROM ts
+    ) t
+    WHERE next - time > interval '1 minute'
+    ORDER BY symbol, start
+"""
+
+
+def plan(gaps, limit=LIMIT):
+    """
+    gaps: [(symbol, start, stop)], отсортированные по (symbol, start).
+    -> запросы [(symbol, start, stop, ((gap_start, gap_stop), ...))]: каждый
+    покрывает не больше limit минут, длинные дыры режутся на куски.
+    """
+    span = limit * 60
+    requests = []
+    cur = None  # [symbol, start, stop, [gaps]]
+    for symbol, start, stop in gaps:
+        while start < stop:
+            if cur is None or cur[0] != symbol or start >= cur[1] + span:
+                cur = [symbol, start, start, []]
+                requests.append(cur)
+            end = min(stop, cur[1] + span)
+            cur[2] = end
+            cur[3].append((start, end))
+            start = end
+    return [(s, a, b, tuple(g)) for s, a, b, g in requests]
+
+
+def _member(symbol, start, stop, window):
+    """Ключ дыры в DONE_KEY; край окна (start/stop) заменяется на '<' / '>'."""
+    lo, hi = window
+    return f"{symbol}|{'<' if start <= lo else start}|{'>' if stop >= hi else stop}"
+
+
+class GapRepair:
+    def __init__(self, pool, scheduler, redis=None, limit=LIMIT,
+                 table="candles", staging="candles_repair_staging"):
+        self.pool = pool
+        self.scheduler = scheduler
+        self.redis = redis
+        self.limit = limit
+        self.table = table
+        self.writer = CandleWriter(pool, table=table, staging=staging)
+        self._write_lock = asyncio.Lock()
+        self.stats = {}
+        self._owners = {}       # symbol -> (starts, дыры) — чей кусок вернул пустой ответ
+        self._empty = Counter()  # дыра -> пустых кусков
+        self._written = None     # [min, max] времени записанных свечей (сек)
+
+    async def find_gaps(self, symbols, start, stop):
+        """[(symbol, start, stop)] — все пропущенные минуты окна [start, stop) одним запросом."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(GAPS_SQL.format(table=self.table), list(symbols), start, stop)
+        gaps = [(r['symbol'], r['start'], r['stop']) for r in rows]
+        if self.redis is not None and gaps:
+            window = (int(start.timestamp()), int(stop.timestamp()))
+            await self.redis.zremrangebyscore(DONE_KEY, '-inf', time.time() - DONE_TTL)
+            done = await self.redis.zmscore(DONE_KEY, [_member(*g, window) for g in gaps])
+            gaps = [g for g, score in zip(gaps, done) if score is None]
+        return gaps
+
+    def _owner(self, symbol, start):
+        """Исходная дыра куска (plan() режет длинные дыры)."""
+        starts, gaps = self._owners[symbol]
+        return gaps[bisect_right(starts, start) - 1]
+
+    async def _fetch(self, symbol, start, stop):
+        priority = LIVE if stop >= time.time() - LIVE_SEC else HISTORY
+        for attempt in range(RETRIES):
+            try:
+                # 429/418 scheduler повторяет сам; здесь — сетевые ошибки
+                return await self.scheduler.fetch_ohlcv(
+                    symbol, '1m', since=start * 1000, limit=(stop - start) // 60, priority=priority
+                )
+            except Exception:
+                if attempt == RETRIES - 1:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+
+    async def _repair(self, request):
+        symbol, start, stop, gaps = request
+        candles = await self._fetch(symbol, start, stop) or []
+        starts = [g[0] for g in gaps]
+        by_gap = {g: [] for g in gaps}
+        for c in candles:
+            t = c[0] // 1000
+            i = bisect_right(starts, t) - 1
+            if i >= 0 and t < gaps[i][1]:
+                by_gap[gaps[i]].append((datetime.fromtimestamp(t, tz=timezone.utc), symbol, *c[1:6]))
+        records = [r for rs in by_gap.values() for r in rs]
+        if records:
+            async with self._write_lock:
+                for r in records:
+                    self.writer.add(r)
+                await self.writer.flush()
+            lo, hi = int(records[0][0].timestamp()), int(records[-1][0].timestamp()) + 60
+            w = self._written
+            self._written = [min(w[0], lo), max(w[1], hi)] if w else [lo, hi]
+        empty = [g for g, rs in by_gap.items() if not rs]
+        for g in empty:
+            self._empty[self._owner(symbol, g[0])] += 1
+        self.stats['candles'] += len(records)
+        self.stats['empty'] += len(empty)
+
+    async def _repair_logged(self, request):
+        try:
+            await self._repair(request)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"[{request[0]}] {request[1]}..{request[2]}: {e}")
+        self.stats['requests'] += 1
+
+    def rate(self):
+        elapsed = max(time.perf_counter() - self._started, 1e-9)
+        return round(self.stats['candles'] / elapsed, 1)
+
+    async def _report(self, total):
+        while True:
+            await asyncio.sleep(REPORT_SEC)
+            logger.info(f"📈 {self.stats['requests']}/{total} requests, "
+                        f"{self.stats['candles']} candles, {self.rate()} candles/s, "
+                        f"scheduler {self.scheduler.stats()}")
+
+    async def _mark_empty(self, pieces, window):
+        """Дыры, все куски которых биржа вернула пустыми -> DONE_KEY."""
+        done = {
+            _member(*g, window): time.time()
+            for g, n in self._empty.items() if n == pieces[g]
+        }
+        if done and self.redis is not None:
+            await self.redis.zadd(DONE_KEY, done)
+
+    async def run(self, symbols, hours):
+        """Чинит последние `hours` часов для `symbols`. Возвращает сводку."""
+        now = int(time.time()) // 60 * 60 - SETTLE_MIN * 60
+        window = (now - int(hours * 3600), now)
+        start = datetime.fromtimestamp(window[0], tz=timezone.utc)
+        stop = datetime.fromtimestamp(window[1], tz=timezone.utc)
+
+        self._started = time.perf_counter()
+        gaps = await self.find_gaps(symbols, start, stop)
+        requests = plan(gaps, self.limit)
+        self._owners = {}
+        for g in gaps:
+            starts, owned = self._owners.setdefault(g[0], ([], []))
+            starts.append(g[1])
+            owned.append(g)
+        pieces = Counter(self._owner(r[0], p[0]) for r in requests for p in r[3])
+        self._empty, self._written = Counter(), None
+        self.stats = {
+            'symbols': len({g[0] for g in gaps}),
+            'gaps': len(gaps),
+            'missing': sum((b - a) // 60 for _, a, b in gaps),
+            'requests': 0, 'candles': 0, 'empty': 0, 'errors': 0,
+        }
+        logger.info(f"🔍 {self.stats['gaps']} gaps ({self.stats['missing']} min) in "
+                    f"{self.stats['symbols']} symbols -> {len(requests)} requests "
+                    f"({(time.perf_counter() - self._started) * 1000:.0f} ms)")
+
+        reporter = asyncio.create_task(self._report(len(requests)))
+        try:
+            await asyncio.gather(*(self._repair_logged(r) for r in requests))
+        finally:
+            reporter.cancel()
+        try:
+            await self._mark_empty(pieces, window)
+        except Exception as e:
+            logger.warning(f"Could not remember empty gaps: {e}")
+        if self._written:
+            # Политики агрегатов так глубоко не смотрят — пересчитываем дописанное сами
+            try:
+                await aggregates.refresh(self.pool, *self._written)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Continuous aggregate refresh failed: {e}")
+        self.stats['seconds'] = round(time.perf_counter() - self._started, 1)
+        self.stats['candles_per_sec'] = self.rate()
+        return self.stats
@@ -0,0 +1,283 @@
+"""
+Индикаторы: write-behind через Redis, Postgres — вне горячего пути.
+
+Воркер (IndicatorWriter):
+  - add() сравнивает новые значения с последними записанными и ставит строку
+    в очередь, только если хоть одно поле сдвинулось больше чем на
+    INDICATOR_TOLERANCE (относительно);
+  - flush() пишет очередь в Redis одним pipeline: HSET indicators:{tf}
+    symbol -> JSON и SADD indicators:dirty "{tf}|{symbol}".
+
+API и strategy-engine читают последние значения из Redis (read_indicators).
+
+После рестарта Redis хеши пусты, а дедупликация воркера (last) не дает
+переписать неизменившиеся строки. Поэтому:
+  - флашер при старте и раз в INDICATOR_REHYDRATE_SEC заполняет пустые
+    indicators:{tf} из coin_indicators (IndicatorFlusher.rehydrate);
+  - read_indicators с pool читает coin_indicators, пока хеш пуст;
+  - воркер раз в INDICATOR_REFRESH_SEC забывает last и переписывает все строки.
+
+Флашер (IndicatorFlusher, engines/indicator-engine/flusher.py) раз в
+INDICATOR_FLUSH_SEC атомарно переносит пакет грязных ключей в
+indicators:flushing (Lua: SPOP + SADD), копирует строки во временную
+staging-таблицу своего соединения (COPY) и одним INSERT ... ON CONFLICT
+переносит их в coin_indicators. indicators:flushing удаляется только после
+коммита: если процесс упал посередине, следующий запуск начнет с него.
+"""
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+COLUMNS = ('rsi', 'macd', 'macd_signal', 'macd_hist', 'ema_50', 'ema_200', 'bb_upper', 'bb_lower', 'trend')
+TOLERANCE = float(os.getenv("INDICATOR_TOLERANCE", "1e-4"))
+FLUSH_BATCH = int(os.getenv("INDICATOR_FLUSH_BATCH", "5000"))
+REFRESH_SEC = float(os.getenv("INDICATOR_REFRESH_SEC", "600"))
+PREFIX = "indicators"
+
+_FIELDS = ('price',) + COLUMNS
+_ALL = ('symbol', 'tf') + _FIELDS + ('updated_at',)
+
+MERGE_SQL = f"""
+    INSERT INTO {{table}} ({', '.join(_ALL)})
+    SELECT {', '.join(_ALL)} FROM {{staging}}
+    ON CONFLICT (symbol, tf) DO UPDATE SET
+        {', '.join(f'{c} = EXCLUDED.{c}' for c in _ALL[2:])}
+    WHERE {{table}}.updated_at <= EXCLUDED.updated_at
+"""
+
+# Своя у каждого соединения, очищается коммитом: без общей таблицы и TRUNCATE на каждый пакет
+STAGING_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+"""
+
+# SPOP + SADD одним шагом: ключ всегда либо грязный, либо в обработке
+_CLAIM = """
+local members = redis.call('SPOP', KEYS[1], ARGV[1])
+for i = 1, #members, 1000 do
+    redis.call('SADD', KEYS[2], unpack(members, i, math.min(i + 999, #members)))
+end
+return members
+"""
+
+LOAD_SQL = f"SELECT {', '.join(_ALL)} FROM {{table}} WHERE tf = ANY($1::text[])"
+
+
+def hash_key(tf, prefix=PREFIX):
+    return f"{prefix}:{tf}"
+
+
+def dirty_key(prefix=PREFIX):
+    return f"{prefix}:dirty"
+
+
+def flushing_key(prefix=PREFIX):
+    return f"{prefix}:flushing"
+
+
+def changed(old, new, tolerance=TOLERANCE):
+    """True, если хоть одно значение появилось/пропало или сдвинулось больше допуска."""
+    for a, b in zip(old, new):
+        if a is None or b is None:
+            if a is not b:
+                return True
+        elif abs(a - b) > tolerance * max(abs(a), abs(b)):
+            return True
+    return False
+
+
+def _doc(row):
+    """Строка coin_indicators -> JSON-документ хеша indicators:{tf}."""
+    return json.dumps(dict({f: row[f] for f in _FIELDS}, ts=row['updated_at'].timestamp()))
+
+
+async def load_indicators(pool, timeframes, table="coin_indicators"):
+    """{tf: {symbol: JSON}} из Postgres — для пустых (после рестарта Redis) хешей."""
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(LOAD_SQL.format(table=table), list(timeframes))
+    by_tf = {}
+    for r in rows:
+        by_tf.setdefault(r['tf'], {})[r['symbol']] = _doc(r)
+    return by_tf
+
+
+async def read_indicators(redis, tf, prefix=PREFIX, pool=None):
+    """
+    {symbol: {price, rsi, ..., ts}} — последние значения ТФ для всех монет, один HGETALL.
+    Пустой хеш при заданном pool — значения из coin_indicators (Redis еще не заполнен).
+    """
+    raw = await redis.hgetall(hash_key(tf, prefix))
+    if not raw and pool is not None:
+        raw = (await load_indicators(pool, [tf])).get(tf, {})
+    return {
+        (s.decode() if isinstance(s, bytes) else s): json.loads(v)
+        for s, v in raw.items()
+    }
+
+
+class IndicatorWriter:
+    def __init__(self, redis, tolerance=TOLERANCE, prefix=PREFIX, refresh_sec=REFRESH_SEC):
+        self.redis = redis
+        self.tolerance = tolerance
+        self.prefix = prefix
+        self.refresh_sec = refresh_sec
+        self.refreshed = time.monotonic()
+        self.last = {}     # (symbol, tf) -> значения COLUMNS, записанные последними
+        self.pending = {}  # (symbol, tf) -> (price, значения)
+        self.written = 0
+        self.skipped = 0
+
+    def add(self, symbol, tf, price, values):
+        """Ставит строку в очередь, если индикаторы изменились. Возвращает True, если поставил."""
+        row = tuple(None if values.get(c) is None else float(values[c]) for c in COLUMNS)
+        key = (symbol, tf)
+        old = self.last.get(key)
+        if old is not None and not changed(old, row, self.tolerance):
+            self.skipped += 1
+            return False
+        self.last[key] = row
+        self.pending[key] = (float(price), row)
+        return True
+
+    async def flush(self):
+        """Очередь -> Redis за один round trip."""
+        if time.monotonic() - self.refreshed > self.refresh_sec:
+            # Следующие add() перепишут все строки, даже не изменившиеся (хеш мог пропасть)
+            self.refreshed = time.monotonic()
+            self.last.clear()
+        if not self.pending:
+            return 0
+        pending, self.pending = self.pending, {}
+        now = time.time()
+        by_tf = {}
+        for (symbol, tf), (price, row) in pending.items():
+            doc = dict(zip(_FIELDS, (price,) + row), ts=now)
+            by_tf.setdefault(tf, {})[symbol] = json.dumps(doc)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for tf, mapping in by_tf.items():
+                    pipe.hset(hash_key(tf, self.prefix), mapping=mapping)
+                pipe.sadd(dirty_key(self.prefix), *(f"{tf}|{s}" for s, tf in pending))
+                await pipe.execute()
+        except Exception:
+            # Следующий add() по этим ключам должен записать заново
+            for key in pending:
+                self.last.pop(key, None)
+            raise
+        self.written += len(pending)
+        return len(pending)
+
+    def stats(self):
+        total = self.written + self.skipped
+        return {
+            "written": self.written,
+            "skipped": self.skipped,
+            "skip_rate": round(self.skipped / total, 3) if total else 0.0,
+        }
+
+    def reset_stats(self):
+        self.written = self.skipped = 0
+
+
+class IndicatorFlusher:
+    """Грязные (tf, symbol) из Redis -> COPY в staging -> upsert в coin_indicators."""
+
+    def __init__(self, pool, redis, table="coin_indicators", staging="coin_indicators_staging",
+                 prefix=PREFIX, batch=FLUSH_BATCH):
+        self.pool = pool
+        self.redis = redis
+        self.table = table
+        self.staging = staging
+        self.prefix = prefix
+        self.batch = batch
+        self.sql = MERGE_SQL.format(table=table, staging=staging)
+        self.rows = 0
+        self.flushes = 0
+        self.last_ms = 0.0
+
+    async def rehydrate(self, timeframes):
+        """
+        Заполняет пустые indicators:{tf} из coin_indicators (рестарт Redis).
+        HSETNX: значения, которые воркеры успели записать, не перетираются. Возвращает число полей.
+        """
+        timeframes = list(timeframes)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for tf in timeframes:
+                pipe.exists(hash_key(tf, self.prefix))
+            exists = await pipe.execute()
+        empty = [tf for tf, e in zip(timeframes, exists) if not e]
+        if not empty:
+            return 0
+        by_tf = await load_indicators(self.pool, empty, self.table)
+        n = 0
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for tf, docs in by_tf.items():
+                for symbol, doc in docs.items():
+                    pipe.hsetnx(hash_key(tf, self.prefix), symbol, doc)
+                    n += 1
+            await pipe.execute()
+        return n
+
+    async def _records(self, members):
+        by_tf = {}
+        for m in members:
+            tf, symbol = (m.decode() if isinstance(m, bytes) else m).split('|', 1)
+            by_tf.setdefault(tf, []).append(symbol)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for tf, symbols in by_tf.items():
+                pipe.hmget(hash_key(tf, self.prefix), symbols)
+            values = await pipe.execute()
+        records = []
+        for (tf, symbols), docs in zip(by_tf.items(), values):
+            for symbol, doc in zip(symbols, docs):
+                if doc is None:
+                    continue
+                d = json.loads(doc)
+                records.append(
+                    (symbol, tf) + tuple(d.get(f) for f in _FIELDS)
+                    + (datetime.fromtimestamp(d['ts'], tz=timezone.utc),)
+                )
+        return records
+
+    async def _claim(self):
+        """Ключи в обработке: оставшиеся от упавшего/неудачного пакета или новый пакет грязных."""
+        processing = flushing_key(self.prefix)
+        members = await self.redis.smembers(processing)
+        if members:
+            return list(members)
+        return await self.redis.eval(_CLAIM, 2, dirty_key(self.prefix), processing, self.batch)
+
+    async def flush_batch(self):
+        """Один пакет: до batch грязных ключей. Возвращает число забранных ключей."""
+        members = await self._claim()
+        if not members:
+            return 0
+        t0 = time.perf_counter()
+        # При ошибке ключи остаются в indicators:flushing — следующий вызов повторит пакет
+        records = await self._records(members)
+        if records:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute(STAGING_SQL.format(table=self.table, staging=self.staging))
+                    await conn.copy_records_to_table(self.staging, records=records, columns=_ALL)
+                    await conn.execute(self.sql)
+        await self.redis.delete(flushing_key(self.prefix))
+        self.rows += len(records)
+        self.flushes += 1
+        self.last_ms = (time.perf_counter() - t0) * 1000
+        return len(members)
+
+    async def flush(self):
+        """Сбрасывает все грязные ключи пакетами."""
+        total = 0
+        while True:
+            n = await self.flush_batch()
+            total += n
+            if n < self.batch:
+                return total
+
+    def stats(self):
+        return {"rows": self.rows, "flushes": self.flushes, "last_ms": round(self.last_ms, 1)}
+
+    def reset_stats(self):
+        self.rows = self.flushes = 0
@@ -0,0 +1,216 @@
+"""
+Общий планировщик REST-запросов к бирже (fetch_ohlcv) для всех загрузчиков.
+
+- TokenBucket считает вес запросов (у Binance klines весят KLINES_WEIGHT) и
+  держит WEIGHT_PER_MIN в минуту с запасом до лимита IP (6000): тот же IP
+  делят стример и остальные процессы.
+- Один диспетчер держит CONCURRENCY запросов в полете: как только слот и
+  токены освободились, уходит следующий запрос из очереди — без пачек,
+  ждущих самый медленный символ.
+- Очередь приоритетная: LIVE (свежие дыры, последние свечи) всегда
+  раньше HISTORY (глубокая история).
+- 429 / 418 (RateLimitExceeded / DDoSProtection в ccxt): запрос
+  возвращается в очередь на свое место, вся корзина встает на Retry-After
+  или экспоненциальную паузу. Если заголовок x-mbx-used-weight-1m
+  показывает, что бюджет минуты выбран, ждем начала следующей минуты.
+  Заголовки разбираются осторожно: Retry-After бывает и HTTP-датой, а
+  непонятное значение — просто повод для экспоненциальной паузы.
+- close() отменяет все ожидающие fetch_ohlcv: и в полете, и в очереди.
+
+Встроенный троттлинг ccxt нужно выключить ('enableRateLimit': False),
+иначе он последовательно разносит запросы и не дает держать параллелизм.
+Для офлайн-проверки — common/fake_exchange.py.
+"""
+import asyncio
+import itertools
+import logging
+import math
+import os
+import time
+from email.utils import parsedate_to_datetime
+
+LIVE, HISTORY = 0, 1
+WEIGHT_PER_MIN = int(os.getenv("REST_WEIGHT_PER_MIN", "4800"))
+CONCURRENCY = int(os.getenv("REST_CONCURRENCY", "16"))
+KLINES_WEIGHT = int(os.getenv("REST_KLINES_WEIGHT", "2"))
+BURST_SEC = 10     # емкость корзины — вес за столько секунд
+MAX_BACKOFF = 60
+RATE_LIMIT_ERRORS = ('RateLimitExceeded', 'DDoSProtection')
+
+logger = logging.getLogger("RestScheduler")
+
+
+def _rate_limited(error):
+    # По имени класса: работает и с ccxt, и с fake_exchange без импорта ccxt
+    return any(c.__name__ in RATE_LIMIT_ERRORS for c in type(error).__mro__)
+
+
+def _header(headers, name):
+    for k, v in (headers or {}).items():
+        if k.lower() == name:
+            return v
+    return None
+
+
+def _retry_after(value):
+    """Retry-After в секундах: число или HTTP-дата; None, если не разобрать."""
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError, IndexError):
+            return None
+    return max(seconds, 0.0) if math.isfinite(seconds) else None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, per_min, burst_sec=BURST_SEC):
+        self.rate = per_min / 60
+        self.capacity = self.rate * burst_sec
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds):
+        """Никаких запросов ближайшие seconds; после паузы корзина набирается с нуля."""
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = self.paused_until
+
+    async def acquire(self, weight):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self._refill(now)
+            # Запрос тяжелее всей корзины уходит в долг, а не ждет вечно
+            if self.tokens >= min(weight, self.capacity):
+                self.tokens -= weight
+                return
+            await asyncio.sleep((min(weight, self.capacity) - self.tokens) / self.rate)
+
+
+class RestScheduler:
+    def __init__(self, exchange, weight_per_min=WEIGHT_PER_MIN, concurrency=CONCURRENCY,
+                 weight=KLINES_WEIGHT):
+        self.exchange = exchange
+        self.weight_per_min = weight_per_min
+        self.weight = weight
+        self.bucket = TokenBucket(weight_per_min)
+        self.slots = asyncio.Semaphore(concurrency)
+        self.queue = asyncio.PriorityQueue()
+        self.seq = itertools.count()  # FIFO внутри приоритета
+        self.dispatcher = None
+        self.tasks = {}  # запросы в полете: task -> future (ссылки держим, пока не завершатся)
+        self.streak = 0  # 429 подряд
+        self.counters = {"requests": 0, "weight": 0, "throttled": 0, "errors": 0, "in_flight": 0}
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, priority=HISTORY):
+        """Как exchange.fetch_ohlcv, но через общую очередь и корзину."""
+        if self.dispatcher is None:
+            self.dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+        future = asyncio.get_running_loop().create_future()
+        call = ('fetch_ohlcv', (symbol, timeframe), {'since': since, 'limit': limit})
+        self.queue.put_nowait((priority, next(self.seq), call, future))
+        return await future
+
+    async def _dispatch(self):
+        while True:
+            # Один диспетчер: вес ждет не больше одного запроса, остальные
+            # остаются в очереди, и LIVE обгоняет HISTORY
+            await self.slots.acquire()
+            item = await self.queue.get()
+            if item[-1].done():  # вызывающий отменил ожидание
+                self.slots.release()
+                continue
+            try:
+                await self.bucket.acquire(self.weight)
+            except asyncio.CancelledError:
+                self.queue.put_nowait(item)  # close() отменит его вместе с очередью
+                raise
+            task = asyncio.get_running_loop().create_task(self._run(item))
+            self.tasks[task] = item[-1]
+            task.add_done_callback(self._forget)
+
+    def _forget(self, task):
+        self.tasks.pop(task, None)
+
+    async def _run(self, item):
+        _, _, (method, args, kwargs), future = item
+        self.counters["in_flight"] += 1
+        self.counters["weight"] += self.weight
+        try:
+            result = await getattr(self.exchange, method)(*args, **kwargs)
+        except Exception as e:
+            error = e
+            if _rate_limited(e):
+                try:
+                    self._backoff(e)
+                    self.queue.put_nowait(item)  # тот же seq — то же место в очереди
+                    return
+                except Exception as retry_error:
+                    # Ожидающий fetch_ohlcv не должен повиснуть из-за сбоя в самом повторе
+                    error = retry_error
+            self.counters["errors"] += 1
+            if not future.done():
+                future.set_exception(error)
+            return
+        finally:
+            self.counters["in_flight"] -= 1
+            self.slots.release()
+        self.streak = 0
+        self.counters["requests"] += 1
+        if not future.done():
+            future.set_result(result)
+        self._sync()
+
+    def _headers(self):
+        return getattr(self.exchange, 'last_response_headers', None)
+
+    def _backoff(self, error):
+        self.counters["throttled"] += 1
+        self.streak += 1
+        delay = _retry_after(_header(self._headers(), 'retry-after'))
+        if delay is None:
+            delay = min(2 ** (self.streak - 1), MAX_BACKOFF)
+        logger.warning(f"⏳ {type(error).__name__}: pausing {delay:.1f}s")
+        self.bucket.pause(delay)
+
+    def _sync(self):
+        # Вес минуты, который видит биржа (с учетом других процессов на этом IP)
+        used = _int(_header(self._headers(), 'x-mbx-used-weight-1m'))
+        if used is not None and used >= self.weight_per_min:
+            self.bucket.pause(60 - time.time() % 60)
+
+    def stats(self):
+        return {**self.counters, "queued": self.queue.qsize()}
+
+    async def close(self):
+        """Останавливает диспетчер и отменяет все ожидающие запросы (в полете и в очереди)."""
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+            await asyncio.gather(self.dispatcher, return_exceptions=True)
+            self.dispatcher = None
+        tasks, self.tasks = self.tasks, {}
+        for task, future in tasks.items():
+            task.cancel()
+            future.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        while not self.queue.empty():
+            self.queue.get_nowait()[-1].cancel()
@@ -0,0 +1,111 @@
+"""
+Объекты базы, появившиеся после первичной схемы (database/schema.sql).
+
+schema.sql выполняется только init-скриптом Postgres на пустом томе; на живой
+базе (docker-compose.v2.yml, внешний том backend_ts_data) его никто не
+запускает. migrate() создает то же самое идемпотентно — deploy.sh вызывает
+ее (engines/backfill-engine/init_db.py) перед запуском сервисов.
+
+Каждый оператор идет отдельным запросом без transaction(): CALL
+refresh_continuous_aggregate внутри транзакции не работает.
+"""
+import logging
+
+from common.aggregates import AGGREGATES
+
+logger = logging.getLogger("Schema")
+
+# Continuous aggregates для старших ТФ (klines, 24h статистика скринера).
+# Иерархия: 5m из candles, 15m из 5m, 1h из 15m, 4h и 1d из 1h.
+# materialized_only: формирующийся хвост API добирает из сырых candles сам (см. api_v2/routers/klines.py),
+# поэтому refresh закрывает только завершенные бакеты (end_offset = размер бакета).
+_VIEW = """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {view}
+    WITH (timescaledb.continuous, timescaledb.materialized_only = true) AS
+    SELECT symbol, time_bucket('{bucket}', {time}) AS bucket,
+           FIRST(open, {time}) AS open, MAX(high) AS high, MIN(low) AS low,
+           LAST(close, {time}) AS close, SUM(volume) AS volume
+    FROM {source}
+    GROUP BY symbol, time_bucket('{bucket}', {time})
+    WITH NO DATA
+"""
+
+# view -> (бакет, источник, start_offset, end_offset, schedule_interval).
+# start_offset — насколько назад подхватываются поздние данные (докачка гэпов),
+# end_offset — не трогаем формирующийся бакет. Задержка материализации должна
+# укладываться в REFRESH_LAG из klines.py.
+VIEWS = {
+    "candles_5m":  ("5 minutes",  "candles",     "1 day",   "5 minutes",  "1 minute"),
+    "candles_15m": ("15 minutes", "candles_5m",  "2 days",  "15 minutes", "5 minutes"),
+    "candles_1h":  ("1 hour",     "candles_15m", "7 days",  "1 hour",     "15 minutes"),
+    "candles_4h":  ("4 hours",    "candles_1h",  "30 days", "4 hours",    "1 hour"),
+    "candles_1d":  ("1 day",      "candles_1h",  "90 days", "1 day",      "1 hour"),
+}
+
+# Индикаторы: строка на (symbol, ТФ), типизированные колонки вместо шести JSONB в coin_status.
+# Воркер пишет только изменившиеся значения в Redis, flusher переносит их сюда пакетами
+# через временную staging-таблицу (common/indicator_writer.py). fillfactor оставляет место под HOT-обновления строк,
+# у которых индексированный rsi не изменился.
+INDICATOR_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS coin_indicators (
+        symbol TEXT NOT NULL,
+        tf TEXT NOT NULL,
+        price DOUBLE PRECISION,
+        rsi DOUBLE PRECISION,
+        macd DOUBLE PRECISION,
+        macd_signal DOUBLE PRECISION,
+        macd_hist DOUBLE PRECISION,
+        ema_50 DOUBLE PRECISION,
+        ema_200 DOUBLE PRECISION,
+        bb_upper DOUBLE PRECISION,
+        bb_lower DOUBLE PRECISION,
+        trend DOUBLE PRECISION,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (symbol, tf)
+    ) WITH (fillfactor = 70)
+    """,
+    # Фильтры стратегий вида "RSI < 30 на 1h" — index scan по (tf, rsi)
+    "CREATE INDEX IF NOT EXISTS coin_indicators_tf_rsi ON coin_indicators (tf, rsi)",
+]
+
+EXISTING_SQL = "SELECT view_name FROM timescaledb_information.continuous_aggregates"
+
+
+def aggregate_statements(view):
+    bucket, source, start, end, schedule = VIEWS[view]
+    return [
+        _VIEW.format(view=view, bucket=bucket, source=source, time="time" if source == "candles" else "bucket"),
+        f"SELECT add_continuous_aggregate_policy('{view}', start_offset => INTERVAL '{start}', "
+        f"end_offset => INTERVAL '{end}', schedule_interval => INTERVAL '{schedule}', if_not_exists => TRUE)",
+    ]
+
+
+async def ensure_aggregates(conn):
+    """
+    Создает недостающие агрегаты и их политики (по порядку иерархии).
+    Только что созданные материализуются по всей истории — один раз.
+    """
+    existing = {r['view_name'] for r in await conn.fetch(EXISTING_SQL)}
+    created = []
+    for view, _ in AGGREGATES:
+        for sql in aggregate_statements(view):
+            await conn.execute(sql)
+        if view not in existing:
+            created.append(view)
+    for view in created:
+        logger.info(f"Materializing {view}...")
+        await conn.execute(f"CALL refresh_continuous_aggregate('{view}', NULL, NULL)")
+    return created
+
+
+async def ensure_indicators(conn):
+    for sql in INDICATOR_STATEMENTS:
+        await conn.execute(sql)
+
+
+async def migrate(pool):
+    """Все объекты после schema.sql; повторный запуск ничего не меняет."""
+    async with pool.acquire() as conn:
+        await ensure_indicators(conn)
+        return await ensure_aggregates(conn)
@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
 def calculate_all_indicators(df):
     """Рассчитывает массив индикаторов (The Beast) на чистом Pandas/Numpy."""
@@ -72,4 +73,123 @@ def calculate_all_indicators(df):
     res['mfi_14'] = (100 - (100 / (1 + mfr))).iloc[-1]
 
     # Очистка от NaN
-    return {k: (round(float(v), 6) if v is not None and not np.isnan(v) else None) for k, v in res.items()}
\ No newline at end of file
+    return {k: (round(float(v), 6) if v is not None and not np.isnan(v) else None) for k, v in res.items()}
+
+
+# --- Batch (symbols × bars) ---
+
+BATCH_COLUMNS = [
+    'rsi_7', 'rsi_14', 'rsi_21',
+    'macd', 'macd_signal', 'macd_hist',
+    'ema_20', 'ema_50', 'ema_100', 'ema_200',
+    'bb_upper', 'bb_lower', 'bb_middle',
+    'atr_14', 'stoch_k', 'stoch_d', 'adx_14', 'mfi_14',
+]
+
+
+def _windows(x, window, count=1):
+    """Последние `count` окон длины `window` по оси баров: (symbols, count, window)."""
+    return sliding_window_view(x[:, -(window + count - 1):], window, axis=1)
+
+
+def _ema_weights(n, span):
+    """Веса, дающие последнее значение ewm(span, adjust=False) одним скалярным произведением."""
+    a = 2 / (span + 1)
+    w = a * (1 - a) ** np.arange(n - 1, -1, -1, dtype=float)
+    w[0] = (1 - a) ** (n - 1)
+    return w
+
+
+def _ema_series(x, span):
+    """Полная серия ewm(span, adjust=False) по оси баров, векторно по символам."""
+    a = 2 / (span + 1)
+    out = np.empty_like(x)
+    out[:, 0] = x[:, 0]
+    for t in range(1, x.shape[1]):
+        out[:, t] = out[:, t - 1] + a * (x[:, t] - out[:, t - 1])
+    return out
+
+
+def calculate_all_indicators_batch(high, low, close, volume):
+    """
+    Векторная версия calculate_all_indicators для всех монет сразу.
+    Принимает 2-D матрицы (symbols × bars, старые бары слева, одинаковая длина истории),
+    возвращает матрицу (symbols × len(BATCH_COLUMNS)) с NaN там, где значения нет.
+    Формулы совпадают с calculate_all_indicators (последнее значение каждой серии).
+    """
+    high, low, close, volume = (np.asarray(m, dtype=float) for m in (high, low, close, volume))
+    n_sym, n_bars = close.shape
+    res = np.full((n_sym, len(BATCH_COLUMNS)), np.nan)
+    col = {name: i for i, name in enumerate(BATCH_COLUMNS)}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # diff() с нулем на первом баре (как where(delta > 0, 0) у NaN)
+        delta = np.diff(close, axis=1, prepend=close[:, :1])
+
+        # 1. RSI (Momentum)
+        for p in [7, 14, 21]:
+            if n_bars < p: continue
+            gain = np.clip(delta[:, -p:], 0, None).mean(axis=1)
+            loss = np.clip(-delta[:, -p:], 0, None).mean(axis=1)
+            res[:, col[f'rsi_{p}']] = 100 - (100 / (1 + gain / loss))
+
+        # 2. MACD (Trend)
+        macd = _ema_series(close, 12) - _ema_series(close, 26)
+        signal = macd @ _ema_weights(n_bars, 9)
+        res[:, col['macd']] = macd[:, -1]
+        res[:, col['macd_signal']] = signal
+        res[:, col['macd_hist']] = macd[:, -1] - signal
+
+        # 3. EMA Grid (Trend)
+        for p in [20, 50, 100, 200]:
+            res[:, col[f'ema_{p}']] = close @ _ema_weights(n_bars, p)
+
+        # 4. Bollinger Bands (Volatility)
+        if n_bars >= 20:
+            sma20 = close[:, -20:].mean(axis=1)
+            std20 = close[:, -20:].std(axis=1, ddof=1)
+            res[:, col['bb_upper']] = sma20 + std20 * 2
+            res[:, col['bb_lower']] = sma20 - std20 * 2
+            res[:, col['bb_middle']] = sma20
+
+        # 5. ATR (Volatility)
+        prev_close = np.concatenate([np.full((n_sym, 1), np.nan), close[:, :-1]], axis=1)
+        tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        if n_bars >= 14:
+            res[:, col['atr_14']] = tr[:, -14:].mean(axis=1)
+
+        # 6. Stochastic (Momentum): k для (до) трех последних баров
+        if n_bars >= 14:
+            count = min(3, n_bars - 13)
+            low14 = _windows(low, 14, count).min(axis=2)
+            high14 = _windows(high, 14, count).max(axis=2)
+            k = 100 * (close[:, -count:] - low14) / (high14 - low14)
+            res[:, col['stoch_k']] = k[:, -1]
+            if count == 3:
+                res[:, col['stoch_d']] = k.mean(axis=1)
+
+        # 7. ADX (Trend Strength): dx для 14 последних баров
+        if n_bars >= 28:
+            plus_dm = np.diff(high, axis=1, prepend=np.nan)
+            minus_dm = np.diff(low, axis=1, prepend=np.nan)
+            plus_dm[plus_dm < 0] = 0
+            minus_dm[minus_dm > 0] = 0
+            tr_rolling = _windows(tr, 14, 14).sum(axis=2)
+            plus_di = 100 * (_windows(plus_dm, 14, 14).sum(axis=2) / tr_rolling)
+            minus_di = 100 * (np.abs(_windows(minus_dm, 14, 14)).sum(axis=2) / tr_rolling)
+            dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+            res[:, col['adx_14']] = dx.mean(axis=1)
+
+        # 8. MFI (Money Flow Index - Volume)
+        if n_bars >= 14:
+            tp = (high + low + close) / 3
+            mf = tp * volume
+            up = np.zeros_like(tp, dtype=bool)
+            down = np.zeros_like(tp, dtype=bool)
+            up[:, 1:] = tp[:, 1:] > tp[:, :-1]
+            down[:, 1:] = tp[:, 1:] < tp[:, :-1]
+            pos_mf = np.where(up, mf, 0)[:, -14:].sum(axis=1)
+            neg_mf = np.where(down, mf, 0)[:, -14:].sum(axis=1)
+            res[:, col['mfi_14']] = 100 - (100 / (1 + pos_mf / neg_mf))
+
+    return res
@@ -0,0 +1,99 @@
+"""
+Транспорт тиков через Redis Streams (TICK_TRANSPORT=streams).
+
+Pub/Sub теряет сообщения, если воркер не успевает читать, а буфер клиента
+в Redis растет без ограничений. Stream ограничен MAXLEN (память Redis
+фиксирована), а каждый воркер читает его через свою consumer group:
+отставший воркер забирает накопившуюся пачку целиком и оставляет только
+последний тик по каждой монете, вместо того чтобы пересчитывать каждый.
+
+Формат записи тот же, что в канале crypto_updates: {"d": '{"s": ..., "k": [...]}'}.
+"""
+import json
+import logging
+import os
+import time
+
+import redis.asyncio as redis
+
+STREAM = "crypto_updates:stream"
+TICK_TRANSPORT = os.getenv("TICK_TRANSPORT", "pubsub")  # pubsub | streams
+STREAM_MAXLEN = int(os.getenv("TICK_STREAM_MAXLEN", "20000"))
+
+logger = logging.getLogger("TickStream")
+
+
+def publish_stream(pipeline, payloads):
+    """Кладет пачку payload ({"s", "k"}) в stream через pipeline (MAXLEN ~)."""
+    for payload in payloads:
+        pipeline.xadd(STREAM, {"d": json.dumps(payload)}, maxlen=STREAM_MAXLEN, approximate=True)
+
+
+class TickStreamConsumer:
+    """
+    Читает stream через consumer group воркера и отдает только его монеты.
+    read() возвращает { symbol: k } — последний тик по каждой монете из пачки.
+    Счетчики: received / delivered (тики до и после схлопывания), lag / pending группы.
+    """
+
+    def __init__(self, r, group, symbols, consumer="main", count=1000, block_ms=1000, lag_every=10):
+        self.r = r
+        self.group = group
+        self.symbols = set(symbols)
+        self.consumer = consumer
+        self.count = count
+        self.block_ms = block_ms
+        self.lag_every = lag_every
+        self.received = 0
+        self.delivered = 0
+        self.lag = 0
+        self.pending = 0
+        self._last_lag = 0.0
+
+    async def ensure_group(self):
+        try:
+            await self.r.xgroup_create(STREAM, self.group, id="$", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def refresh_lag(self):
+        for g in await self.r.xinfo_groups(STREAM):
+            if g["name"] == self.group:
+                self.lag = g.get("lag") or 0
+                self.pending = g.get("pending") or 0
+
+    async def read(self):
+        try:
+            resp = await self.r.xreadgroup(
+                self.group, self.consumer, {STREAM: ">"}, count=self.count, block=self.block_ms
+            )
+        except redis.ResponseError as e:
+            # Stream или группа пропали (рестарт Redis, FLUSHALL, удаление ключа) — создаем заново
+            if "NOGROUP" not in str(e):
+                raise
+            logger.warning(f"{e}, recreating group {self.group}")
+            await self.ensure_group()
+            return {}
+        if time.time() - self._last_lag > self.lag_every:
+            self._last_lag = time.time()
+            try:
+                await self.refresh_lag()
+            except Exception as e:
+                logger.warning(f"XINFO failed: {e}")
+        if not resp:
+            return {}
+
+        ids, latest = [], {}
+        for _, entries in resp:
+            for entry_id, fields in entries:
+                ids.append(entry_id)
+                data = json.loads(fields["d"])
+                symbol = data.get('s')
+                if symbol in self.symbols:
+                    self.received += 1
+                    latest[symbol] = data.get('k')
+        await self.r.xack(STREAM, self.group, *ids)
+
+        self.delivered += len(latest)
+        return latest
@@ -0,0 +1,85 @@
+"""
+Водяной знак свечей: последняя записанная минута каждого символа.
+
+Redis hash candles:watermark {symbol: minute_ms}. Его двигают те, кто пишет
+свежие минуты (data-engine, backfill-engine), через WatermarkWriter. Lua-скрипт
+только повышает значение, поэтому запись старых минут (ремонт дыр) его не
+откатывает.
+
+backfill-engine сравнивает знак с последней закрытой минутой и ходит в REST
+только за отставшими символами. Без Redis (или пока хеш пуст) тот же ответ
+дает один запрос к candles за последние WINDOW_HOURS (from_db).
+
+Знак видит только хвост: дыру посреди уже записанных минут (рестарт стримера)
+находит common/gap_repair.py.
+"""
+import logging
+
+from common.candle_writer import CandleWriter
+
+KEY = "candles:watermark"
+WINDOW_HOURS = 2
+
+logger = logging.getLogger("Watermark")
+
+_ADVANCE = """
+for i = 1, #ARGV, 2 do
+    local cur = tonumber(redis.call('HGET', KEYS[1], ARGV[i]))
+    if not cur or cur < tonumber(ARGV[i + 1]) then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+"""
+
+MARKS_SQL = """
+    SELECT symbol, (extract(epoch FROM max(time)) * 1000)::bigint AS mark
+    FROM candles
+    WHERE time > NOW() - make_interval(hours => $1)
+    GROUP BY symbol
+"""
+
+
+def latest(records):
+    """{symbol: последняя минута (ms)} по записям (time, symbol, ...)."""
+    marks = {}
+    for r in records:
+        ms = int(r[0].timestamp() * 1000)
+        if ms > marks.get(r[1], -1):
+            marks[r[1]] = ms
+    return marks
+
+
+async def advance(redis, marks):
+    if marks:
+        args = [x for symbol, ms in marks.items() for x in (symbol, ms)]
+        await redis.eval(_ADVANCE, 1, KEY, *args)
+
+
+async def read(redis):
+    raw = await redis.hgetall(KEY)
+    return {(s.decode() if isinstance(s, bytes) else s): int(v) for s, v in raw.items()}
+
+
+async def from_db(pool, hours=WINDOW_HOURS):
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(MARKS_SQL, hours)
+    return {r['symbol']: r['mark'] for r in rows}
+
+
+class WatermarkWriter(CandleWriter):
+    """CandleWriter, который после каждой записи двигает candles:watermark."""
+
+    def __init__(self, pool, redis, **kwargs):
+        super().__init__(pool, **kwargs)
+        self.redis = redis
+
+    async def flush(self):
+        marks = latest(self.pending.values())
+        n = await super().flush()
+        if n and self.redis is not None:
+            try:
+                await advance(self.redis, marks)
+            except Exception as e:
+                # Не страшно: backfill-engine лишний раз сходит в REST
+                logger.warning(f"Watermark update failed: {e}")
+        return n
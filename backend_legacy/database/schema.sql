@@ -32,3 +32,12 @@ SELECT add_compression_policy('candles', INTERVAL '3 days');
 
 -- 5. (Опционально) Политика удаления: хранить 2 года (как мы обсуждали)
 SELECT add_retention_policy('candles', INTERVAL '2 years');
+
+-- 6. Staging пакетной записи свечей — временная таблица соединения писателя (common/candle_writer.py)
+
+-- 7. Continuous aggregates для старших ТФ (candles_5m ... candles_1d) и их политики
+-- создает common/schema.py (engines/backfill-engine/init_db.py, шаг deploy.sh):
+-- этот файл на живой базе не выполняется, а CALL refresh_continuous_aggregate
+-- не работает внутри транзакции.
+
+-- 8. Индикаторы (coin_indicators и индекс по (tf, rsi)) — тоже в common/schema.py
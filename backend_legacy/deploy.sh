@@ -42,15 +42,19 @@ docker exec crypto_db psql -U $POSTGRES_USER -c "ALTER USER $POSTGRES_USER WITH
 echo "🏗 Building API image (to include new scripts)..."
 docker compose build api
 
-# 7. ЗАКРЫТИЕ ДЫР В ДАННЫХ (Gap Filler)
-echo "📥 Running Gap Filler to fetch missing candles..."
-docker compose run --rm api python3 fill_gaps.py
+# 7. МИГРАЦИИ (continuous aggregates и т.д.; init-скрипт schema.sql на живой базе не выполняется)
+echo "🗄 Applying database migrations..."
+docker compose -f docker-compose.v2.yml run --rm --no-deps backfill-engine python3 engines/backfill-engine/init_db.py
 
-# 8. Запускаем всё остальное
+# 8. ЗАКРЫТИЕ ДЫР В ДАННЫХ (common/gap_repair.py)
+echo "📥 Repairing gaps in candles..."
+docker compose -f docker-compose.v2.yml run --rm --no-deps backfill-engine python3 engines/backfill-engine/repair.py --hours 72
+
+# 9. Запускаем всё остальное
 echo "🚀 Starting all services..."
 docker compose up -d
 
-# 9. Финальная проверка
+# 10. Финальная проверка
 echo "🔍 Verifying API..."
 sleep 5
 HTTP_CODE=$(curl -s -o /dev/null -w "%{http_code}" http://localhost:8000/api/coins)
@@ -0,0 +1,31 @@
+"""
+Идемпотентная миграция базы: объекты после database/schema.sql (common/schema.py).
+deploy.sh запускает ее перед стартом сервисов:
+
+    python3 engines/backfill-engine/init_db.py
+"""
+import asyncio
+import logging
+import sys
+import os
+
+# Импорты из common
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from common.database import db
+from common.schema import migrate
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+
+async def main():
+    await db.connect()
+    try:
+        print("Applying database migrations...", flush=True)
+        created = await migrate(db.pool)
+        print(f"✅ Database is up to date (created: {', '.join(created) or 'nothing'}).", flush=True)
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
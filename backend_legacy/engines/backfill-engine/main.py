@@ -1,75 +1,102 @@
 import asyncio
 import sys
 import os
+import time
 import ccxt.async_support as ccxt
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from common.database import db
+from common.gap_repair import GapRepair
+from common.rest_scheduler import LIVE, RestScheduler
+from common import watermark
+from common.watermark import WatermarkWriter
 
 # Импорты из common
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-async def sync_candles():
-    """Синхронизирует последние минутные свечи для всех активных монет."""
-    print(f"🔄 Syncing candles at {datetime.now()}", flush=True)
-    
-    exchange = ccxt.binance({
-        'enableRateLimit': True,
-        'options': {'defaultType': 'spot'}
-    })
-    
-    try:
-        rows = await db.fetch_all("SELECT symbol FROM coins_meta WHERE is_active = TRUE")
-        symbols = [r['symbol'] for r in rows]
-        
-        # Обрабатываем пачками по 5 символов параллельно для скорости
-        batch_size = 5
-        for i in range(0, len(symbols), batch_size):
-            batch = symbols[i:i+batch_size]
-            tasks = [fetch_and_save(exchange, s) for s in batch]
-            await asyncio.gather(*tasks)
-            await asyncio.sleep(0.1) # Лимиты API
-            
-    except Exception as e:
-        print(f"❌ Sync Error: {e}", flush=True)
-    finally:
-        await exchange.close()
+# Через столько секунд после конца минуты стример уже записал ее бар
+LAG_SEC = int(os.getenv("BACKFILL_LAG_SEC", "20"))
+# Символ без знака (стример его еще не видел) — берем последние FRESH свечей
+FRESH = 5
+# Глубже догоняем не здесь, а ремонтом (repair.py / sweep)
+CATCHUP = 1000
+# Раз в SWEEP_MIN минут — поиск дыр внутри последних SWEEP_HOURS (их знак не видит)
+SWEEP_MIN = int(os.getenv("BACKFILL_SWEEP_MIN", "15"))
+SWEEP_HOURS = 2
+
+MINUTE_MS = 60_000
+
+
+async def sync_candles(scheduler, writer, symbols):
+    """
+    Догружает по REST только символы, чей candles:watermark отстает от последней
+    закрытой минуты. Пока стример пишет бары, таких почти нет.
+    """
+    now_ms = int(time.time() * 1000) - LAG_SEC * 1000
+    target = now_ms - now_ms % MINUTE_MS - MINUTE_MS  # последняя закрытая минута
 
-async def fetch_and_save(exchange, symbol):
+    marks = await watermark.read(db.redis) if db.redis else {}
+    if not marks:
+        marks = await watermark.from_db(db.pool)
+    behind = [(s, marks.get(s)) for s in symbols if marks.get(s, -1) < target]
+    if not behind:
+        return 0, 0
+
+    results = await asyncio.gather(*(fetch(scheduler, s, mark, target) for s, mark in behind))
+    records = [r for rs in results for r in rs]
+    for r in records:
+        writer.add(r)
+    await writer.flush()
+    return len(behind), len(records)
+
+
+async def fetch(scheduler, symbol, mark, target):
+    since = mark + MINUTE_MS if mark is not None else target - (FRESH - 1) * MINUTE_MS
+    since = max(since, target - (CATCHUP - 1) * MINUTE_MS)
     try:
-        # Берем последние 5 свечей (запас на случай лагов)
-        candles = await exchange.fetch_ohlcv(symbol, '1m', limit=5)
-        if not candles: return
-        
-        records = []
-        for c in candles:
-            dt = datetime.fromtimestamp(c[0] / 1000, tz=timezone.utc)
-            records.append((dt, symbol, c[1], c[2], c[3], c[4], c[5]))
-        
-        query = """
-            INSERT INTO candles (time, symbol, open, high, low, close, volume)
-            VALUES ($1, $2, $3, $4, $5, $6, $7)
-            ON CONFLICT (time, symbol) DO UPDATE SET
-                open = EXCLUDED.open,
-                high = EXCLUDED.high,
-                low = EXCLUDED.low,
-                close = EXCLUDED.close,
-                volume = EXCLUDED.volume;
-        """
-        async with db.pool.acquire() as conn:
-            await conn.executemany(query, records)
+        candles = await scheduler.fetch_ohlcv(
+            symbol, '1m', since=since, limit=(target - since) // MINUTE_MS + 1, priority=LIVE
+        )
     except Exception as e:
         print(f"  [!] Error {symbol}: {e}")
+        return []
+    # Формирующуюся минуту не пишем — ее закроет стример
+    return [
+        (datetime.fromtimestamp(c[0] / 1000, tz=timezone.utc), symbol, c[1], c[2], c[3], c[4], c[5])
+        for c in candles or () if c[0] <= target
+    ]
+
 
 async def main():
     await db.connect()
-    while True:
-        start_time = datetime.now()
-        await sync_candles()
-        elapsed = (datetime.now() - start_time).total_seconds()
-        # Цикл раз в минуту
-        wait_time = max(60 - elapsed, 10)
-        print(f"💤 Sync finished in {elapsed:.1f}s. Waiting {wait_time:.1f}s...")
-        await asyncio.sleep(wait_time)
+    exchange = ccxt.binance({
+        'enableRateLimit': False,  # лимитами управляет RestScheduler
+        'options': {'defaultType': 'spot'}
+    })
+    scheduler = RestScheduler(exchange)
+    writer = WatermarkWriter(db.pool, db.redis)
+    repair = GapRepair(db.pool, scheduler, db.redis)
+    last_sweep = 0.0
+    try:
+        while True:
+            # Просыпаемся через LAG_SEC после начала каждой минуты
+            await asyncio.sleep(60 - (time.time() - LAG_SEC) % 60)
+            start_time = time.time()
+            try:
+                rows = await db.fetch_all("SELECT symbol FROM coins_meta WHERE is_active = TRUE")
+                symbols = [r['symbol'] for r in rows]
+                behind, written = await sync_candles(scheduler, writer, symbols)
+                print(f"🔄 {behind}/{len(symbols)} symbols behind, {written} candles "
+                      f"in {time.time() - start_time:.1f}s", flush=True)
+                if time.time() - last_sweep > SWEEP_MIN * 60:
+                    last_sweep = time.time()
+                    stats = await repair.run(symbols, SWEEP_HOURS)
+                    print(f"🩹 Sweep: {stats}, scheduler {scheduler.stats()}", flush=True)
+            except Exception as e:
+                print(f"❌ Sync Error: {e}", flush=True)
+    finally:
+        await scheduler.close()
+        await exchange.close()
+        await db.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
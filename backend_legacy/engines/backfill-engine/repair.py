@@ -0,0 +1,55 @@
+"""
+Разовый ремонт дыр в candles (см. common/gap_repair.py).
+
+    python3 engines/backfill-engine/repair.py --hours 72 --concurrency 16
+    python3 engines/backfill-engine/repair.py --symbols BTC/USDT,ETH/USDT
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import os
+import ccxt.async_support as ccxt
+
+# Импорты из common
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from common.database import db
+from common.gap_repair import GapRepair
+from common.rest_scheduler import CONCURRENCY, RestScheduler
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+async def load_symbols():
+    rows = await db.fetch_all("SELECT symbol FROM coins_meta WHERE is_active = TRUE")
+    if not rows:
+        rows = await db.fetch_all("SELECT DISTINCT symbol FROM candles WHERE time > NOW() - INTERVAL '2 days'")
+    return [r['symbol'] for r in rows]
+
+
+async def main(args):
+    await db.connect()
+    exchange = ccxt.binance({
+        'enableRateLimit': False,  # лимитами управляет RestScheduler
+        'options': {'defaultType': 'spot'}
+    })
+    try:
+        symbols = args.symbols.split(',') if args.symbols else await load_symbols()
+        logger.info(f"🚀 Repairing last {args.hours}h for {len(symbols)} symbols ({args.concurrency} in flight)")
+        scheduler = RestScheduler(exchange, concurrency=args.concurrency)
+        repair = GapRepair(db.pool, scheduler, db.redis)
+        stats = await repair.run(symbols, args.hours)
+        logger.info(f"✅ Repair finished: {stats}, scheduler {scheduler.stats()}")
+        await scheduler.close()
+    finally:
+        await exchange.close()
+        await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=24, help="глубина окна поиска дыр")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="запросов к бирже в полете")
+    parser.add_argument("--symbols", help="через запятую (по умолчанию — активные из coins_meta)")
+    asyncio.run(main(parser.parse_args()))
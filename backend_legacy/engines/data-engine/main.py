@@ -8,10 +8,26 @@ from datetime import datetime
 # Импорты из common
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from common.database import db
+from common.tick_stream import TICK_TRANSPORT, publish_stream
+from common.candle_writer import CandleQueue
+from common.minute_bars import MinuteBarBuilder
+from common.watermark import WatermarkWriter
 
 async def run_streamer():
-    """Слушает живые котировки Binance и пушит ТОЛЬКО в Redis."""
-    print("🚀 Data Engine: Real-time Price Streamer started (No-DB mode)", flush=True)
+    """
+    Слушает живые котировки Binance: тики -> Redis, закрытые 1m бары -> candles.
+    Запись двигает candles:watermark — по нему backfill-engine ходит в REST
+    только за отставшими символами.
+    """
+    print("🚀 Data Engine: Real-time Price Streamer started", flush=True)
+    
+    # Ограниченная очередь: при зависании БД записи одной (минуты, монеты) сливаются
+    queue = CandleQueue(maxsize=int(os.getenv("CANDLE_QUEUE_MAX", "50000")))
+    writer = WatermarkWriter(db.pool, db.redis)
+    asyncio.create_task(writer.run(queue))
+    asyncio.create_task(writer.report(queue, db.redis, key="metrics:data_engine"))
+    # Минуту старта не пишем: начало ее тиков пропущено, ее (и знак) догрузит backfill-engine по REST
+    bars = MinuteBarBuilder(start_ms=int(datetime.now().timestamp() * 1000))
     
     exchange = ccxt_pro.binance({
         'enableRateLimit': True,
@@ -22,6 +38,7 @@ async def run_streamer():
         try:
             tickers = await exchange.watch_tickers()
             if tickers:
+                payloads = []
                 for symbol, ticker in tickers.items():
                     if not symbol.endswith('/USDT'): continue
                     
@@ -33,9 +50,26 @@ async def run_streamer():
                     # Используем last для всех полей OHLC, чтобы не брать 24h open
                     candle = [timestamp, current_price, current_price, current_price, current_price, ticker['baseVolume']]
 
-                    if db.redis:
-                        await db.redis.publish("crypto_updates", json.dumps({"s": symbol, "k": candle}))
-                        
+                    payloads.append({"s": symbol, "k": candle})
+
+                    # Одна запись на монету в минуту — когда минута закрылась
+                    closed = bars.update(symbol, timestamp, current_price, ticker['baseVolume'] or 0.0)
+                    if closed:
+                        queue.put_nowait(closed)
+
+                # Монеты без тиков: закрываем их минуту по часам
+                for record in bars.close_stale(int(datetime.now().timestamp() * 1000)):
+                    queue.put_nowait(record)
+
+                if db.redis and payloads:
+                    pipe = db.redis.pipeline(transaction=False)
+                    for payload in payloads:
+                        pipe.publish("crypto_updates", json.dumps(payload))
+                    # Stream для воркеров индикаторов (ограничен MAXLEN, читается consumer groups)
+                    if TICK_TRANSPORT == "streams":
+                        publish_stream(pipe, payloads)
+                    await pipe.execute()
+
         except Exception as e:
             print(f"❌ Streamer Error: {e}", flush=True)
             await asyncio.sleep(5)
@@ -0,0 +1,51 @@
+import asyncio
+import os
+import time
+import uvloop
+# PYTHONPATH set to /app in Docker, so 'common' is accessible directly
+from common.database import db
+from common.candle_rollup import TIMEFRAMES
+from common.indicator_writer import IndicatorFlusher
+from common.schema import ensure_indicators
+
+FLUSH_SEC = float(os.getenv("INDICATOR_FLUSH_SEC", "5"))
+REHYDRATE_SEC = float(os.getenv("INDICATOR_REHYDRATE_SEC", "60"))
+
+
+async def main():
+    """
+    Write-behind индикаторов: воркеры пишут в Redis, а этот процесс раз в
+    INDICATOR_FLUSH_SEC переносит изменившиеся (symbol, tf) в coin_indicators.
+    Пустые после рестарта Redis хеши indicators:{tf} заполняет обратно из coin_indicators.
+    """
+    await db.connect()
+    # Таблица могла не появиться, если деплой шел мимо init_db.py (common/schema.py)
+    async with db.pool.acquire() as conn:
+        await ensure_indicators(conn)
+    flusher = IndicatorFlusher(db.pool, db.redis)
+    print(f"🚀 Indicator flusher started (every {FLUSH_SEC}s)", flush=True)
+    last_report = time.time()
+    last_rehydrate = 0.0
+    while True:
+        if time.time() - last_rehydrate > REHYDRATE_SEC:
+            last_rehydrate = time.time()
+            try:
+                n = await flusher.rehydrate(TIMEFRAMES)
+                if n:
+                    print(f"♻️ Rehydrated {n} indicator rows from coin_indicators", flush=True)
+            except Exception as e:
+                print(f"❌ Rehydrate Error: {e}", flush=True)
+        await asyncio.sleep(FLUSH_SEC)
+        try:
+            await flusher.flush()
+        except Exception as e:
+            print(f"❌ Flush Error: {e}", flush=True)
+        if time.time() - last_report > 60:
+            last_report = time.time()
+            print(f"📈 Flusher: {flusher.stats()}", flush=True)
+            flusher.reset_stats()
+
+
+if __name__ == "__main__":
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    asyncio.run(main())
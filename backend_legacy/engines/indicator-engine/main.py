@@ -3,11 +3,13 @@ import multiprocessing
 import os
 import sys
 import json
+import time
 import uvloop
 from redis import asyncio as aioredis
 from stateful_worker import StatefulIndicatorWorker
 # PYTHONPATH set to /app in Docker, so 'common' is accessible directly
 from common.database import DatabasePool, db as main_db
+from common.tick_stream import TICK_TRANSPORT, TickStreamConsumer
 
 async def worker_process(shard_id, symbols, redis_url, db_dsn):
     """
@@ -28,10 +30,15 @@ async def worker_process(shard_id, symbols, redis_url, db_dsn):
     await engine.warm_up()
     
     print(f"🔧 Worker {shard_id} Ready! Handling {len(symbols)} coins: {symbols[:3]}...", flush=True)
+    # Пересчет индикаторов по таймеру (конфляция тиков), тики только обновляют свечи
+    asyncio.create_task(engine.run_conflation())
     
     # 4. Subscribe to Redis Stream / PubSub
-    # Streamer publishes to 'crypto_updates'
-    
+    # Streamer publishes to 'crypto_updates' (and 'crypto_updates:stream' in streams mode)
+    if TICK_TRANSPORT == "streams":
+        await consume_stream(engine, shard_id, local_redis)
+        return
+
     pubsub = local_redis.pubsub()
     await pubsub.subscribe("crypto_updates")
     
@@ -44,7 +51,7 @@ async def worker_process(shard_id, symbols, redis_url, db_dsn):
                 symbol = data.get('s')
                 k = data.get('k')
                 
-                if symbol and k and symbol in engine.cache:
+                if symbol and k and symbol in engine.states:
                     # k[4] is Close Price, k[5] is Volume
                     price = float(k[4])
                     volume = float(k[5])
@@ -54,6 +61,32 @@ async def worker_process(shard_id, symbols, redis_url, db_dsn):
             except Exception as e:
                 print(f"Error processing msg in Worker {shard_id}: {e}", flush=True)
 
+async def consume_stream(engine, shard_id, local_redis):
+    """
+    Чтение через consumer group воркера: отставание копится в stream (MAXLEN),
+    а не в памяти процесса; из пачки считаем только последний тик по монете.
+    """
+    consumer = TickStreamConsumer(local_redis, f"ie-worker-{shard_id}", engine.states.keys())
+    await consumer.ensure_group()
+    last_report = time.time()
+
+    while True:
+        try:
+            latest = await consumer.read()
+            for symbol, k in latest.items():
+                await engine.process_tick(symbol, float(k[4]), float(k[5]))
+        except Exception as e:
+            print(f"Error processing stream in Worker {shard_id}: {e}", flush=True)
+            await asyncio.sleep(1)
+
+        if time.time() - last_report > 60:
+            last_report = time.time()
+            print(
+                f"📈 Worker {shard_id}: ticks {consumer.received} -> computed {consumer.delivered}, "
+                f"stream lag {consumer.lag}, pending {consumer.pending}",
+                flush=True,
+            )
+
 def run_worker_sync(shard_id, symbols, redis_url, db_dsn):
     """Sync wrapper for asyncio process"""
     asyncio.run(worker_process(shard_id, symbols, redis_url, db_dsn))
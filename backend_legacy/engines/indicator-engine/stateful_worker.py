@@ -2,11 +2,17 @@ import asyncio
 import os
 import json
 import pandas as pd
-import pandas_ta as ta
 import numpy as np
 import logging
-from datetime import datetime
+import time
+from datetime import datetime, timedelta, timezone
 import warnings
+from common.candle_rollup import CandleRollup, TIMEFRAMES
+from common.candle_store import CandleStore, FIELDS
+from common.conflation import Conflator, load_cadence
+from common.indicator_state import IndicatorState
+from common.indicator_writer import IndicatorWriter
+from common.ws_hub import INDICATOR_CHANNEL
 
 # Отключаем предупреждения Pandas (Performance)
 warnings.filterwarnings("ignore")
@@ -20,22 +26,40 @@ class StatefulIndicatorWorker:
         self.symbols = symbols
         self.db = db_pool
         self.redis = redis_client
-        self.cache = {}  # { 'BTC/USDT': pd.DataFrame }
-        self.tf_map = {'1m': '1T', '5m': '5T', '15m': '15T', '1h': '1H', '4h': '4H', '1d': '1D'}
+        # Минутные свечи всего шарда в колоночном кольцевом буфере (без DataFrame на горячем пути)
+        self.store = CandleStore(symbols, capacity=2000)
+        # Живые свечи 1m..1d, обновляются из текущей 1m свечи без resample
+        self.rollup = CandleRollup()
+        self.states = {}  # { 'BTC/USDT': { '1m': IndicatorState, '5m': ..., ... } }
+        self.history_bars = 300  # Закрытых свечей на ТФ при прогреве (EMA200 + запас)
+        # Тики сразу идут в свечи, а пересчет индикаторов — по таймеру ТФ и только для изменившихся монет
+        self.conflator = Conflator(load_cadence(TIMEFRAMES))
+        self.results = {}  # { symbol: { tf: indicators } } — последние посчитанные значения
+        # Изменившиеся (symbol, tf) -> Redis одним pipeline; в Postgres их переносит flusher.py
+        self.writer = IndicatorWriter(redis_client)
         self.is_ready = False
 
     async def warm_up(self):
         """Загружает историю для своих монет в память."""
         logger.info(f"🔥 Warming up cache for {len(self.symbols)} symbols...")
+        now = int(time.time() // 60) * 60_000
         
         # Загружаем пачками, чтобы не убить БД при старте
         batch_size = 20
         for i in range(0, len(self.symbols), batch_size):
             batch = self.symbols[i:i+batch_size]
             await self._load_batch(batch)
+            for tf in TIMEFRAMES:
+                if tf != '1m':
+                    await self._load_tf_history(batch, tf, now)
+            for symbol in batch:
+                self._replay_forming(symbol, now)
         
         self.is_ready = True
-        logger.info(f"✅ Cache ready. Tracking {len(self.cache)} active dataframes.")
+        logger.info(
+            f"✅ Cache ready. Tracking {len(self.states)} symbols, "
+            f"candle store {self.store.nbytes / 2**20:.1f} MB."
+        )
 
     async def _load_batch(self, batch):
         symbols_str = ",".join([f"'{s}'" for s in batch])
@@ -53,142 +77,145 @@ class StatefulIndicatorWorker:
 
             # Группируем по символам в Python (быстрее, чем N запросов)
             df_all = pd.DataFrame(rows, columns=['symbol', 'time', 'open', 'high', 'low', 'close', 'volume'])
-            df_all['time'] = pd.to_datetime(df_all['time'])
-            df_all.set_index('time', inplace=True)
-
-            for symbol in batch:
-                df = df_all[df_all['symbol'] == symbol]
-                if not df.empty:
-                    # Храним только нужные колонки и типы
-                    self.cache[symbol] = df[['open', 'high', 'low', 'close', 'volume']].astype(float)
+            df_all['time'] = pd.to_datetime(df_all['time'], utc=True).astype('int64') // 10**6
+
+            for symbol, df in df_all.groupby('symbol'):
+                if symbol not in self.store: continue
+                self.store.load(symbol, df['time'].values, *(df[f].astype(float).values for f in FIELDS))
+                self.states[symbol] = {tf: IndicatorState() for tf in TIMEFRAMES}
+                # 1m: все закрытые свечи из буфера, последняя (формирующаяся) придет тиками
+                self.states[symbol]['1m'].seed(
+                    self.store.view(symbol, 'high')[:-1],
+                    self.store.view(symbol, 'low')[:-1],
+                    self.store.view(symbol, 'close')[:-1],
+                )
         except Exception as e:
             logger.error(f"Error loading batch: {e}")
 
-    def calculate_ta(self, df):
+    async def _load_tf_history(self, batch, tf, now):
         """
-        Быстрый расчет индикаторов с использованием pandas-ta.
-        Рассчитываем только хвост, если возможно (пока полный пересчет, но в памяти это быстро).
+        Засевает состояние старшего ТФ закрытыми свечами из TimescaleDB (time_bucket).
+        2000 минуток не дают даже 2 дневных свечей, поэтому история ТФ берется из БД.
         """
-        # Копия хвоста для расчетов (нам не нужна вся история 2 года, 500 свечей хватит)
-        # Оптимизация: limit=500
-        df_calc = df.iloc[-500:].copy() 
-
-        # Настройка стратегии pandas-ta
-        # Custom Strategy
-        CustomStrategy = ta.Strategy(
-            name="Screener Strategy",
-            ta=[
-                {"kind": "rsi", "length": 14},
-                {"kind": "macd"},
-                {"kind": "ema", "length": 50},
-                {"kind": "ema", "length": 200},
-                {"kind": "bbands", "length": 20},
-                {"kind": "supertrend"},
-            ]
-        )
-        
-        # Запускаем расчет (Multiprocessing внутри pandas-ta отключен через cores=0 для избежания конфликтов)
-        df_calc.ta.strategy(CustomStrategy, cores=0)
-        
-        return df_calc.iloc[-1].to_dict()
+        tf_ms = TIMEFRAMES[tf]
+        forming_start = now - now % tf_ms
+        start = forming_start - self.history_bars * tf_ms
+        symbols = [s for s in batch if s in self.states]
+        if not symbols: return
+
+        symbols_str = ",".join([f"'{s}'" for s in symbols])
+        query = f"""
+            SELECT symbol, time_bucket($1, time) AS bucket,
+                   MAX(high) AS high, MIN(low) AS low, LAST(close, time) AS close
+            FROM candles
+            WHERE symbol IN ({symbols_str})
+              AND time >= $2 AND time < $3
+            GROUP BY symbol, bucket
+            ORDER BY bucket ASC
+        """
+        try:
+            rows = await self.db.fetch_all(
+                query,
+                timedelta(milliseconds=tf_ms),
+                datetime.fromtimestamp(start / 1000, tz=timezone.utc),
+                datetime.fromtimestamp(forming_start / 1000, tz=timezone.utc),
+            )
+            by_symbol = {}
+            for r in rows:
+                by_symbol.setdefault(r['symbol'], []).append((r['high'], r['low'], r['close']))
+            for symbol, bars in by_symbol.items():
+                self.states[symbol][tf].seed(*zip(*bars))
+        except Exception as e:
+            logger.error(f"Error loading {tf} history: {e}")
+
+    def _replay_forming(self, symbol, now):
+        """
+        Собирает формирующиеся свечи всех ТФ из минуток текущих суток (закрытия игнорируются).
+        Свеча старшего ТФ из бакета раньше forming_start уже засеяна из time_bucket
+        (_load_tf_history с тем же now) — ее отбрасываем, иначе первый тик закоммитит ее второй раз.
+        """
+        if symbol not in self.states: return
+        times = self.store.view(symbol, 'time')
+        start = np.searchsorted(times, now - now % TIMEFRAMES['1d'])
+        cols = [self.store.view(symbol, f) for f in FIELDS]
+        for i in range(start, len(times)):
+            self.rollup.update(symbol, int(times[i]), *(float(col[i]) for col in cols))
+        for tf, tf_ms in TIMEFRAMES.items():
+            bar = self.rollup.bar(symbol, tf) if tf != '1m' else None
+            if bar is not None and bar[0] < now - now % tf_ms:
+                self.rollup.discard(symbol, tf)
 
     async def process_tick(self, symbol, price, volume):
         """
         Вызывается при обновлении цены.
-        1. Обновляет DataFrame в памяти.
-        2. Пересчитывает индикаторы для всех ТФ.
-        3. Сохраняет результат.
+        1. Обновляет текущую свечу в кольцевом буфере за O(1).
+        2. Обновляет живые свечи всех ТФ; закрытые на границе бакета фиксируются (commit).
+        3. Помечает монету «грязной» — индикаторы посчитает compute_due().
         """
-        if symbol not in self.cache:
+        if symbol not in self.states:
             return
 
-        df = self.cache[symbol]
-        now = pd.Timestamp.now().floor('1min') # Округляем до минуты
-
-        # Обновляем последнюю свечу или добавляем новую
-        if now in df.index:
-            # Update current candle
-            df.at[now, 'close'] = price
-            df.at[now, 'high'] = max(df.at[now, 'high'], price)
-            df.at[now, 'low'] = min(df.at[now, 'low'], price)
-            df.at[now, 'volume'] += volume # Примерно, лучше брать snapshot volume
-        else:
-            # New candle
-            new_row = pd.DataFrame({
-                'open': [price], 'high': [price], 'low': [price], 'close': [price], 'volume': [volume]
-            }, index=[now])
-            self.cache[symbol] = pd.concat([df, new_row])
-            # Очистка памяти (держим не более 2000 свечей)
-            if len(self.cache[symbol]) > 2000:
-                self.cache[symbol] = self.cache[symbol].iloc[-2000:]
+        now = int(time.time() // 60) * 60_000 # Округляем до минуты (ms)
+
+        # Обновляем последнюю свечу или открываем новую
+        # volume суммируется примерно, лучше брать snapshot volume
+        self.store.update(symbol, now, price, volume)
 
         # --- MULTI-TIMEFRAME CALCULATION ---
-        results = {}
-        base_df = self.cache[symbol]
+        states = self.states[symbol]
+        for tf, bar in self.rollup.update(symbol, *self.store.bar(symbol)):
+            # Свеча ТФ закрылась — фиксируем ее в состоянии
+            states[tf].commit(bar[2], bar[3], bar[4])
 
-        # Для скорости считаем только если прошла минута или сильное изменение
-        # Но для точности TWA пока считаем всегда (в памяти это < 10мс)
-        
-        for tf_name, tf_code in self.tf_map.items():
-            if tf_name == '1m':
-                resampled = base_df
-            else:
-                resampled = base_df.resample(tf_code).agg({
-                    'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'
-                }).dropna()
-            
-            if len(resampled) < 30: continue
-
-            ta_res = self.calculate_ta(resampled)
-            
-            # Форматируем результат
-            results[tf_name] = {
-                'rsi': ta_res.get('RSI_14'),
-                'macd': ta_res.get('MACD_12_26_9'),
-                'macd_signal': ta_res.get('MACDs_12_26_9'),
-                'macd_hist': ta_res.get('MACDh_12_26_9'),
-                'ema_50': ta_res.get('EMA_50'),
-                'ema_200': ta_res.get('EMA_200'),
-                'bb_upper': ta_res.get('BBU_20_2.0'),
-                'bb_lower': ta_res.get('BBL_20_2.0'),
-                'trend': ta_res.get('SUPERT_7_3.0')
-            }
-            
-            # Clean NaNs
-            for k, v in results[tf_name].items():
-                if isinstance(v, float) and (np.isnan(v) or np.isinf(v)):
-                    results[tf_name][k] = None
-
-        # Сохраняем в БД (Batch update был бы лучше, но пока direct)
-        # Оптимизация: сохраняем в Redis, а отдельный процесс дампит в БД
-        # Для сейчас: пишем напрямую, но асинхронно
-        await self._save_to_db(symbol, price, results)
-
-    async def _save_to_db(self, symbol, price, results):
-        query = """
-            UPDATE coin_status SET 
-                updated_at = NOW(), 
-                current_price = $1, 
-                indicators_1m = $2, 
-                indicators_5m = $3, 
-                indicators_15m = $4, 
-                indicators_1h = $5, 
-                indicators_4h = $6, 
-                indicators_1d = $7 
-            WHERE symbol = $8
+        self.conflator.mark(symbol)
+
+    async def compute_due(self):
+        """
+        Провизорно считает индикаторы формирующихся свечей (O(1)) для ТФ, чей интервал истек,
+        пишет изменившиеся в Redis и публикует их. Postgres на этом пути не участвует.
+        """
+        touched = {}  # symbol -> {tf: свеча} пересчитанных ТФ
+        changed = {}  # symbol -> {tf, ...}, где индикаторы сдвинулись больше допуска
+        for tf, symbols in self.conflator.due(time.time()).items():
+            for symbol in symbols:
+                state = self.states[symbol][tf]
+                if state.bars < 30: continue
+                bar = self.rollup.bar(symbol, tf)
+                values = self.results.setdefault(symbol, {})[tf] = state.update(bar[2], bar[3], bar[4])
+                touched.setdefault(symbol, {})[tf] = bar
+                if self.writer.add(symbol, tf, bar[4], values):
+                    changed.setdefault(symbol, set()).add(tf)
+
+        if touched:
+            await self._publish(touched, changed)
+        await self.writer.flush()
+
+    async def _publish(self, touched, changed):
+        """
+        Лента изменений -> indicator_updates (WebSocket-подписчики API, снимок скринера):
+        индикаторы — только изменившиеся ТФ, формирующиеся свечи — все пересчитанные.
         """
-        # json.dumps может быть медленным, лучше orjson, но используем стандартный
         try:
-            await self.db.execute(query, 
-                price,
-                json.dumps(results.get('1m')),
-                json.dumps(results.get('5m')),
-                json.dumps(results.get('15m')),
-                json.dumps(results.get('1h')),
-                json.dumps(results.get('4h')),
-                json.dumps(results.get('1d')),
-                symbol
-            )
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for symbol, bars in touched.items():
+                    inds = {tf: self.results[symbol][tf] for tf in changed.get(symbol, ())}
+                    k = {tf: [int(bar[0]) // 1000, *map(float, bar[1:])] for tf, bar in bars.items()}
+                    pipe.publish(INDICATOR_CHANNEL, json.dumps({"s": symbol, "i": inds, "k": k}))
+                await pipe.execute()
         except Exception as e:
-            logger.error(f"DB Save Error {symbol}: {e}")
-
+            logger.error(f"Publish Error: {e}")
+
+    async def run_conflation(self, report_every=60):
+        """Цикл пересчета: просыпается с самым частым интервалом ТФ, раз в минуту пишет счетчики."""
+        last_report = time.time()
+        while True:
+            await asyncio.sleep(self.conflator.interval)
+            try:
+                await self.compute_due()
+            except Exception as e:
+                logger.error(f"Compute Error: {e}")
+            if time.time() - last_report > report_every:
+                last_report = time.time()
+                logger.info(f"📈 {self.conflator.stats()}, writes {self.writer.stats()}")
+                self.conflator.reset_stats()
+                self.writer.reset_stats()
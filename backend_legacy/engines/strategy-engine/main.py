@@ -1,34 +1,26 @@
 import asyncio
 import sys
 import os
-import json
 
 # Импорты из common
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from common.database import db
+from common.indicator_writer import read_indicators
 
 async def check_strategies():
-    """Проверка стратегий на базе данных из JSONB (The Beast v3.3)."""
+    """Проверка стратегий по последним индикаторам из Redis (write-behind воркеров, без Postgres)."""
     try:
-        # ЗАПРОС БЕЗ rsi_14
-        query = "SELECT symbol, indicators_1h, current_price, volume_24h FROM coin_status"
-        rows = await db.fetch_all(query)
-        
-        for r in rows:
-            inds = r['indicators_1h'] or {}
-            # Безопасно достаем значения из JSONB
-            rsi = inds.get('RSI_14')
-            
-            if rsi is None: continue
+        inds = await read_indicators(db.redis, '1h', pool=db.pool)
 
-            # Пример стратегии: RSI Перепроданность
-            if float(rsi) < 30:
-                print(f"🔥 [STRATEGY] {r['symbol']} is OVERSOLD (RSI: {rsi})", flush=True)
+        for symbol, v in inds.items():
+            # Пример стратегии: RSI перепроданность на 1h
+            if v.get('rsi') is not None and v['rsi'] < 30:
+                print(f"🔥 [STRATEGY] {symbol} is OVERSOLD (RSI: {v['rsi']:.2f})", flush=True)
     except Exception as e:
         print(f"❌ Strategy Error: {e}", flush=True)
 
 async def main():
-    print("🚀 Strategy Engine v3.3 (JSONB Mode) started", flush=True)
+    print("🚀 Strategy Engine v3.5 (Redis indicators) started", flush=True)
     await db.connect()
     while True:
         await check_strategies() # Теперь имя совпадает
@@ -30,7 +30,12 @@ export const useWebSocket = () => {
       socket.onmessage = (event) => {
         try {
           const data = JSON.parse(event.data);
-          if (data.s && data.k) {
+          if (data.type === 'batch') {
+            // One frame per throttle interval: { ticks: { 'BTC/USDT': [t, o, h, l, c, v], ... } }
+            Object.entries(data.ticks || {}).forEach(([symbol, k]) => {
+              buffer.current[symbol.split('/')[0]] = k as number[];
+            });
+          } else if (data.s && data.k) {
             const cleanSymbol = data.s.split('/')[0];
             // Accumulate in buffer
             buffer.current[cleanSymbol] = data.k;